@@ -4,7 +4,7 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.session.middlewares.request_logging import logger
 from aiogram.enums import ChatType
 from scripts import AdvertisementScheduler
-from loader import db
+from loader import db, client_pool, health_checker
 
 scheduler = AdvertisementScheduler()
 
@@ -45,11 +45,7 @@ async def database_connected():
     await db.create()
     # await db.drop_users()
 
-    await db.create_table_clients()  # Avval Clients jadvalini yaratamiz
-    await db.create_table_users()
-    await db.alter_advertisement_table() # Keyin Users jadvalini
-    await db.create_table_advertisement()
-    await db.create_table_advertisement_logs()
+    await db.migrate()
 
 
 
@@ -61,7 +57,9 @@ async def aiogram_on_startup_polling(dispatcher: Dispatcher, bot: Bot) -> None:
     await database_connected()
     logger.info("Reklama yuboruvchi ishga tushdi")
     # await scheduler.handle_advertisements()
+    await client_pool.start()
     await scheduler.start()
+    await health_checker.start()
 
     logger.info("Starting polling")
     await bot.delete_webhook(drop_pending_updates=True)
@@ -72,7 +70,9 @@ async def aiogram_on_startup_polling(dispatcher: Dispatcher, bot: Bot) -> None:
 
 async def aiogram_on_shutdown_polling(dispatcher: Dispatcher, bot: Bot):
     logger.info("Stopping polling")
+    await health_checker.stop()
     await scheduler.stop()
+    await client_pool.stop()
     await bot.session.close()
     await dispatcher.storage.close()
 
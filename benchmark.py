@@ -0,0 +1,439 @@
+"""
+Reklama tarqatuvchi uchun oflayn benchmarklar.
+
+Ishga tushirish:
+    python benchmark.py timers --ads 10000 --hours 4
+    python benchmark.py scheduler --ads 500 --groups 20 --accounts 10 --minutes 30
+    python benchmark.py scheduler --outage 120 --catch-up backfill   # CATCH_UP_RAMP_SECONDS=0 bilan taqqoslang
+    python benchmark.py scheduler --accounts 1 --ads 20 --groups 5 --hog-groups 1000 --rate 2   # --no-fair bilan
+    python benchmark.py health --accounts 200 --workers 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime
+
+# Loyiha modullari subkomandalar ichida import qilinadi: utils paketi data.config ni yuklaydi,
+# oflayn benchmarklar uchun esa majburiy sozlamalar undan oldin main() da beriladi
+DURATIONS = [1, 2, 3, 4, 5, 10, 15, 30, 60, 120]
+
+
+async def run_timer_accuracy(ads: int, hours: float, seed: int = 1) -> dict:
+    """
+    Virtual soat bilan TimerHeap aniqligini tekshirish.
+
+    Scheduler tsiklidagi kabi eng yaqin taymergacha uxlaymiz, vaqti kelganlarni
+    ishga tushiramiz va keyingi navbatga qo'yamiz. Har bir ishga tushish
+    kechikishi 0 bo'lishi va har bir reklama kutilgan marta yuborilishi kerak.
+    """
+    from utils.scheduler.timers import TimerHeap, VirtualClock
+
+    rnd = random.Random(seed)
+    clock = VirtualClock()
+    timers = TimerHeap()
+    wakeup = asyncio.Event()
+    horizon = hours * 3600
+    intervals = {}
+    first_fire = {}
+
+    for ad_id in range(ads):
+        interval = rnd.choice(DURATIONS) * 60
+        intervals[ad_id] = interval
+        first_fire[ad_id] = rnd.uniform(0, interval)
+        timers.schedule(ad_id, first_fire[ad_id])
+
+    # Ishlash davomida bekor qilish va qayta rejalashtirishni ham sinaymiz
+    cancelled = set(rnd.sample(range(ads), ads // 100))
+    for ad_id in cancelled:
+        timers.cancel(ad_id)
+
+    fired = {}
+    max_lateness = 0.0
+    wall_start = time.perf_counter()
+    while True:
+        next_fire = timers.next_fire_time()
+        if next_fire is None or next_fire > horizon:
+            break
+        wakeup.clear()
+        await clock.wait(wakeup, next_fire - clock.now())
+        now = clock.now()
+        for ad_id, fire_at, _ in timers.pop_due(now):
+            max_lateness = max(max_lateness, now - fire_at)
+            fired[ad_id] = fired.get(ad_id, 0) + 1
+            timers.schedule(ad_id, fire_at + intervals[ad_id])
+    wall = time.perf_counter() - wall_start
+
+    mismatched = 0
+    for ad_id, interval in intervals.items():
+        expected = 0 if ad_id in cancelled else int((horizon - first_fire[ad_id]) // interval) + 1
+        if fired.get(ad_id, 0) != expected:
+            mismatched += 1
+
+    return {
+        "ads": ads,
+        "fires": sum(fired.values()),
+        "max_lateness_s": max_lateness,
+        "mismatched_ads": mismatched,
+        "wall_s": round(wall, 3),
+    }
+
+
+async def run_health_check(accounts: int, workers: int, latency: float, banned: int, deauthorized: int,
+                           limited: int) -> dict:
+    """
+    SessionHealthChecker: barcha akkauntlarni tekshirish vaqti (virtual soniyalarda).
+
+    Birinchi `banned` ta akkaunt banlangan, keyingi `deauthorized` tasining sessiyasi
+    bekor qilingan, keyingi `limited` tasi spam-cheklangan. Natijalar va bazadagi
+    holat to'g'ri bo'lishi, handler javobi esa faqat bitta baza so'rovi bo'lishi kerak.
+    """
+    from telethon import errors
+    from utils.db.memory import InMemoryDatabase
+    from utils.telegram.client_pool import ClientPool
+    from utils.telegram.fake_client import FakeTelegramClient
+    from utils.telegram.health import SessionHealthChecker
+    from utils.scheduler.timers import LoopClock
+
+    loop = asyncio.get_running_loop()
+    database = InMemoryDatabase(LoopClock(epoch=datetime(2024, 1, 1).timestamp()))
+    fake_clients = {}
+
+    def client_factory(row):
+        client = fake_clients.get(row["id"])
+        if client is None:
+            client = fake_clients[row["id"]] = FakeTelegramClient(row["id"], latency=latency)
+            if row["id"] <= banned:
+                client.account_error = lambda: errors.UserDeactivatedBanError(request=None)
+            elif row["id"] <= banned + deauthorized:
+                client.authorized = False
+            elif row["id"] <= banned + deauthorized + limited:
+                client.spam_limited = True
+        return client
+
+    for client_id in range(1, accounts + 1):
+        database.add_client(client_id)
+
+    timings = {}
+    for name, pool_workers in (("sequential", 1), ("concurrent", workers)):
+        fake_clients.clear()
+        pool = ClientPool(database, client_factory=client_factory, max_connections=accounts)
+        checker = SessionHealthChecker(database, pool, workers=pool_workers)
+        started = loop.time()
+        results = await checker.check_all()
+        timings[name] = round(loop.time() - started, 2)
+        await pool.stop()
+
+    queries = database.queries
+    rows = await database.get_client_health()
+    return {
+        "accounts": accounts,
+        "workers": workers,
+        "sequential_s": timings["sequential"],
+        "concurrent_s": timings["concurrent"],
+        "speedup": round(timings["sequential"] / timings["concurrent"], 1) if timings["concurrent"] else None,
+        "authorized": sum(1 for result in results if result[1]),
+        "spam_limited": sum(1 for result in results if result[2] == "limited"),
+        "disabled_accounts": sum(1 for row in rows if row["is_banned"] or not row["is_active"]),
+        "handler_db_queries": database.queries - queries,
+    }
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def run_scheduler_throughput(ads: int, groups: int, accounts: int, minutes: float, rate: float,
+                                   burst: int, latency: float, flood_rate: float, error_rate: float,
+                                   dead_rate: float = 0.0, same_start: bool = False, phase_slots: bool = True,
+                                   restarts: int = 0, drain_seconds: float = 20, outage_minutes: float = 0,
+                                   catch_up: str = "once", hog_groups: int = 0, fair: bool = True,
+                                   max_runs: int = None, max_connections: int = None, peer_cache: bool = True,
+                                   batch_size: int = 1, batch_linger_ms: int = 20, banned_accounts: int = 0,
+                                   seed: int = 1) -> dict:
+    """
+    To'liq AdvertisementScheduler'ni Telegram va Postgres'siz ishga tushirish.
+
+    FakeTelegramClient va InMemoryDatabase VirtualTimeLoop ustida ishlaydi, shuning
+    uchun bir necha soatlik yuborish soniyalarda o'tadi. Natija: yuborish tezligi,
+    navbat kechikishi (p50/p99) va har bir yuborishga to'g'ri keladigan so'rovlar soni.
+    `dead_rate` ulushdagi guruhlarga yozib bo'lmaydi - ularga ketgan so'rovlar
+    o'lik guruhlar olib tashlangach to'xtashi kerak. `same_start` - barcha reklamalar
+    bir vaqtda yaratiladi; `phase_slots=False` bilan navbat siljishisiz holat o'lchanadi.
+    `restarts` - scheduler shuncha marta to'xtatilib (drain) qaytadan ishga tushiriladi;
+    yo'qolgan va takroriy yuborishlar 0 bo'lishi kerak. `outage_minutes` - bot shuncha vaqt
+    ishlamagan: reklamalar navbati o'tib ketgan holda `catch_up` siyosati bilan boshlanadi.
+    `hog_groups` - 1-akkauntda shuncha guruhli katta reklama ham ishlaydi; kichik
+    reklamalar kechikishi alohida o'lchanadi (`fair=False` - oddiy FIFO navbat bilan).
+    `max_runs` / `max_connections` - parallel reklamalar va ochiq ulanishlar chegarasi
+    (berilmasa data.config qiymatlari); navbatda kutish va ulanishlar cho'qqisi qaytariladi.
+    `peer_cache=False` - guruhlar har bir yangi klientda tarmoq orqali aniqlanadi (`peer_resolves`).
+    `batch_size` > 1 - yuborishlar MTProto konteynerlarga yig'iladi (`telegram_requests` = round trip'lar).
+    `banned_accounts` - shuncha akkaunt banlangan (UserDeactivatedBanError); ularga ketgan so'rovlar
+    breaker ochilgandan keyin to'xtashi kerak (`banned_account_requests`).
+    """
+    from scripts import AdvertisementScheduler
+    from utils.db.memory import InMemoryDatabase
+    from utils.scheduler.metrics import SendConcurrencyMeter, WaitStats
+    from telethon import errors
+    from utils.telegram.batching import RequestBatcher
+    from utils.telegram.client_pool import ClientPool
+    from utils.telegram.fake_client import FakeTelegramClient
+    from utils.scheduler.timers import LoopClock
+
+    rnd = random.Random(seed)
+    clock = LoopClock(epoch=datetime(2024, 1, 1).timestamp())
+    database = InMemoryDatabase(clock, phase_slots=phase_slots)
+    group_pool = [{"id": -1000000000000 - i, "title": f"group-{i}"} for i in range(max(groups * 5, hog_groups, 1))]
+    dead_groups = {group["id"] for group in group_pool if rnd.random() < dead_rate}
+    # Telegram tomonidagi holat (random_id'lar) qayta ishga tushishlar orasida saqlanadi
+    fake_clients = {}
+    notifications = []
+
+    def client_factory(row):
+        if row["id"] not in fake_clients:
+            fake_clients[row["id"]] = FakeTelegramClient(
+                row["id"], groups=group_pool, latency=latency, flood_rate=flood_rate,
+                error_rate=error_rate, seed=seed + row["id"], dead_groups=dead_groups
+            )
+            if row["id"] <= banned_accounts:
+                fake_clients[row["id"]].account_error = lambda: errors.UserDeactivatedBanError(request=None)
+        # Har bir yangi TelegramClient(StringSession) bo'sh entity keshi bilan boshlanadi
+        fake_clients[row["id"]].reset_session()
+        return fake_clients[row["id"]]
+
+    async def collect_notification(text):
+        notifications.append(text)
+
+    for client_id in range(1, accounts + 1):
+        database.add_client(client_id, owner_id=client_id, send_rate=rate, send_burst=burst)
+    for _ in range(ads):
+        interval = rnd.choice(DURATIONS)
+        if same_start:
+            next_run_at = None
+        elif outage_minutes:
+            next_run_at = datetime.fromtimestamp(clock.now() - outage_minutes * 60 + rnd.uniform(0, interval * 60))
+        else:
+            next_run_at = datetime.fromtimestamp(clock.now() + rnd.uniform(0, interval * 60))
+        database.add_advertisement(
+            "benchmark", interval, created_by=rnd.randint(1, accounts),
+            group_ids=[group["id"] for group in rnd.sample(group_pool, groups)],
+            next_run_at=next_run_at, catch_up=catch_up,
+        )
+
+    hog_ad = None
+    if hog_groups:
+        hog_ad = database.add_advertisement(
+            "benchmark-hog", 60, created_by=1, group_ids=[group["id"] for group in group_pool[:hog_groups]],
+            next_run_at=datetime.fromtimestamp(clock.now()),
+        )
+
+    send_meter = SendConcurrencyMeter(clock, window_seconds=int(minutes * 60) + 1)
+    run_waits = WaitStats()
+    batchers = []
+    peak_connections = 0
+    wall_start = time.perf_counter()
+    for run in range(restarts + 1):
+        pool = ClientPool(database, client_factory=client_factory)
+        if max_connections:
+            pool.max_connections = max_connections
+        scheduler = AdvertisementScheduler(
+            clock=clock, node_id=f"bench-node-{run}", database=database, pool=pool, notify=collect_notification,
+        )
+        scheduler.send_meter = send_meter
+        scheduler.run_waits = run_waits
+        if max_runs:
+            scheduler.max_runs = max_runs
+        if not fair:
+            scheduler.send_queue = FifoSendQueue(scheduler.rate_limiter)
+        if not peer_cache:
+            scheduler.peer_cache = ResolvingPeerCache()
+            scheduler.dialog_catalog.peer_cache = scheduler.peer_cache
+        scheduler.send_batcher = RequestBatcher(batch_size, batch_linger_ms)
+        batchers.append(scheduler.send_batcher)
+        await scheduler.start()
+        await asyncio.sleep(minutes * 60 / (restarts + 1))
+        await scheduler.stop(drain_seconds=drain_seconds)
+        await scheduler.client_pool.stop()
+        peak_connections = max(peak_connections, pool.peak_connections)
+    wall = time.perf_counter() - wall_start
+
+    sends = sum(len(client.sent) for client in fake_clients.values())
+    load = send_meter.snapshot()
+    run_wait = run_waits.snapshot()
+    deliveries = database.delivery_report()
+    small_delays = [
+        delay for ad_id, delays in database.send_delays_by_ad.items() if ad_id != hog_ad for delay in delays
+    ]
+    return {
+        "ads": ads,
+        "sends": sends,
+        "sends_per_s": round(sends / (minutes * 60), 2),
+        "slots": len(database.lateness),
+        "slot_lateness_p50_s": round(percentile(database.lateness, 0.5), 3),
+        "slot_lateness_p99_s": round(percentile(database.lateness, 0.99), 3),
+        "send_delay_p50_s": round(percentile(database.send_delays, 0.5), 3),
+        "send_delay_p99_s": round(percentile(database.send_delays, 0.99), 3),
+        "send_delay_mean_s": round(statistics.fmean(database.send_delays), 3) if database.send_delays else 0.0,
+        "small_ads_delay_p50_s": round(percentile(small_delays, 0.5), 3),
+        "small_ads_delay_p99_s": round(percentile(small_delays, 0.99), 3),
+        "hog_sends": len(database.send_delays_by_ad.get(hog_ad, [])),
+        "load_peak_per_s": load["peak_per_s"],
+        "load_p99_per_s": load["p99_per_s"],
+        "load_mean_per_s": load["mean_per_s"],
+        "load_idle_share": load["idle_share"],
+        "load_peak_in_flight": load["peak_in_flight"],
+        "max_runs": scheduler.max_runs,
+        "run_wait_p50_s": run_wait["p50_s"],
+        "run_wait_p99_s": run_wait["p99_s"],
+        "run_wait_max_s": run_wait["max_s"],
+        "send_slot_wait_p99_s": scheduler.send_limiter.waits.snapshot()["p99_s"],
+        "max_connections": pool.max_connections,
+        "peak_connections": peak_connections,
+        "db_queries": database.queries,
+        "db_queries_per_send": round(database.queries / sends, 3) if sends else None,
+        "telegram_requests": sum(client.requests for client in fake_clients.values()),
+        "dead_group_requests": sum(client.dead_requests for client in fake_clients.values()),
+        "peer_resolves": sum(client.resolves for client in fake_clients.values()),
+        "banned_account_requests": sum(
+            client.requests for client_id, client in fake_clients.items() if client_id <= banned_accounts
+        ),
+        "disabled_accounts": sum(1 for row in database.clients.values() if row["is_banned"] or not row["is_active"]),
+        "batch_size": batch_size,
+        "send_batches": sum(batcher.batches for batcher in batchers),
+        "sends_per_batch": round(
+            sum(batcher.batched_requests for batcher in batchers) / max(sum(batcher.batches for batcher in batchers), 1), 2
+        ),
+        "pruned_ads": len(notifications),
+        "restarts": restarts,
+        "lost_sends": deliveries["lost"],
+        "duplicate_sends": deliveries["duplicate_sends"],
+        "duplicate_slots": deliveries["duplicate_slots"],
+        "wall_s": round(wall, 3),
+    }
+
+
+class FifoSendQueue:
+    """Taqqoslash uchun: adolatli navbatsiz, token-bucket'ni kelish tartibida kutish"""
+
+    def __init__(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+
+    async def turn(self, client_id: int, ad_id: int, owner: int, weight: float = 1.0):
+        await self.rate_limiter.acquire(client_id)
+
+    async def close(self):
+        pass
+
+
+class ResolvingPeerCache:
+    """Taqqoslash uchun: ClientPeers'siz, har safar klientning o'z entity keshi"""
+
+    async def load(self, client_id: int, peer_ids: list):
+        pass
+
+    async def get_input_peer(self, client_id: int, client, peer_id: int):
+        return await client.get_input_entity(peer_id)
+
+    async def remember_dialogs(self, client_id: int, dialogs):
+        pass
+
+    async def forget(self, client_id: int, peer_id: int):
+        pass
+
+
+def run_on_virtual_loop(coro):
+    from utils.scheduler.timers import VirtualTimeLoop
+
+    loop = VirtualTimeLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    timers_parser = sub.add_parser("timers", help="TimerHeap aniqligi (virtual soat)")
+    timers_parser.add_argument("--ads", type=int, default=10_000)
+    timers_parser.add_argument("--hours", type=float, default=4)
+
+    scheduler_parser = sub.add_parser("scheduler", help="To'liq scheduler o'tkazuvchanligi (soxta klient, virtual vaqt)")
+    scheduler_parser.add_argument("--ads", type=int, default=500)
+    scheduler_parser.add_argument("--groups", type=int, default=20, help="Har bir reklamadagi guruhlar soni")
+    scheduler_parser.add_argument("--accounts", type=int, default=10)
+    scheduler_parser.add_argument("--minutes", type=float, default=30, help="Virtual ishlash vaqti")
+    scheduler_parser.add_argument("--rate", type=float, default=0.5, help="Akkaunt tezligi (yuborish/s)")
+    scheduler_parser.add_argument("--burst", type=int, default=5)
+    scheduler_parser.add_argument("--latency", type=float, default=0.05, help="Bitta so'rov davomiyligi (s)")
+    scheduler_parser.add_argument("--flood-rate", type=float, default=0.0, help="FloodWait ehtimoli")
+    scheduler_parser.add_argument("--error-rate", type=float, default=0.0, help="Boshqa xatolik ehtimoli")
+    scheduler_parser.add_argument("--dead-rate", type=float, default=0.0, help="Yozib bo'lmaydigan guruhlar ulushi")
+    scheduler_parser.add_argument("--same-start", action="store_true", help="Barcha reklamalar bir vaqtda yaratiladi")
+    scheduler_parser.add_argument("--no-phase", action="store_true", help="Navbat siljishisiz (taqqoslash uchun)")
+    scheduler_parser.add_argument("--restarts", type=int, default=0, help="Drain bilan qayta ishga tushirishlar soni")
+    scheduler_parser.add_argument("--drain-seconds", type=float, default=20)
+    scheduler_parser.add_argument("--outage", type=float, default=0, help="Bot ishlamagan vaqt (daqiqa)")
+    scheduler_parser.add_argument("--catch-up", choices=["once", "skip", "backfill"], default="once")
+    scheduler_parser.add_argument("--hog-groups", type=int, default=0, help="1-akkauntdagi katta reklama guruhlari")
+    scheduler_parser.add_argument("--no-fair", action="store_true", help="Adolatli navbatsiz (FIFO, taqqoslash uchun)")
+    scheduler_parser.add_argument("--max-runs", type=int, default=None, help="Parallel reklamalar chegarasi")
+    scheduler_parser.add_argument("--max-connections", type=int, default=None, help="Ochiq ulanishlar chegarasi")
+    scheduler_parser.add_argument("--no-peer-cache", action="store_true", help="ClientPeers keshisiz (taqqoslash uchun)")
+    scheduler_parser.add_argument("--batch-size", type=int, default=1, help="MTProto konteynerdagi yuborishlar (1 - ketma-ket)")
+    scheduler_parser.add_argument("--batch-linger-ms", type=int, default=20)
+    scheduler_parser.add_argument("--banned-accounts", type=int, default=0, help="Banlangan akkauntlar soni")
+
+    health_parser = sub.add_parser("health", help="Akkauntlar holatini parallel tekshirish (soxta klient)")
+    health_parser.add_argument("--accounts", type=int, default=200)
+    health_parser.add_argument("--workers", type=int, default=10)
+    health_parser.add_argument("--latency", type=float, default=0.5, help="Bitta so'rov davomiyligi (s)")
+    health_parser.add_argument("--banned", type=int, default=5)
+    health_parser.add_argument("--deauthorized", type=int, default=5)
+    health_parser.add_argument("--limited", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command in ("timers", "scheduler", "health"):
+        # Bot va Postgres ishlatilmaydi, lekin data.config majburiy sozlamalarni talab qiladi
+        for key, value in {"BOT_TOKEN": "123456:offline-benchmark", "ADMINS": "0", "DB_USER": "bench",
+                           "DB_PASS": "bench", "DB_NAME": "bench", "DB_HOST": "localhost", "DB_PORT": "5432"}.items():
+            os.environ.setdefault(key, value)
+    if args.command == "timers":
+        result = asyncio.run(run_timer_accuracy(args.ads, args.hours))
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        if result["max_lateness_s"] > 0 or result["mismatched_ads"]:
+            raise SystemExit("Taymer aniqligi buzildi!")
+    elif args.command == "health":
+        result = run_on_virtual_loop(run_health_check(
+            args.accounts, args.workers, args.latency, args.banned, args.deauthorized, args.limited
+        ))
+        for key, value in result.items():
+            print(f"{key}: {value}")
+    elif args.command == "scheduler":
+        result = run_on_virtual_loop(run_scheduler_throughput(
+            args.ads, args.groups, args.accounts, args.minutes, args.rate, args.burst,
+            args.latency, args.flood_rate, args.error_rate, args.dead_rate,
+            same_start=args.same_start, phase_slots=not args.no_phase,
+            restarts=args.restarts, drain_seconds=args.drain_seconds,
+            outage_minutes=args.outage, catch_up=args.catch_up, hog_groups=args.hog_groups, fair=not args.no_fair,
+            max_runs=args.max_runs, max_connections=args.max_connections, peer_cache=not args.no_peer_cache,
+            batch_size=args.batch_size, batch_linger_ms=args.batch_linger_ms, banned_accounts=args.banned_accounts,
+        ))
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        if result["lost_sends"] or result["duplicate_sends"] or result["duplicate_slots"]:
+            raise SystemExit("Qayta ishga tushishda yuborishlar yo'qoldi yoki takrorlandi!")
+
+
+if __name__ == "__main__":
+    main()
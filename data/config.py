@@ -18,3 +18,39 @@ DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}?
 SSL_CERT_FILE = "/usercontroller_bot/UserControllerBot/data/root.crt"
 
 BACKEND_HOST = env.str("BACKEND_HOST", "http://localhost:8000")
+
+# Reklama tarqatuvchi sozlamalari
+SCHEDULER_POLL_SECONDS = env.int("SCHEDULER_POLL_SECONDS", 60)  # Bazadan reklamalarni qayta o'qish oralig'i
+CLIENT_IDLE_SECONDS = env.int("CLIENT_IDLE_SECONDS", 600)  # Ishlatilmayotgan Telethon klientini yopish vaqti
+MEDIA_CACHE_DIR = env.str("MEDIA_CACHE_DIR", "data/media_cache")  # Reklama rasmlari keshi
+MEDIA_CACHE_MAX_MB = env.int("MEDIA_CACHE_MAX_MB", 200)  # Diskdagi kesh hajmi chegarasi
+SEND_RATE_PER_SECOND = env.float("SEND_RATE_PER_SECOND", 0.5)  # Akkaunt uchun barqaror yuborish tezligi
+SEND_BURST = env.int("SEND_BURST", 5)  # Akkaunt uchun bir martalik yuborishlar soni (burst)
+FLOOD_RATE_DECREASE = env.float("FLOOD_RATE_DECREASE", 0.5)  # FloodWait'dan keyin tezlik koeffitsienti
+FLOOD_RATE_STEP = env.float("FLOOD_RATE_STEP", 0.02)  # Har bir muvaffaqiyatli yuborishda tezlik o'sishi
+FLOOD_MIN_RATE = env.float("FLOOD_MIN_RATE", 0.05)  # Minimal yuborish tezligi
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", 5)  # Bitta guruhga yuborish urinishlari soni
+OUTBOX_RETRY_BASE_SECONDS = env.int("OUTBOX_RETRY_BASE_SECONDS", 5)  # Qayta urinish uchun boshlang'ich kutish
+OUTBOX_RETRY_MAX_SECONDS = env.int("OUTBOX_RETRY_MAX_SECONDS", 300)  # Qayta urinishlar orasidagi maksimal kutish
+MEMBERSHIP_TTL_MINUTES = env.int("MEMBERSHIP_TTL_MINUTES", 360)  # Akkaunt guruhlari ro'yxatini yangilash oralig'i
+LOG_BATCH_SIZE = env.int("LOG_BATCH_SIZE", 100)  # AdvertisementLogs ga bir martada yoziladigan yozuvlar
+LOG_FLUSH_MS = env.int("LOG_FLUSH_MS", 1000)  # Loglarni bazaga yozish oralig'i (ms)
+SCHEDULER_LEASE_SECONDS = env.int("SCHEDULER_LEASE_SECONDS", 15)  # Reklama navbati lease muddati (node yiqilsa)
+SCHEDULER_DRAIN_SECONDS = env.int("SCHEDULER_DRAIN_SECONDS", 20)  # To'xtatishda boshlangan yuborishlarni kutish muddati
+SCHEDULER_MAX_RUNS = env.int("SCHEDULER_MAX_RUNS", 50)  # Bir vaqtda yuborilayotgan reklamalar (qolganlari navbatda kutadi)
+SEND_MAX_IN_FLIGHT = env.int("SEND_MAX_IN_FLIGHT", 100)  # Bir vaqtda davom etayotgan yuborishlar (umumiy)
+SEND_MAX_IN_FLIGHT_PER_ACCOUNT = env.int("SEND_MAX_IN_FLIGHT_PER_ACCOUNT", 5)  # Bitta akkaunt uchun
+SEND_BATCH_SIZE = env.int("SEND_BATCH_SIZE", 1)  # Bitta MTProto konteynerdagi yuborishlar (1 - o'chirilgan)
+SEND_BATCH_LINGER_MS = env.int("SEND_BATCH_LINGER_MS", 20)  # Konteynerga so'rovlar yig'ish vaqti
+ACCOUNT_SPAM_FAILURES = env.int("ACCOUNT_SPAM_FAILURES", 3)  # Ketma-ket PeerFlood - akkaunt spam-cheklangan
+ACCOUNT_BREAKER_RESET_SECONDS = env.int("ACCOUNT_BREAKER_RESET_SECONDS", 600)  # Ochilgan breaker qayta tekshiriladi
+HEALTH_CHECK_WORKERS = env.int("HEALTH_CHECK_WORKERS", 10)  # Bir vaqtda tekshiriladigan akkauntlar
+HEALTH_CHECK_INTERVAL_MINUTES = env.int("HEALTH_CHECK_INTERVAL_MINUTES", 60)  # Akkauntlar holatini tekshirish oralig'i
+HEALTH_CHECK_TIMEOUT_SECONDS = env.int("HEALTH_CHECK_TIMEOUT_SECONDS", 30)  # Bitta akkaunt tekshiruvi uchun
+GROUP_SELECTION_TTL_MINUTES = env.int("GROUP_SELECTION_TTL_MINUTES", 60)  # Tugallanmagan guruh tanlovi saqlanish muddati
+CLIENT_POOL_MAX_CONNECTIONS = env.int("CLIENT_POOL_MAX_CONNECTIONS", 50)  # Ochiq Telethon ulanishlari chegarasi
+SCHEDULER_JITTER_SECONDS = env.int("SCHEDULER_JITTER_SECONDS", 0)  # Navbatga qo'shiladigan tasodifiy kechikish chegarasi
+CATCH_UP_GRACE_SECONDS = env.int("CATCH_UP_GRACE_SECONDS", 120)  # Shundan ko'p kechikkan navbat o'tkazib yuborilgan hisoblanadi
+CATCH_UP_BACKFILL_LIMIT = env.int("CATCH_UP_BACKFILL_LIMIT", 3)  # "backfill" siyosatida yetkaziladigan navbatlar soni
+CATCH_UP_RAMP_SECONDS = env.int("CATCH_UP_RAMP_SECONDS", 300)  # Ishga tushganda kechikkan reklamalarni tarqatish oynasi
+DEAD_GROUP_FAILURES = env.int("DEAD_GROUP_FAILURES", 3)  # Guruh reklamadan olib tashlanadigan doimiy xatoliklar soni
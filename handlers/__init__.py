@@ -6,7 +6,8 @@ from filters import ChatTypeFilter
 
 
 def setup_routers() -> Router:
-    from .users import admin, start, add_client, all_clients, add_advertisment, all_advertisements, remove_accounts, reset_bot
+    from .users import (admin, start, add_client, all_clients, add_advertisment, all_advertisements, remove_accounts,
+                        reset_bot, accounts_health)
     from .errors import error_handler
 
     # Asosiy router yaratish
@@ -22,7 +23,8 @@ def setup_routers() -> Router:
         error_handler.router,
         all_advertisements.router,
         remove_accounts.router,
-        reset_bot.router
+        reset_bot.router,
+        accounts_health.router
     ]
 
     # Filter qo'shish
@@ -0,0 +1,90 @@
+from aiogram import Router, types
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from filters.admin import IsBotAdminFilter
+from data.config import ADMINS
+from loader import db, health_checker
+from utils.shortcuts import split_lines
+
+router = Router()
+
+BAN_REASONS = {
+    "banned": "Telegram tomonidan banlangan",
+    "deauthorized": "Sessiya bekor qilingan",
+    "spam": "Spam-cheklov (PeerFlood)",
+}
+SPAM_LABELS = {
+    "ok": "✅ Cheklov yo'q",
+    "limited": "⏱ Spam-cheklangan",
+    "unknown": "❔ Noma'lum",
+}
+
+
+def recheck_keyboard(callback_data: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="🔄 Qayta tekshirish", callback_data=f"health_recheck:{callback_data}")
+    ]])
+
+
+def checked_at_text(rows) -> str:
+    checked = [row["checked_at"] for row in rows if row["checked_at"]]
+    if not checked:
+        return "Hali tekshirilmagan."
+    return f"Oxirgi tekshiruv: {min(checked):%d.%m.%Y %H:%M}"
+
+
+async def answer_lines(call: types.CallbackQuery, lines: list, callback_data: str):
+    """Uzun ro'yxatni 4096 belgidan oshmaydigan xabarlarga bo'lib yuborish (tugma oxirgisida)"""
+    chunks = split_lines(lines)
+    for chunk in chunks[:-1]:
+        await call.message.answer(chunk)
+    await call.message.answer(chunks[-1], reply_markup=recheck_keyboard(callback_data))
+
+
+@router.callback_query(lambda c: c.data == "view_banned", IsBotAdminFilter(ADMINS))
+async def view_banned(call: types.CallbackQuery):
+    """Banlangan va sessiyasi bekor qilingan akkauntlar (oxirgi tekshiruv natijasidan)"""
+    rows = await db.get_client_health()
+    banned = [row for row in rows if row["is_banned"] or row["authorized"] is False or row["ban_reason"]]
+
+    if not banned:
+        lines = ["✅ Banlangan akkauntlar yo'q."]
+    else:
+        lines = [f"<b>⛔ Ishlamayotgan akkauntlar: {len(banned)} ta</b>\n"]
+        for row in banned:
+            reason = BAN_REASONS.get(row["ban_reason"], "Sessiya bekor qilingan" if row["authorized"] is False
+                                     else "Banlangan")
+            since = f", {row['banned_at']:%d.%m.%Y %H:%M}" if row["banned_at"] else ""
+            lines.append(f"📱 {row['phone']} (#{row['id']}) - {reason}{since}")
+    lines.append(f"\n<i>{checked_at_text(rows)}</i>")
+
+    await answer_lines(call, lines, "view_banned")
+    await call.answer()
+
+
+@router.callback_query(lambda c: c.data == "check_spam", IsBotAdminFilter(ADMINS))
+async def check_spam(call: types.CallbackQuery):
+    """Akkauntlarning @SpamBot bo'yicha holati (oxirgi tekshiruv natijasidan)"""
+    rows = await db.get_client_health()
+    if not rows:
+        await call.answer("Hozircha akkauntlar yo'q!", show_alert=True)
+        return
+
+    lines = ["<b>⏱ Akkauntlarning spam holati</b>\n"]
+    for row in rows:
+        label = SPAM_LABELS.get(row["spam_status"] or "unknown", SPAM_LABELS["unknown"])
+        lines.append(f"📱 {row['phone']} (#{row['id']}) - {label}")
+    limited = sum(1 for row in rows if row["spam_status"] == "limited")
+    lines.append(f"\nSpam-cheklangan: {limited} / {len(rows)}")
+    lines.append(f"\n<i>{checked_at_text(rows)}</i>")
+
+    await answer_lines(call, lines, "check_spam")
+    await call.answer()
+
+
+@router.callback_query(lambda c: c.data.startswith("health_recheck:"), IsBotAdminFilter(ADMINS))
+async def recheck_accounts(call: types.CallbackQuery):
+    """Barcha akkauntlarni fonda qayta tekshirish - natija tayyor bo'lganda tugma yana bosiladi"""
+    if health_checker.trigger():
+        await call.answer("🔄 Tekshiruv boshlandi. Natijani bir necha daqiqadan keyin ko'ring.", show_alert=True)
+    else:
+        await call.answer("⏳ Tekshiruv allaqachon ketmoqda.", show_alert=True)
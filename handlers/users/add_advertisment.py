@@ -4,9 +4,9 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
-from telethon.sessions import StringSession
-from telethon.sync import TelegramClient
-from loader import db, bot
+from loader import db, bot, dialog_catalog, group_selections
+from utils.telegram import ClientUnavailableError
+from utils.scheduler import CATCH_UP_LABELS, next_catch_up_policy
 import logging
 
 router = Router()
@@ -18,6 +18,7 @@ class CreateAdvertisementStates(StatesGroup):
     waiting_for_text = State()
     selecting_duration = State()
     selecting_groups = State()
+    naming_group_set = State()
 
 
 def sanitize_text(text):
@@ -52,6 +53,7 @@ async def start_create_ad(call: types.CallbackQuery, state: FSMContext):
 
 @router.message(Command('cancel'))
 async def cancel_creation(message: types.Message, state: FSMContext):
+    group_selections.close(state.key)
     await state.clear()
     await message.answer("❌ Reklama yaratish bekor qilindi.", parse_mode="HTML")
 
@@ -114,31 +116,20 @@ async def handle_duration(call: types.CallbackQuery, state: FSMContext):
             await call.message.answer("❌ Aktiv sessiya topilmadi!", parse_mode="HTML")
             return
 
-        active_client = await db.execute(
-            "SELECT api_id, api_hash, stringsession FROM Clients WHERE id = $1;",
-            active_client_id,
-            fetchrow=True
-        )
-        if not active_client:
-            await call.message.answer("❌ Klient ma'lumotlari topilmadi!", parse_mode="HTML")
+        # Guruhlar katalogdan (ClientDialogs) olinadi - Telegram'ga faqat katalog bo'sh bo'lsa murojaat qilinadi
+        try:
+            groups = await dialog_catalog.get_groups(active_client_id)
+        except ClientUnavailableError:
+            await call.message.answer("❌ Klient ma'lumotlari topilmadi yoki faol emas!", parse_mode="HTML")
             return
 
-        async with TelegramClient(
-                StringSession(active_client["stringsession"]),
-                int(active_client["api_id"]),
-                active_client["api_hash"]
-        ) as client:
-            dialogs = await client.get_dialogs()
-            groups = [
-                {"id": dialog.id, "title": sanitize_group_title(dialog.title)}
-                for dialog in dialogs if dialog.is_group or dialog.is_channel
-            ]
-
         if not groups:
             await call.message.answer("🚫 Guruhlar topilmadi.", parse_mode="HTML")
             return
 
-        await state.update_data(available_groups=groups, selected_groups=[])
+        # Guruhlar ro'yxati va tanlov FSM'da emas, group_selections'da saqlanadi
+        group_selections.open(state.key, active_client_id, groups)
+        await state.update_data(multi_account=False, catch_up="once", client_id=active_client_id)
         await call.message.answer("📢 Reklama uchun guruhlarni tanlashni boshlang.", parse_mode="HTML")
         await show_groups_page(call.message, state, page=0)
         await state.set_state(CreateAdvertisementStates.selecting_groups)
@@ -146,24 +137,29 @@ async def handle_duration(call: types.CallbackQuery, state: FSMContext):
     except Exception as e:
         await call.message.answer(f"❌ Xatolik yuz berdi: {str(e)}", parse_mode="HTML")
 
-async def show_groups_page(message: types.Message, state: FSMContext, page: int):
+
+async def show_groups_page(message: types.Message, state: FSMContext, page: int, edit: bool = True):
+    selection = group_selections.get(state.key)
+    if selection is None:
+        await state.clear()
+        await message.answer("⌛ Guruh tanlash muddati tugadi. Reklamani qaytadan yarating.", parse_mode="HTML")
+        return
+
     data = await state.get_data()
-    groups = data.get("available_groups", [])
-    selected_groups = data.get("selected_groups", [])
+    multi_account = data.get("multi_account", False)
+    catch_up = data.get("catch_up", "once")
 
+    page = max(min(page, (selection.total - 1) // PAGE_SIZE), 0)
     start = page * PAGE_SIZE
-    end = min(start + PAGE_SIZE, len(groups))
-    current_page_groups = groups[start:end]
+    end = min(start + PAGE_SIZE, selection.total)
 
     buttons = []
-    for group in current_page_groups:
-        group_id = group['id']
-        group_title = group['title']
-        selected = "✅" if group_id in selected_groups else ""
+    for group_id, group_title, is_selected in selection.page(page, PAGE_SIZE):
+        selected = "✅" if is_selected else ""
         buttons.append([
             InlineKeyboardButton(
-                text=f"{selected} 📢 {group_title}",
-                callback_data=f"select_group:{group_id}"
+                text=f"{selected} 📢 {sanitize_group_title(group_title)}",
+                callback_data=f"select_group:{group_id}:{page}"
             )
         ])
 
@@ -172,7 +168,7 @@ async def show_groups_page(message: types.Message, state: FSMContext, page: int)
         navigation_buttons.append(
             InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"show_groups:{page - 1}")
         )
-    if end < len(groups):
+    if end < selection.total:
         navigation_buttons.append(
             InlineKeyboardButton(text="➡️ Keyingi", callback_data=f"show_groups:{page + 1}")
         )
@@ -180,12 +176,52 @@ async def show_groups_page(message: types.Message, state: FSMContext, page: int)
     if navigation_buttons:
         buttons.append(navigation_buttons)
 
+    buttons.append([
+        InlineKeyboardButton(text="☑️ Sahifani tanlash", callback_data=f"select_page:{page}"),
+        InlineKeyboardButton(
+            text="☑️ Topilganlarni tanlash" if selection.query else "☑️ Hammasini tanlash",
+            callback_data=f"select_all:{page}"
+        ),
+    ])
+    if selection.query:
+        buttons.append([
+            InlineKeyboardButton(text="❌ Qidiruvni tozalash", callback_data="clear_group_search")
+        ])
+    buttons.append([
+        InlineKeyboardButton(text="📁 Guruh to'plamlari", callback_data=f"group_sets:{page}")
+    ])
+    buttons.append([
+        InlineKeyboardButton(
+            text=f"{'✅' if multi_account else '☑️'} 🔀 Barcha akkauntlar orqali yuborish",
+            callback_data=f"toggle_multi_account:{page}"
+        )
+    ])
+    buttons.append([
+        InlineKeyboardButton(
+            text=f"⏪ Bot to'xtab qolsa o'tgan navbatlar: {CATCH_UP_LABELS[catch_up]}",
+            callback_data=f"cycle_catch_up:{page}"
+        )
+    ])
+    buttons.append([
+        InlineKeyboardButton(text="🔄 Guruhlarni yangilash", callback_data=f"refresh_groups:{page}")
+    ])
     buttons.append([
         InlineKeyboardButton(text="✅ Tanlash tugadi", callback_data="finish_selection")
     ])
 
+    text = (
+        "📢 Reklama uchun guruhlarni tanlang:\n"
+        f"Tanlangan: {selection.count} / {len(selection.catalog)}\n"
+    )
+    if selection.query:
+        text += f"🔎 \"{html.escape(selection.query)}\" bo'yicha topildi: {selection.total} ta\n"
+    text += "<i>Qidirish uchun guruh nomini yozib yuboring.</i>"
+
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-    await message.edit_text("📢 Reklama uchun guruhlarni tanlang:", reply_markup=keyboard, parse_mode="HTML")
+    if edit:
+        await message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    else:
+        await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
 @router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("show_groups:"))
@@ -196,26 +232,177 @@ async def handle_group_pagination(call: types.CallbackQuery, state: FSMContext):
 
 @router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("select_group:"))
 async def handle_group_selection(call: types.CallbackQuery, state: FSMContext):
-    group_id = int(call.data.split(":")[1])
-    data = await state.get_data()
-    selected_groups = data.get("selected_groups", [])
+    _, group_id, page = call.data.split(":")
+    selection = group_selections.get(state.key)
+    selected = selection.toggle(int(group_id)) if selection else None
 
-    if group_id in selected_groups:
-        selected_groups.remove(group_id)
-        await call.answer("❌ Guruh o'chirildi")
-    else:
-        selected_groups.append(group_id)
+    if selected is True:
         await call.answer("✅ Guruh qo'shildi")
+    elif selected is False:
+        await call.answer("❌ Guruh o'chirildi")
+    await show_groups_page(call.message, state, int(page))
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("select_page:"))
+async def handle_page_selection(call: types.CallbackQuery, state: FSMContext):
+    page = int(call.data.split(":")[1])
+    selection = group_selections.get(state.key)
+    if selection:
+        selected = selection.select_page(page, PAGE_SIZE)
+        await call.answer("✅ Sahifa tanlandi" if selected else "❌ Sahifa tanlovi bekor qilindi")
+    await show_groups_page(call.message, state, page)
 
-    await state.update_data(selected_groups=selected_groups)
-    current_page = len(selected_groups) // PAGE_SIZE
-    await show_groups_page(call.message, state, current_page)
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("select_all:"))
+async def handle_all_selection(call: types.CallbackQuery, state: FSMContext):
+    page = int(call.data.split(":")[1])
+    selection = group_selections.get(state.key)
+    if selection:
+        selected = selection.select_all()
+        await call.answer(f"✅ {selection.total} ta guruh tanlandi" if selected else "❌ Tanlov bekor qilindi")
+    await show_groups_page(call.message, state, page)
+
+
+@router.message(CreateAdvertisementStates.selecting_groups, F.text)
+async def handle_group_search(message: types.Message, state: FSMContext):
+    """Yozilgan matn bo'yicha guruhlarni nomidan qidirish"""
+    selection = group_selections.get(state.key)
+    if selection:
+        selection.set_query(message.text)
+    await show_groups_page(message, state, page=0, edit=False)
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data == "clear_group_search")
+async def handle_group_search_clear(call: types.CallbackQuery, state: FSMContext):
+    selection = group_selections.get(state.key)
+    if selection:
+        selection.set_query("")
+    await show_groups_page(call.message, state, page=0)
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("group_sets:"))
+async def handle_group_sets(call: types.CallbackQuery, state: FSMContext):
+    page = int(call.data.split(":")[1])
+    await show_group_sets(call, state, page)
+
+
+async def show_group_sets(call: types.CallbackQuery, state: FSMContext, page: int):
+    """Saqlangan guruh to'plamlari: tanlovga qo'shish, o'chirish yoki joriy tanlovni saqlash"""
+    selection = group_selections.get(state.key)
+    group_sets = await db.get_group_sets(call.from_user.id)
+
+    buttons = [
+        [
+            InlineKeyboardButton(
+                text=f"📁 {group_set['name']} ({group_set['groups_count']})",
+                callback_data=f"apply_group_set:{group_set['id']}:{page}"
+            ),
+            InlineKeyboardButton(text="🗑", callback_data=f"delete_group_set:{group_set['id']}:{page}"),
+        ]
+        for group_set in group_sets
+    ]
+    if selection and selection.count:
+        buttons.append([
+            InlineKeyboardButton(text="💾 Tanlovni to'plam sifatida saqlash", callback_data=f"save_group_set:{page}")
+        ])
+    buttons.append([
+        InlineKeyboardButton(text="⬅️ Orqaga", callback_data=f"show_groups:{page}")
+    ])
+
+    text = "📁 Guruh to'plamlari:" if group_sets else "📁 Saqlangan guruh to'plamlari yo'q."
+    keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+    await call.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("apply_group_set:"))
+async def apply_group_set(call: types.CallbackQuery, state: FSMContext):
+    _, set_id, page = call.data.split(":")
+    group_set = await db.get_group_set(int(set_id), call.from_user.id)
+    selection = group_selections.get(state.key)
+    if group_set and selection:
+        found = selection.select_ids(group_set["group_ids"])
+        missing = len(group_set["group_ids"]) - found
+        await call.answer(
+            f"✅ {found} ta guruh tanlandi" + (f", {missing} tasi bu akkauntda topilmadi" if missing else ""),
+            show_alert=bool(missing)
+        )
+    await show_groups_page(call.message, state, int(page))
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("delete_group_set:"))
+async def delete_group_set(call: types.CallbackQuery, state: FSMContext):
+    _, set_id, page = call.data.split(":")
+    await db.delete_group_set(int(set_id), call.from_user.id)
+    await call.answer("🗑 To'plam o'chirildi")
+    await show_group_sets(call, state, int(page))
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("save_group_set:"))
+async def ask_group_set_name(call: types.CallbackQuery, state: FSMContext):
+    page = int(call.data.split(":")[1])
+    await state.update_data(groups_page=page)
+    await state.set_state(CreateAdvertisementStates.naming_group_set)
+    await call.message.answer("✍️ To'plam nomini yozing (shu nomli to'plam bo'lsa almashtiriladi).", parse_mode="HTML")
+    await call.answer()
+
+
+@router.message(CreateAdvertisementStates.naming_group_set, F.text)
+async def save_group_set(message: types.Message, state: FSMContext):
+    name = message.text.strip()[:64]
+    selection = group_selections.get(state.key)
+    if name and selection and selection.count:
+        await db.save_group_set(message.from_user.id, name, selection.selected_ids())
+        await message.answer(f"💾 \"{html.escape(name)}\" to'plami saqlandi: {selection.count} ta guruh", parse_mode="HTML")
+
+    data = await state.get_data()
+    await state.set_state(CreateAdvertisementStates.selecting_groups)
+    await show_groups_page(message, state, data.get("groups_page", 0), edit=False)
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("toggle_multi_account:"))
+async def handle_multi_account_toggle(call: types.CallbackQuery, state: FSMContext):
+    page = int(call.data.split(":")[1])
+    data = await state.get_data()
+    multi_account = not data.get("multi_account", False)
+    await state.update_data(multi_account=multi_account)
+    await call.answer("🔀 Barcha akkauntlar orqali yuboriladi" if multi_account else "👤 Faqat aktiv akkaunt orqali yuboriladi")
+    await show_groups_page(call.message, state, page)
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("cycle_catch_up:"))
+async def handle_catch_up_cycle(call: types.CallbackQuery, state: FSMContext):
+    page = int(call.data.split(":")[1])
+    data = await state.get_data()
+    catch_up = next_catch_up_policy(data.get("catch_up", "once"))
+    await state.update_data(catch_up=catch_up)
+    await call.answer(f"⏪ O'tgan navbatlar: {CATCH_UP_LABELS[catch_up]}")
+    await show_groups_page(call.message, state, page)
+
+
+@router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data.startswith("refresh_groups:"))
+async def handle_groups_refresh(call: types.CallbackQuery, state: FSMContext):
+    """Katalogni Telegram'dan majburan qayta o'qish (yangi qo'shilgan guruhlar uchun)"""
+    page = int(call.data.split(":")[1])
+    data = await state.get_data()
+    client_id = data.get("client_id") or await db.get_active_client(call.from_user.id)
+    try:
+        await dialog_catalog.refresh(client_id)
+        groups = await dialog_catalog.get_groups(client_id)
+    except ClientUnavailableError:
+        await call.answer("❌ Klient ma'lumotlari topilmadi yoki faol emas!", show_alert=True)
+        return
+
+    # Katalogdan chiqib ketgan guruhlar tanlovdan ham olib tashlanadi
+    if group_selections.reload(state.key, groups):
+        await call.answer(f"🔄 Guruhlar yangilandi: {len(groups)} ta")
+    await show_groups_page(call.message, state, page)
 
 
 @router.callback_query(CreateAdvertisementStates.selecting_groups, lambda call: call.data == "finish_selection")
 async def finish_group_selection(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    selected_groups = data.get("selected_groups", [])
+    selection = group_selections.get(state.key)
+    selected_groups = selection.selected_ids() if selection else []
 
     if not selected_groups:
         await call.answer("❌ Hech bo'lmaganda bitta guruh tanlang!", show_alert=True)
@@ -232,7 +419,9 @@ async def finish_group_selection(call: types.CallbackQuery, state: FSMContext):
             duration_minutes=duration,
             created_by=created_by,
             group_ids=selected_groups,
-            photo_id=photo_id  # photo_id None bo'lsa ham muammo bo'lmaydi
+            photo_id=photo_id,  # photo_id None bo'lsa ham muammo bo'lmaydi
+            multi_account=data.get("multi_account", False),
+            catch_up=data.get("catch_up", "once")
         )
 
         if advertisement:
@@ -244,4 +433,5 @@ async def finish_group_selection(call: types.CallbackQuery, state: FSMContext):
         await call.message.answer(f"❌ Xatolik yuz berdi: {str(e)}", parse_mode="HTML")
 
     finally:
+        group_selections.close(state.key)
         await state.clear()
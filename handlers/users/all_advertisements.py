@@ -1,6 +1,7 @@
 from aiogram import Router, types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from loader import db
+from utils.scheduler import next_send_weight
 
 router = Router()
 
@@ -12,7 +13,7 @@ async def get_page_ads(page: int):
     """Berilgan sahifa uchun reklamalarni olish"""
     offset = (page - 1) * ADS_PER_PAGE
     query = """
-        SELECT id, photo_id, text, duration_minutes, created_at
+        SELECT id, photo_id, text, duration_minutes, created_at, send_weight
         FROM Advertisements
         ORDER BY created_at DESC
         LIMIT $1 OFFSET $2
@@ -26,6 +27,14 @@ async def get_total_pages():
     return (total_ads + ADS_PER_PAGE - 1) // ADS_PER_PAGE
 
 
+def ad_keyboard(ad_id: int, send_weight: float) -> InlineKeyboardMarkup:
+    """Reklama tugmalari: akkaunt navbatidagi ulush va o'chirish"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"⚖️ Ulush: x{send_weight:g}", callback_data=f"cycle_weight:{ad_id}")],
+        [InlineKeyboardButton(text="❌ O'chirish", callback_data=f"delete_ad:{ad_id}")]
+    ])
+
+
 @router.callback_query(lambda c: c.data == "list_advertisement")
 async def show_advertisements(call: types.CallbackQuery):
     """Reklamalar ro'yxatini ko'rsatish"""
@@ -56,9 +65,7 @@ async def show_ads_page(call: types.CallbackQuery, page: int):
         text += f"📅 Yaratilgan vaqt: {ad['created_at'].strftime('%Y-%m-%d %H:%M')}"
 
         # Reklama uchun tugmalar
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="❌ O'chirish", callback_data=f"delete_ad:{ad['id']}")]
-        ])
+        keyboard = ad_keyboard(ad['id'], ad['send_weight'])
 
         # Agar reklama rasmi bo'lsa, rasm bilan yuborish
         if ad['photo_id']:
@@ -88,6 +95,24 @@ async def show_ads_page(call: types.CallbackQuery, page: int):
         )
 
 
+@router.callback_query(lambda c: c.data.startswith("cycle_weight:"))
+async def cycle_send_weight(call: types.CallbackQuery):
+    """
+    Reklamaning akkaunt navbatidagi ulushini almashtirish (x1 -> x2 -> x4 -> x0.5).
+    Bir akkauntdan yuboriladigan reklamalar orasida ulushi katta reklama ko'proq navbat oladi.
+    """
+    ad_id = int(call.data.split(":")[1])
+    current = await db.execute("SELECT send_weight FROM Advertisements WHERE id = $1", ad_id, fetchval=True)
+    if current is None:
+        await call.answer("Reklama topilmadi!", show_alert=True)
+        return
+
+    weight = next_send_weight(current)
+    await db.execute("UPDATE Advertisements SET send_weight = $2 WHERE id = $1", ad_id, weight, execute=True)
+    await call.message.edit_reply_markup(reply_markup=ad_keyboard(ad_id, weight))
+    await call.answer(f"⚖️ Ulush: x{weight:g}")
+
+
 @router.callback_query(lambda c: c.data.startswith("delete_ad:"))
 async def delete_advertisement(call: types.CallbackQuery):
     """Reklamani o'chirish"""
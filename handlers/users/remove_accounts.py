@@ -1,7 +1,7 @@
 from aiogram import Router, types
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from filters.admin import IsBotAdminFilter
-from loader import db
+from loader import db, client_pool
 from data.config import ADMINS
 
 router = Router()
@@ -83,6 +83,7 @@ async def confirm_delete_client(call: types.CallbackQuery):
 
     try:
         await db.delete_client(client_id)  # Yangi metoddan foydalanish
+        await client_pool.close(client_id)  # Ochiq Telethon ulanishini yopish
         await call.message.edit_text("✅ Akkaunt muvaffaqiyatli o'chirildi!")
         await call.answer("Akkaunt o'chirildi!", show_alert=True)
 
@@ -107,6 +108,8 @@ async def toggle_client_status(call: types.CallbackQuery):
         result = await db.toggle_client_status(client_id)
         if result:
             new_status = result['is_active']
+            if not new_status:
+                await client_pool.close(client_id)
             status_text = "aktivlashtirildi" if new_status else "deaktivlashtirildi"
             await call.answer(f"Akkaunt {status_text}!", show_alert=True)
             await list_all_clients(call)
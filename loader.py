@@ -5,10 +5,18 @@ from aiogram.utils.i18n import I18n, FSMI18nMiddleware
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from utils.db.postgres import Database
+from utils.telegram.client_pool import ClientPool
+from utils.telegram.health import SessionHealthChecker
+from utils.telegram.dialogs import DialogCatalog
+from utils.group_selection import GroupSelectionStore
 from data.config import BOT_TOKEN
 
 
 db = Database()
+client_pool = ClientPool(db)
+health_checker = SessionHealthChecker(db, client_pool)
+dialog_catalog = DialogCatalog(db, client_pool)
+group_selections = GroupSelectionStore()
 bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 storage = MemoryStorage()
 dispatcher = Dispatcher(storage=storage)
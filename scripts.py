@@ -1,10 +1,29 @@
 import asyncio
+import json
 import logging
+import os
+import random
+import socket
+import uuid
 from datetime import datetime
-from telethon.sessions import StringSession
 from telethon.sync import TelegramClient
+from telethon.errors import (FileReferenceExpiredError, MediaEmptyError, FloodWaitError, RandomIdDuplicateError,
+                             PeerIdInvalidError, ChannelInvalidError)
 from telethon.tl.types import InputPhoto, Message
-from loader import db
+from loader import db, client_pool, bot
+from utils.db.postgres import ADVERTISEMENTS_CHANNEL
+from data.config import (SCHEDULER_POLL_SECONDS, SCHEDULER_LEASE_SECONDS,
+                         OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_SECONDS, OUTBOX_RETRY_MAX_SECONDS, DEAD_GROUP_FAILURES,
+                         SCHEDULER_JITTER_SECONDS, SCHEDULER_DRAIN_SECONDS, CATCH_UP_GRACE_SECONDS,
+                         CATCH_UP_BACKFILL_LIMIT, CATCH_UP_RAMP_SECONDS, SCHEDULER_MAX_RUNS, SEND_MAX_IN_FLIGHT,
+                         SEND_MAX_IN_FLIGHT_PER_ACCOUNT)
+from utils.scheduler import (TimerHeap, SystemClock, AdvertisementLogWriter, SendConcurrencyMeter, FairSendQueue,
+                             SendLimiter, WaitStats, shard_groups, phase_offset, CATCH_UP_SKIP)
+from utils.telegram import (MediaCache, PeerCache, DialogCatalog, RequestBatcher, AccountRateLimiter,
+                            AccountCircuitBreaker, ClientUnavailableError, ClientUnauthorizedError)
+from utils.telegram.sending import (build_send_request, outbox_random_id, sent_photo, is_permanent_error,
+                                    account_failure, PERMANENT_SEND_ERRORS, ACCOUNT_ERRORS)
+from utils.notify_admins import notify_admins
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,189 +33,722 @@ logger = logging.getLogger(__name__)
 
 
 class AdvertisementScheduler:
-    def __init__(self):
+    def __init__(self, clock=None, node_id: str = None, database=None, pool=None, notify=None):
         self.is_running = False
+        self.db = database or db
+        self.client_pool = pool or client_pool
+        # Bir nechta scheduler ishlaganda reklamalarni qaysi node band qilganini bildiradi
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
         self.active_tasks = {}
+        self.clock = clock or SystemClock()
+        self.timers = TimerHeap()
+        self.media_cache = MediaCache()
+        self.peer_cache = PeerCache(self.db)
+        self.dialog_catalog = DialogCatalog(self.db, self.client_pool, peer_cache=self.peer_cache, clock=self.clock)
+        self.send_batcher = RequestBatcher()
+        self.rate_limiter = AccountRateLimiter(clock=self.clock)
+        self.breaker = AccountCircuitBreaker(clock=self.clock)
+        self.send_queue = FairSendQueue(self.rate_limiter)
+        self.log_writer = AdvertisementLogWriter(self.db)
+        self.send_meter = SendConcurrencyMeter(self.clock)
+        self.send_limiter = SendLimiter(self.clock, SEND_MAX_IN_FLIGHT, SEND_MAX_IN_FLIGHT_PER_ACCOUNT)
+        self.max_runs = SCHEDULER_MAX_RUNS
+        self.run_waits = WaitStats()  # taymer vaqtidan reklama ishga tushguncha kechikish
+        self._wakeup = asyncio.Event()
+        self._draining = asyncio.Event()
+        self._ramp_start = 0.0  # ishga tushgan vaqt - undan oldingi navbatlar tarqatib yuboriladi
+        self._notify_tasks = set()
+        self._leases = {}  # ad_id -> shu node band qilgan navbatni yuborayotgan task
+        self._heartbeat_task = None
+        self._resync = False
+        # Adminlarga xabar yuborish (benchmarkda bot o'rniga yig'uvchi beriladi)
+        self.notify = notify or (lambda text: notify_admins(bot, text))
+        self._failing_groups = set()  # xatoliklar hisobi bor (client_id, group_id) juftliklari
+        self._pruned_groups = {}  # ad_id -> [(group_id, client_id, xato, olib tashlandimi)]
 
     async def start(self):
         """Schedulerni ishga tushirish"""
         if self.is_running:
             return
         self.is_running = True
+        self._draining.clear()
+        self._ramp_start = self.clock.now()
+        await self.restore_cooldowns()
+        await self.log_writer.start()
         self.scheduler_task = asyncio.create_task(self.schedule_advertisements())
+        self.listener_task = asyncio.create_task(self.listen_advertisement_changes())
         logger.info("Reklama tarqatuvchi ishga tushirildi.")
 
-    async def stop(self):
-        """Schedulerni to'xtatish"""
+    async def stop(self, drain_seconds: float = SCHEDULER_DRAIN_SECONDS):
+        """
+        Schedulerni to'xtatish (drain).
+
+        Yangi navbatlar va outbox qatorlari olinmaydi, boshlangan yuborishlar
+        `drain_seconds` ichida tugatiladi. Tugamaganlari bekor qilinadi va
+        checkpoint qilinadi: yuborilmagan qatorlar pending'ga qaytadi, lease esa
+        darhol bo'shatiladi - qayta ishga tushganda navbat shu joyidan davom etadi.
+        """
         self.is_running = False
+        self._draining.set()
+        if hasattr(self, "listener_task"):
+            self.listener_task.cancel()
+            try:
+                await self.listener_task
+            except asyncio.CancelledError:
+                pass
         if hasattr(self, "scheduler_task"):
             self.scheduler_task.cancel()
             try:
                 await self.scheduler_task
             except asyncio.CancelledError:
-                logger.info("Reklama tarqatuvchi to'xtatildi.")
+                pass
+        for task in list(self._notify_tasks):
+            task.cancel()
 
-    async def send_advertisement(self, client: TelegramClient, group_id: int, photo_data: dict, text: str):
-        """Rasm yoki matnni yuborish"""
+        tasks = [task for task in self.active_tasks.values() if not task.done()]
+        if tasks:
+            logger.info(f"Boshlangan yuborishlar tugatilmoqda: reklamalar={len(tasks)}, muddat={drain_seconds}s")
+            _, pending = await asyncio.wait(tasks, timeout=drain_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                logger.warning(f"Muddatda tugamagan reklamalar checkpoint qilindi: {len(pending)} ta")
+        self.reap_finished_tasks()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        await self.send_queue.close()
+        await self.send_batcher.close()
+        await self.log_writer.stop()
+        logger.info("Reklama tarqatuvchi to'xtatildi.")
+
+    async def send_advertisement(self, client: TelegramClient, client_id: int, ad: dict, group_id: int, photo=None,
+                                 random_id: int = None):
+        """Rasm yoki matnni yuborish (bir xil random_id qayta yuborilsa Telegram uni rad etadi)"""
         try:
-            if photo_data:
+            peer = await self.peer_cache.get_input_peer(client_id, client, group_id)
+            if photo is not None:
+                message_id = int(ad["photo_id"])
                 try:
-                    # Get the message
-                    message = await client.get_messages('me', ids=photo_data["message_id"])
-
-                    if message and message.photo:
-                        # Upload the photo file first
-                        uploaded_file = await client.upload_file(await message.download_media())
-                        # Then send with caption
-                        await client.send_file(
-                            group_id,
-                            file=uploaded_file,
-                            caption=text,
-                            parse_mode='html'
-                        )
-                    else:
-                        logger.warning(f"Photo not found for message {photo_data['message_id']}, sending text only")
-                        await client.send_message(group_id, text, parse_mode='html')
+                    try:
+                        request = build_send_request(peer, ad["text"], photo, random_id)
+                        result = await self.send_batcher.call(client_id, client, request)
+                    except (FileReferenceExpiredError, MediaEmptyError):
+                        # Keshdagi havola eskirgan - yangilab, bir marta qayta urinamiz
+                        self.media_cache.invalidate(client_id, message_id)
+                        photo = await self.media_cache.get_photo(client_id, client, message_id)
+                        if photo is None:
+                            raise
+                        request = build_send_request(peer, ad["text"], photo, random_id)
+                        result = await self.send_batcher.call(client_id, client, request)
+                    self.media_cache.remember_sent(client_id, message_id, sent_photo(result))
+                except (FloodWaitError, RandomIdDuplicateError, *PERMANENT_SEND_ERRORS, *ACCOUNT_ERRORS):
+                    # Akkaunt cheklovi, guruhga yozib bo'lmaydi yoki xabar allaqachon yuborilgan -
+                    # matn bilan urinib ko'rmaymiz
+                    raise
                 except Exception as e:
                     logger.error(f"Error sending photo: {str(e)}")
                     # Fallback to sending text only
-                    await client.send_message(group_id, text, parse_mode='html')
+                    request = build_send_request(peer, ad["text"], random_id=random_id)
+                    await self.send_batcher.call(client_id, client, request)
             else:
-                await client.send_message(group_id, text, parse_mode='html')
+                request = build_send_request(peer, ad["text"], random_id=random_id)
+                await self.send_batcher.call(client_id, client, request)
 
-            await self.log_sent_advertisement(group_id)
             logger.info(f"Reklama yuborildi: guruh={group_id}")
 
         except Exception as e:
             logger.error(f"Reklamani yuborishda xatolik: guruh={group_id}, xato={str(e)}")
             raise e
 
-    async def get_photo_access_hash(self, client: TelegramClient, message_id: int) -> dict:
-        """Rasmning access_hash ma'lumotlarini olish"""
+    async def send_to_group(self, client: TelegramClient, client_id: int, ad: dict, row, photo=None):
+        """
+        Akkauntning adolatli navbati va token-bucket'idan ruxsat olib, bitta outbox qatorini yuborish.
+
+        Akkaunt breaker'i ochiq bo'lsa so'rov yuborilmaydi - qator send_with_account
+        oxirida boshqa akkauntga o'tkaziladi.
+        """
+        if self.breaker.is_open(client_id):
+            return
+        await self.send_queue.turn(client_id, ad["id"], ad["created_by"], ad.get("send_weight") or 1.0)
+        if self.breaker.is_open(client_id):
+            return
         try:
-            message = await client.get_messages('me', ids=message_id)
-
-            if not message or not message.photo:
-                logger.error(f"Message {message_id} not found or contains no photo")
-                return None
-
-            # Download and verify the photo exists
-            media_path = await message.download_media()
-            if not media_path:
-                logger.error(f"Could not download photo from message {message_id}")
-                return None
-
-            return {
-                "message_id": message_id,
-                "media_path": media_path
-            }
+            async with self.send_limiter.slot(client_id):
+                with self.send_meter.track():
+                    await self.send_advertisement(
+                        client, client_id, ad, row["group_id"], photo,
+                        random_id=outbox_random_id(row["idempotency_key"])
+                    )
+        except RandomIdDuplicateError:
+            # Oldingi urinishda (masalan yiqilgan node) yuborilgan - takrorlamaymiz
+            logger.info(f"Reklama avval yuborilgan: guruh={row['group_id']}, reklama={ad['id']}")
+        except FloodWaitError as e:
+            # Butun akkaunt to'xtatiladi, qator cooldown tugagach qayta uriniladi
+            paused_until = await self.handle_flood_wait(client_id, e.seconds)
+            await self.retry_outbox_row(row, str(e), min_delay=paused_until - self.clock.now())
+            return
         except Exception as e:
-            logger.error(f"Rasmni olishda xatolik: {str(e)}")
-            return None
+            if is_permanent_error(e):
+                await self.handle_dead_group(ad, client_id, row, e)
+                return
+            if account_failure(e) and await self.handle_account_failure(client_id, e):
+                return
+            logger.error(f"Guruhga yuborishda xatolik: guruh={row['group_id']}, xato={str(e)}")
+            await self.retry_outbox_row(row, str(e))
+            return
+
+        self.breaker.record_success(client_id)
+        self.log_writer.add(ad["id"], row["group_id"], sent_at=self.current_time(), outbox_id=row["id"])
+        if self.rate_limiter.record_success(client_id):
+            await self.db.set_client_cooldown(client_id, None, None)
+        if (client_id, row["group_id"]) in self._failing_groups:
+            self._failing_groups.discard((client_id, row["group_id"]))
+            await self.db.clear_group_failures(client_id, row["group_id"])
 
-    async def process_advertisement(self, ad: dict):
-        """Bitta reklamani qayta ishlash"""
+    async def handle_account_failure(self, client_id: int, error: Exception, reason: str = None) -> bool:
+        """
+        Akkaunt xatoligini breaker'ga berish; breaker ochilsa akkaunt bazada o'chiriladi
+        (banned/spam - is_banned, deauthorized - is_active) va puldan chiqariladi.
+
+        :return: True - akkaunt endi ishlatilmaydi (qatorlari boshqa akkauntga o'tkaziladi)
+        """
+        reason = self.breaker.record_failure(client_id, error, reason)
+        if reason:
+            logger.error(f"Akkaunt yuborishdan chiqarildi: client={client_id}, sabab={reason}, xato={str(error)}")
+            try:
+                await self.db.disable_client(client_id, reason, banned=reason != "deauthorized")
+            except Exception as e:
+                logger.error(f"Akkaunt holatini yozishda xatolik: client={client_id}, xato={str(e)}")
+            await self.client_pool.close(client_id)
+            try:
+                client = await self.db.get_client_by_id(client_id)
+                await self.notify(
+                    f"<b>🚫 Akkaunt yuborishdan chiqarildi</b>\n"
+                    f"Client: {client_id} ({client.get('phone') if client else '-'})\n"
+                    f"Sabab: {reason} ({type(error).__name__})"
+                )
+            except Exception as e:
+                logger.error(f"Akkaunt haqida xabar yuborishda xatolik: client={client_id}, xato={str(e)}")
+        return self.breaker.is_open(client_id)
+
+    async def reroute_account_rows(self, ad: dict, client_id: int, error: str):
+        """
+        Ishlamayotgan akkauntning yuborilmagan qatorlarini boshqa akkauntlarga o'tkazish.
+
+        multi_account reklamada guruhlar a'zo bo'lgan faol akkauntlarga bo'linadi;
+        o'tkazib bo'lmaganlari (bitta akkauntli reklama) failed bo'ladi - keyingi
+        navbatlarda akkaunt faol bo'lmagani uchun reklama yuborilmay turadi.
+        """
+        slot = ad["next_run_at"]
+        groups = await self.db.get_unsent_outbox_groups(ad["id"], slot, client_id)
+        if not groups:
+            return
+        plan = {}
+        if ad.get("multi_account"):
+            plan = await self.plan_multi_account(dict(ad, group_ids=groups))
+            plan.pop(client_id, None)
+            if plan:
+                await self.db.reassign_outbox_rows(ad["id"], slot, client_id, plan)
+        moved = sum(len(group_ids) for group_ids in plan.values())
+        if moved < len(groups):
+            await self.db.fail_outbox_rows(ad["id"], slot, client_id, error)
+        logger.warning(f"Akkaunt qatorlari o'tkazildi: reklama={ad['id']}, client={client_id}, "
+                       f"o'tkazildi={moved}, to'xtatildi={len(groups) - moved}")
+
+    async def handle_dead_group(self, ad: dict, client_id: int, row, error: Exception):
+        """
+        Doimiy xatolik (guruhdan chiqqan, banlangan, yozish huquqi yo'q).
+
+        Qator qayta urinilmaydi. Akkaunt + guruh uchun xatoliklar DEAD_GROUP_FAILURES
+        ga yetsa guruh reklamadan olib tashlanadi (yoki multi_account reklamada
+        boshqa akkauntga qoldiriladi) va navbat oxirida adminga hisobot yuboriladi.
+        """
+        group_id = row["group_id"]
+        if isinstance(error, (PeerIdInvalidError, ChannelInvalidError)):
+            # access_hash eskirgan bo'lishi mumkin - keyingi safar qaytadan aniqlanadi
+            await self.peer_cache.forget(client_id, group_id)
+        await self.db.reschedule_outbox_row(row["id"], "failed", 0, str(error))
+        failures, is_dead = await self.db.record_group_failure(client_id, group_id, str(error), DEAD_GROUP_FAILURES)
+        self._failing_groups.add((client_id, group_id))
+        if not is_dead:
+            logger.warning(f"Guruhga yozib bo'lmadi: guruh={group_id}, client={client_id}, "
+                           f"urinish={failures}/{DEAD_GROUP_FAILURES}, xato={str(error)}")
+            return
+        removed = await self.db.remove_dead_group(ad["id"], group_id)
+        logger.warning(f"O'lik guruh aniqlandi: guruh={group_id}, client={client_id}, reklama={ad['id']}, "
+                       f"olib tashlandi={removed}")
+        self._pruned_groups.setdefault(ad["id"], []).append((group_id, client_id, type(error).__name__, removed))
+
+    async def report_pruned_groups(self, ad_id: int):
+        """Navbat davomida aniqlangan o'lik guruhlar haqida adminga bitta xabar"""
+        pruned = self._pruned_groups.pop(ad_id, None)
+        if not pruned:
+            return
+        lines = [f"<b>Reklama #{ad_id}: {len(pruned)} ta guruhga yozib bo'lmayapti</b>\n"]
+        for group_id, client_id, error, removed in pruned:
+            action = "ro'yxatdan olib tashlandi" if removed else "boshqa akkauntga o'tkaziladi"
+            lines.append(f"• <code>{group_id}</code> (client {client_id}, {error}) - {action}")
         try:
-            client_info = await db.get_client_for_advertisement(ad["created_by"])
-            if not client_info:
-                logger.error(f"Foydalanuvchi uchun aktiv client topilmadi: {ad['created_by']}")
-                return
+            await self.notify("\n".join(lines))
+        except Exception as e:
+            logger.error(f"O'lik guruhlar hisobotini yuborishda xatolik: reklama={ad_id}, xato={str(e)}")
 
-            async with TelegramClient(
-                    StringSession(client_info["stringsession"]),
-                    int(client_info["api_id"]),
-                    client_info["api_hash"]
-            ) as client:
-                await client.connect()
+    async def retry_outbox_row(self, row, error: str, min_delay: float = 0):
+        """
+        Outbox qatorini eksponensial kutish bilan qayta navbatga qo'yish yoki failed qilish.
+        `min_delay` - kamida shuncha soniya kutiladi (FloodWait cooldown'i).
+        """
+        if row["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+            await self.db.reschedule_outbox_row(row["id"], "failed", 0, error)
+            logger.error(f"Guruhga yuborish butunlay muvaffaqiyatsiz: outbox={row['id']}, guruh={row['group_id']}")
+            return
+        delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (row["attempts"] - 1), OUTBOX_RETRY_MAX_SECONDS)
+        await self.db.reschedule_outbox_row(row["id"], "pending", delay, error, min_delay)
 
-                if not await client.is_user_authorized():
-                    logger.error(f"Client avtorizatsiyadan o'tmagan: {ad['created_by']}")
-                    return
+    async def handle_flood_wait(self, client_id: int, seconds: int) -> float:
+        """Akkauntni FloodWait muddatiga to'xtatish va holatni bazaga yozish"""
+        paused_until, rate = self.rate_limiter.penalize(client_id, seconds)
+        logger.warning(f"FloodWait: client={client_id}, kutish={seconds}s, yangi tezlik={rate:.3f}/s")
+        try:
+            await self.db.set_client_cooldown(client_id, paused_until - self.clock.now(), rate)
+        except Exception as e:
+            logger.error(f"Cooldown holatini saqlashda xatolik: client={client_id}, xato={str(e)}")
+        return paused_until
 
-                photo_data = None
-                if ad["photo_id"]:
-                    photo_data = await self.get_photo_access_hash(client, ad["photo_id"])
-                    if not photo_data:
-                        logger.error(f"Rasm ma'lumotlarini olishda xatolik: {ad['id']}")
-                        return
+    async def restore_cooldowns(self):
+        """Qayta ishga tushganda akkauntlarning FloodWait holatini tiklash"""
+        try:
+            rows = await self.db.get_client_cooldowns()
+        except Exception as e:
+            logger.error(f"Cooldown holatini o'qishda xatolik: {str(e)}")
+            return
+        now = self.clock.now()
+        for row in rows:
+            paused_until = now + row["cooldown_seconds"] if row["cooldown_seconds"] else None
+            self.rate_limiter.restore(row["id"], paused_until, row["current_rate"])
 
-                for group_id in ad["group_ids"]:
-                    try:
-                        await self.send_advertisement(client, group_id, photo_data, ad["text"])
-                        await asyncio.sleep(2)  # Guruhlar orasida kutish
-                    except Exception as e:
-                        logger.error(f"Guruhga yuborishda xatolik: guruh={group_id}, xato={str(e)}")
-                        continue
+    async def process_advertisement(self, ad: dict) -> bool:
+        """
+        Bitta reklama navbatini outbox orqali yuborish.
+
+        Navbat (ad_id, group_id, slot) qatorlariga yoyiladi va yuborilmaganlari
+        tugaguncha qayta urinib turiladi. Qatorlar allaqachon mavjud bo'lsa
+        (qayta ishga tushish yoki boshqa node'dan olingan) faqat qolganlari yuboriladi.
+
+        :return: False - navbat scheduler to'xtatilgani uchun yarim qoldi
+        """
+        slot = ad["next_run_at"]
+        try:
+            if not await self.db.count_outbox_rows(ad["id"], slot):
+                plan = await self.plan_advertisement(ad)
+                if not plan:
+                    logger.error(f"Foydalanuvchi uchun aktiv client topilmadi: {ad['created_by']}")
+                    # Yuboradigan akkaunt yo'q - navbat yakunlanadi, aks holda har poll'da qayta olinadi
+                    return True
+                await self.db.create_outbox_rows(ad["id"], slot, plan)
+            else:
+                logger.info(f"Reklama navbati davom ettirilmoqda: reklama={ad['id']}, navbat={slot}")
+                await self.configure_rates(ad)
+
+            if not await self.drain_outbox(ad, slot):
+                return False
+            await self.db.prune_outbox(ad["id"], slot)
 
         except Exception as e:
             logger.error(f"Reklamani qayta ishlashda xatolik: reklama={ad['id']}, xato={str(e)}")
+        finally:
+            await self.report_pruned_groups(ad["id"])
+        return True
+
+    async def plan_advertisement(self, ad: dict) -> dict:
+        """Qaysi akkaunt qaysi guruhlarga yuborishi: {client_id: [group_id, ...]}"""
+        client_info = await self.db.get_client_for_advertisement(ad["created_by"])
+        if client_info:
+            self.rate_limiter.configure(client_info["id"], client_info["send_rate"], client_info["send_burst"])
+        if ad.get("multi_account"):
+            return await self.plan_multi_account(ad, client_info["id"] if client_info else None)
+        if client_info:
+            return {client_info["id"]: list(ad["group_ids"])}
+        return {}
+
+    async def configure_rates(self, ad: dict):
+        """
+        Davom ettirilayotgan navbat akkauntlarining tezligini sozlash.
+        Reja tuzilmagani uchun (boshqa node yoki qayta ishga tushish) plan_advertisement buni qilmagan.
+        """
+        if ad.get("multi_account"):
+            rows = await self.db.get_sending_clients()
+        else:
+            row = await self.db.get_client_for_advertisement(ad["created_by"])
+            rows = [row] if row else []
+        for row in rows:
+            self.rate_limiter.configure(row["id"], row["send_rate"], row["send_burst"])
+
+    async def drain_outbox(self, ad: dict, slot) -> bool:
+        """
+        Navbatdagi pending qatorlarni yuborish; qayta urinishlarni vaqti kelguncha kutish.
+
+        :return: False - scheduler to'xtatilmoqda, qolgan qatorlar olinmadi
+        """
+        while True:
+            if self._draining.is_set():
+                return False
+            rows = await self.db.claim_outbox_rows(ad["id"], slot, self.node_id)
+            by_client = {}
+            for row in rows:
+                by_client.setdefault(row["client_id"], []).append(row)
+            await asyncio.gather(*(
+                self.send_with_account(ad, client_id, client_rows)
+                for client_id, client_rows in by_client.items()
+            ))
+
+            delay = await self.db.next_outbox_attempt_delay(ad["id"], slot)
+            if delay is None:
+                break
+            # Hech narsa olinmagan bo'lsa (vaqti endi kelgan qator) kamida 1 soniya kutamiz.
+            # To'xtatish boshlansa kutish darhol uziladi
+            await self.clock.wait(self._draining, max(delay, 0 if rows else 1))
+        await self.log_writer.flush()
+        return True
+
+    async def send_with_account(self, ad: dict, client_id: int, rows: list):
+        """Reklamani bitta akkaunt orqali berilgan outbox qatorlariga yuborish"""
+        if self.breaker.is_open(client_id):
+            await self.reroute_account_rows(ad, client_id, f"Akkaunt ishlamayapti: {self.breaker.reason(client_id)}")
+            return
+        try:
+            async with self.client_pool.lease(client_id) as client:
+                photo = None
+                if ad["photo_id"]:
+                    photo = await self.media_cache.get_photo(client_id, client, int(ad["photo_id"]))
+                    if photo is None:
+                        raise ValueError(f"Rasm ma'lumotlarini olishda xatolik: {ad['id']}")
+                await self.peer_cache.load(client_id, [row["group_id"] for row in rows])
+
+                # Guruhlarga parallel yuboramiz, tezlik va reklamalar o'rtasidagi navbatni
+                # akkauntning adolatli navbati (FairSendQueue) belgilaydi
+                await asyncio.gather(*(
+                    self.send_to_group(client, client_id, ad, row, photo)
+                    for row in rows
+                ))
+                logger.info(f"Reklama tarqatildi: reklama={ad['id']}, client={client_id}, "
+                            f"guruhlar={len(rows)}, limit={self.rate_limiter.stats().get(client_id)}")
+
+        except ClientUnauthorizedError as e:
+            await self.handle_account_failure(client_id, e, reason="deauthorized")
+            await self.reroute_account_rows(ad, client_id, str(e))
+            return
+        except ClientUnavailableError as e:
+            # Akkaunt o'chirilgan yoki banlangan (boshqa node yoki admin tomonidan)
+            await self.reroute_account_rows(ad, client_id, str(e))
+            return
+        except Exception as e:
+            if account_failure(e) and await self.handle_account_failure(client_id, e):
+                await self.reroute_account_rows(ad, client_id, str(e))
+                return
+            logger.error(f"Client ishlatib bo'lmaydi: reklama={ad['id']}, client={client_id}, xato={str(e)}")
+            for row in rows:
+                await self.retry_outbox_row(row, str(e))
+            return
+
+        if self.breaker.is_open(client_id):
+            await self.reroute_account_rows(ad, client_id, f"Akkaunt ishlamayapti: {self.breaker.reason(client_id)}")
+
+    async def plan_multi_account(self, ad: dict, owner_client_id: int = None) -> dict:
+        """Guruhlarni a'zo bo'lgan barcha faol akkauntlar o'rtasida tezligiga qarab bo'lish"""
+        clients = await self.db.get_sending_clients()
+        for row in clients:
+            self.rate_limiter.configure(row["id"], row["send_rate"], row["send_burst"])
+        await self.refresh_memberships([row["id"] for row in clients])
+
+        members = {}
+        for row in await self.db.get_group_members(list(ad["group_ids"])):
+            members.setdefault(row["group_id"], set()).add(row["client_id"])
+
+        stats = self.rate_limiter.stats()
+        budgets = {
+            row["id"]: (stats[row["id"]]["rate"], stats[row["id"]]["wait_seconds"])
+            for row in clients
+        }
+
+        plan, unassigned = shard_groups(list(ad["group_ids"]), members, budgets, fallback=owner_client_id)
+        if unassigned:
+            logger.warning(f"Guruhlarga a'zo akkaunt topilmadi: reklama={ad['id']}, guruhlar={unassigned}")
+        return plan
+
+    async def refresh_memberships(self, client_ids: list):
+        """Akkauntlarning guruh a'zoligini (ClientDialogs) eskirgan bo'lsa yangilash"""
+        await self.dialog_catalog.refresh_stale(client_ids)
 
     async def schedule_advertisements(self):
-        """Reklamalarni rejalashtirish"""
+        """Reklamalarni rejalashtirish: keyingi reklama vaqti kelguncha uxlaydi"""
+        next_poll = 0
         while self.is_running:
             try:
-                current_time = datetime.now()
-                ads = await self.get_active_advertisements()
-
-                for ad in ads:
-                    if await self.should_send_advertisement(ad, current_time):
-                        if ad["id"] not in self.active_tasks or self.active_tasks[ad["id"]].done():
-                            task = asyncio.create_task(self.process_advertisement(ad))
-                            self.active_tasks[ad["id"]] = task
-
-                # Add 5 second buffer to duration_minutes
-                next_check = ad['duration_minutes'] * 60  # Convert to seconds
-                await asyncio.sleep(next_check + 5)
-
-                completed_tasks = [ad_id for ad_id, task in self.active_tasks.items() if task.done()]
-                for ad_id in completed_tasks:
-                    task = self.active_tasks.pop(ad_id)
-                    try:
-                        exc = task.exception()
-                        if exc:
-                            logger.error(f"Task xatolik bilan tugadi: reklama={ad_id}, xato={str(exc)}")
-                    except asyncio.CancelledError:
-                        pass
+                if self._resync or self.clock.now() >= next_poll:
+                    self._resync = False
+                    await self.sync_timers()
+                    next_poll = self.clock.now() + SCHEDULER_POLL_SECONDS
+                    self.log_send_load()
+
+                self.fire_due_advertisements(self.clock.now())
+                self.reap_finished_tasks()
+
+                next_fire = self.timers.next_fire_time()
+                if next_fire is None or self.free_run_slots() <= 0:
+                    # Navbat to'la - biror reklama tugashini (wakeup) yoki poll'ni kutamiz
+                    deadline = next_poll
+                else:
+                    deadline = min(next_poll, next_fire)
+                self._wakeup.clear()
+                await self.clock.wait(self._wakeup, deadline - self.clock.now())
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Scheduler asosiy tsiklida xatolik: {str(e)}")
-                await asyncio.sleep(60)
-
-    async def should_send_advertisement(self, ad: dict, current_time: datetime) -> bool:
-        """Reklamani yuborish kerakligini tekshirish"""
-        last_sent = ad.get("last_sent")
-        duration_minutes = ad["duration_minutes"]
-
-        if not last_sent:
-            return True
-
-        elapsed_minutes = (current_time - last_sent).total_seconds() / 60
-        return elapsed_minutes >= duration_minutes
-
-    async def get_active_advertisements(self) -> list:
-        """Faol reklamalarni olish"""
-        query = """
-        SELECT 
-            a.id, 
-            a.photo_id, 
-            a.text, 
-            a.duration_minutes, 
-            a.created_by, 
-            a.group_ids, 
-            a.created_at, 
-            a.is_active, 
-            COALESCE(MAX(l.sent_at), a.created_at) as last_sent
-        FROM Advertisements a
-        LEFT JOIN AdvertisementLogs l ON a.id = l.ad_id
-        WHERE a.is_active = TRUE
-        GROUP BY a.id
+                await self.clock.sleep(60)
+
+    def log_send_load(self):
+        """Oxirgi daqiqalardagi soniyalik yuborish yuklamasi (peak va o'rtacha yaqin bo'lsa - tekis)"""
+        load = self.send_meter.snapshot()
+        if load["peak_per_s"]:
+            logger.info(f"Yuborish yuklamasi: peak={load['peak_per_s']}/s, o'rtacha={load['mean_per_s']}/s, "
+                        f"p99={load['p99_per_s']}/s, bo'sh soniyalar={load['idle_share']:.0%}, "
+                        f"parallel={load['peak_in_flight']}")
+        metrics = self.metrics()
+        if metrics["run_queue_depth"] or metrics["sends"]["waiting"] or metrics["pool"]["waiting"]:
+            logger.info(f"Navbatlar: reklamalar={metrics['runs_active']}/{self.max_runs}, "
+                        f"kutayotgan reklamalar={metrics['run_queue_depth']}, "
+                        f"kutish p99={metrics['run_wait']['p99_s']}s, "
+                        f"yuborishlar={metrics['sends']['in_flight']}/{metrics['sends']['limit']} "
+                        f"(kutmoqda {metrics['sends']['waiting']}), "
+                        f"ulanishlar={metrics['pool']['connected']}/{metrics['pool']['max']} "
+                        f"(kutmoqda {metrics['pool']['waiting']})")
+
+    def metrics(self) -> dict:
+        """Scheduler navbatlari va cheklovlar holati (chuqurlik va kutish vaqtlari)"""
+        return {
+            "runs_active": sum(1 for task in self.active_tasks.values() if not task.done()),
+            "run_queue_depth": self.timers.due_count(self.clock.now()),
+            "run_wait": self.run_waits.snapshot(),
+            "sends": self.send_limiter.snapshot(),
+            "pool": self.client_pool.stats(),
+        }
+
+    def wakeup(self):
+        """Scheduler uyqusini darhol to'xtatish (taymerlar o'zgarganda)"""
+        self._wakeup.set()
+
+    async def listen_advertisement_changes(self):
+        """Advertisements o'zgarishlarini LISTEN/NOTIFY orqali kuzatish (uzilsa qayta ulanadi)"""
+        while self.is_running:
+            connection = None
+            try:
+                connection = await self.db.create_listener(ADVERTISEMENTS_CHANNEL, self._on_notify)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                logger.info("Reklama o'zgarishlari kuzatilmoqda (LISTEN).")
+                await closed.wait()
+                logger.warning("LISTEN ulanishi uzildi, qayta ulanamiz.")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"LISTEN ulanishida xatolik: {str(e)}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            # Uzilish paytida o'tkazib yuborilgan o'zgarishlarni poll orqali olamiz
+            self._resync = True
+            self.wakeup()
+            await asyncio.sleep(5)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Noto'g'ri NOTIFY xabari: {payload}")
+            return
+        task = asyncio.create_task(self.on_advertisement_changed(data["op"], data["id"]))
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    async def on_advertisement_changed(self, op: str, ad_id: int):
+        """Bitta reklama o'zgarganda uning taymerini darhol yangilash"""
+        ad = None if op == "DELETE" else await self.db.get_advertisement_schedule(ad_id)
+        if not ad or not ad["is_active"] or ad["duration_minutes"] <= 0:
+            self.timers.cancel(ad_id)
+            task = self.active_tasks.get(ad_id)
+            if task and not task.done():
+                task.cancel()
+            logger.info(f"Reklama rejadan olib tashlandi: reklama={ad_id}")
+        elif ad["next_run_at"].timestamp() <= self.clock.now() + SCHEDULER_POLL_SECONDS:
+            self.timers.schedule(ad_id, self.fire_time(ad_id, ad["next_run_at"]), dict(ad))
+        else:
+            # Navbati uzoq - keyingi poll'larning birida olinadi
+            self.timers.cancel(ad_id)
+        self.wakeup()
+
+    async def sync_timers(self):
+        """Keyingi poll'gacha vaqti keladigan reklamalarni taymerlarga qo'shish"""
+        horizon = self.clock.now() + SCHEDULER_POLL_SECONDS
+        for ad in await self.get_due_advertisements(datetime.fromtimestamp(horizon)):
+            if ad["id"] in self.active_tasks and not self.active_tasks[ad["id"]].done():
+                # Hali yuborilmoqda - tugagach keyingi vaqtga o'zi qo'yiladi
+                continue
+            self.timers.schedule(ad["id"], self.fire_time(ad["id"], ad["next_run_at"]), dict(ad))
+
+    def free_run_slots(self) -> int:
+        return self.max_runs - sum(1 for task in self.active_tasks.values() if not task.done())
+
+    def fire_due_advertisements(self, now: float):
         """
+        Vaqti kelgan reklamalarni ishga tushirish.
+
+        Bir vaqtda ko'pi bilan SCHEDULER_MAX_RUNS ta reklama yuboriladi; qolganlari
+        taymerda qoladi va bazadan band qilinmaydi (boshqa node olishi mumkin).
+        """
+        free = self.free_run_slots()
+        if free <= 0:
+            return
+        for ad_id, fire_at, ad in self.timers.pop_due(now, limit=free):
+            if ad_id not in self.active_tasks or self.active_tasks[ad_id].done():
+                task = asyncio.create_task(self.run_advertisement(ad_id))
+                task.add_done_callback(lambda _: self.wakeup())
+                self.active_tasks[ad_id] = task
+                self.run_waits.record(now - fire_at)
+            else:
+                logger.warning(f"Reklama hali yuborilmoqda, navbat o'tkazib yuborildi: reklama={ad_id}")
+
+    async def run_advertisement(self, ad_id: int):
+        """Reklama navbatini bazada band qilish, yuborish va keyingi navbatni rejalashtirish"""
+        ad = await self.db.claim_advertisement_run(
+            ad_id, self.node_id, SCHEDULER_LEASE_SECONDS, CATCH_UP_BACKFILL_LIMIT
+        )
+        if not ad:
+            # O'chirilgan, faolsizlantirilgan, navbati kelmagan yoki boshqa node olgan
+            return
+        ad = dict(ad)
+        due_at = ad.pop("due_at").timestamp()
+        if ad.pop("previous_owner"):
+            logger.warning(f"Lease muddati o'tgan reklama qayta olindi: reklama={ad_id}, node={self.node_id}")
+        elif ad.get("catch_up") == CATCH_UP_SKIP and self.missed_seconds(due_at) > CATCH_UP_GRACE_SECONDS:
+            # Navbat o'tib ketgan - yubormaymiz, next_run_at allaqachon keyingi navbatga tekislangan
+            logger.info(f"O'tib ketgan navbat tashlab yuborildi: reklama={ad_id}, "
+                        f"kechikish={self.missed_seconds(due_at):.0f}s")
+            await self.db.finish_advertisement_run(ad_id, self.node_id)
+            self.schedule_next_run(ad)
+            return
+
+        self.hold_lease(ad_id, asyncio.current_task())
+        try:
+            completed = await self.process_advertisement(ad)
+        except asyncio.CancelledError:
+            await self.checkpoint_advertisement(ad)
+            raise
+        finally:
+            self._leases.pop(ad_id, None)
+        if not completed and self._draining.is_set():
+            await self.checkpoint_advertisement(ad)
+            return
+        await self.db.finish_advertisement_run(ad_id, self.node_id)
+        self.schedule_next_run(ad)
+
+    def schedule_next_run(self, ad: dict):
+        """Keyingi navbat yaqin bo'lsa poll'ni kutmasdan taymerga qo'yish"""
+        if self.is_running and ad["next_run_at"].timestamp() <= self.clock.now() + SCHEDULER_POLL_SECONDS:
+            self.timers.schedule(ad["id"], self.fire_time(ad["id"], ad["next_run_at"]), ad)
+            self.wakeup()
+
+    def missed_seconds(self, due_at: float) -> float:
+        """Navbat qancha kechikdi (ishga tushishdagi tarqatish kechikishi hisobga olinmaydi)"""
+        if due_at < self._ramp_start:
+            return self._ramp_start - due_at
+        return self.clock.now() - due_at
+
+    async def checkpoint_advertisement(self, ad: dict):
+        """
+        Yarim qolgan navbatni saqlash: avval yuborilganlar loglari (va outbox `done`)
+        yoziladi, qolgan `sending` qatorlar pending'ga qaytadi va lease bo'shatiladi.
+        Bazaga yetib bormagan yuborish qayta urinilganda bir xil random_id tufayli
+        Telegram uni takrorlamaydi.
+        """
+        try:
+            await self.log_writer.flush()
+            await self.db.release_outbox_rows(ad["id"], ad["next_run_at"], self.node_id)
+            await self.db.expire_advertisement_lease(ad["id"], self.node_id)
+            logger.info(f"Reklama navbati checkpoint qilindi: reklama={ad['id']}, navbat={ad['next_run_at']}")
+        except Exception as e:
+            logger.error(f"Checkpoint'da xatolik: reklama={ad['id']}, xato={str(e)}")
+
+    def hold_lease(self, ad_id: int, run_task: asyncio.Task):
+        """Navbat lease'ini node heartbeat'iga qo'shish (heartbeat birinchi lease bilan ishga tushadi)"""
+        self._leases[ad_id] = run_task
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self.heartbeat_leases())
+
+    async def heartbeat_leases(self):
+        """
+        Yuborish davomida node'ning barcha lease'larini bitta so'rov bilan uzaytirib turish.
+        Uzaytirilmagan (boshqa node'ga o'tgan) navbat yuborishi to'xtatiladi.
+        """
+        while self._leases:
+            await asyncio.sleep(SCHEDULER_LEASE_SECONDS / 3)
+            leases = dict(self._leases)
+            if not leases:
+                break
+            try:
+                renewed = set(await self.db.renew_advertisement_leases(
+                    list(leases), self.node_id, SCHEDULER_LEASE_SECONDS
+                ))
+            except Exception as e:
+                logger.error(f"Lease'larni uzaytirishda xatolik: reklamalar={len(leases)}, xato={str(e)}")
+                continue
+            for ad_id, run_task in leases.items():
+                # Shu orada yakunlangan navbat lease'i uzaytirilmaydi - uni to'xtatmaymiz
+                if ad_id not in renewed and self._leases.get(ad_id) is run_task:
+                    logger.error(f"Lease boshqa node'ga o'tdi, yuborish to'xtatildi: reklama={ad_id}")
+                    run_task.cancel()
+
+    def reap_finished_tasks(self):
+        completed_tasks = [ad_id for ad_id, task in self.active_tasks.items() if task.done()]
+        for ad_id in completed_tasks:
+            task = self.active_tasks.pop(ad_id)
+            try:
+                exc = task.exception()
+                if exc:
+                    logger.error(f"Task xatolik bilan tugadi: reklama={ad_id}, xato={str(exc)}")
+            except asyncio.CancelledError:
+                pass
+
+    def fire_time(self, ad_id: int, next_run_at: datetime) -> float:
+        """
+        Taymer vaqti: navbat + SCHEDULER_JITTER_SECONDS gacha kechikish.
+
+        Kechikish (reklama, navbat) dan olinadi, shuning uchun qayta poll'larda o'zgarmaydi.
+        Scheduler ishga tushishidan oldin o'tib ketgan navbatlar esa hammasi birdan
+        emas, CATCH_UP_RAMP_SECONDS oynasi bo'ylab (reklama siljishi bo'yicha) boshlanadi.
+        """
+        when = next_run_at.timestamp()
+        if when < self._ramp_start and CATCH_UP_RAMP_SECONDS > 0:
+            when = max(when, self._ramp_start + phase_offset(ad_id, CATCH_UP_RAMP_SECONDS))
+        if SCHEDULER_JITTER_SECONDS <= 0:
+            return when
+        return when + random.Random(f"{ad_id}:{when}").uniform(0, SCHEDULER_JITTER_SECONDS)
+
+    def current_time(self) -> datetime:
+        """Scheduler soatidagi hozirgi vaqt (benchmarkda virtual)"""
+        return datetime.fromtimestamp(self.clock.now())
+
+    async def get_due_advertisements(self, horizon: datetime) -> list:
+        """`horizon` gacha navbati keladigan (yoki lease'i tugaydigan) faol reklamalar"""
         try:
-            ads = await db.execute(query, fetch=True)
-            logger.debug(f"Faol reklamalar soni: {len(ads)}")
+            ads = await self.db.get_due_advertisements(horizon)
+            logger.debug(f"Navbati kelgan reklamalar soni: {len(ads)}")
             return ads
         except Exception as e:
             logger.error(f"Reklamalarni olishda xatolik: {str(e)}")
-            return []
\ No newline at end of file
+            return []
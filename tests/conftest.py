@@ -0,0 +1,72 @@
+"""
+Testlar uchun umumiy sozlamalar.
+
+Bot, Telegram va .env ishlatilmaydi. SQL testlariga haqiqiy Postgres kerak
+(InMemoryDatabase SQL xatolarini ko'rsatmaydi):
+    TEST_DATABASE_URL=postgresql://postgres@localhost:5432/bot_test python -m pytest -q tests
+
+Har bir SQL testi oldidan baza sxemasi (public) tozalanadi - alohida test bazasidan foydalaning.
+TEST_DATABASE_URL berilmasa SQL testlari o'tkazib yuboriladi.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# data.config majburiy sozlamalarni talab qiladi - testlarda bot va .env ishlatilmaydi
+for key, value in {"BOT_TOKEN": "123456:test", "ADMINS": "0", "DB_USER": "test", "DB_PASS": "test",
+                   "DB_NAME": "test", "DB_HOST": "localhost", "DB_PORT": "5432"}.items():
+    os.environ.setdefault(key, value)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+requires_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL berilmagan")
+
+
+async def connect(migrate: bool = True, reset: bool = True):
+    """
+    Test bazasiga ulangan Database (SSL'siz, to'g'ridan-to'g'ri TEST_DATABASE_URL ga).
+    `reset` - sxema tozalanadi; False - xuddi shu bazaga ikkinchi node ulanishi.
+    """
+    import asyncpg
+    from utils.db.postgres import Database
+
+    db = Database()
+    db.pool = await asyncpg.create_pool(dsn=TEST_DATABASE_URL, min_size=1, max_size=4)
+    if reset:
+        await db.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;", execute=True)
+    if migrate:
+        await db.migrate()
+    return db
+
+
+def with_database(migrate: bool = True):
+    """Async testni yangi sxemali baza bilan ishga tushirish: test(db)"""
+    def decorator(test):
+        def wrapper():
+            async def run():
+                db = await connect(migrate)
+                try:
+                    await test(db)
+                finally:
+                    await db.pool.close()
+
+            asyncio.run(run())
+
+        wrapper.__name__ = test.__name__
+        wrapper.__doc__ = test.__doc__
+        return requires_postgres(wrapper)
+    return decorator
+
+
+async def run_scheduler(scheduler, clock, until: float):
+    """Scheduler tsiklini (schedule_advertisements) virtual soatda `until` gacha aylantirish"""
+    scheduler.is_running = True
+    task = asyncio.create_task(scheduler.schedule_advertisements())
+    while clock.now() < until:
+        await asyncio.sleep(0)
+    scheduler.is_running = False
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
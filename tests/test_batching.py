@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from telethon import errors
+from telethon.tl import types
+from telethon.tl.functions.messages import SendMessageRequest
+
+from utils.scheduler.timers import VirtualTimeLoop
+from utils.telegram.batching import RequestBatcher
+from utils.telegram.fake_client import FakeTelegramClient
+
+CLIENT = 7
+
+
+def run(coro):
+    loop = VirtualTimeLoop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def request(chat_id: int, random_id: int = None) -> SendMessageRequest:
+    peer = types.InputPeerChat(chat_id=chat_id)
+    return SendMessageRequest(peer=peer, message="matn", random_id=random_id or chat_id)
+
+
+async def send_at(batcher, client, request, delay: float = 0):
+    await asyncio.sleep(delay)
+    await batcher.call(CLIENT, client, request)
+    return asyncio.get_running_loop().time()
+
+
+def test_full_batch_is_sent_without_waiting_for_linger():
+    client = FakeTelegramClient(CLIENT, latency=0.1)
+    batcher = RequestBatcher(batch_size=3, linger_ms=1000)
+
+    async def main():
+        return await asyncio.gather(*(send_at(batcher, client, request(chat_id)) for chat_id in range(1, 7)))
+
+    finished = run(main())
+    assert client.requests == 2  # 6 ta so'rov - ikkita konteyner
+    assert batcher.batches == 2 and batcher.batched_requests == 6
+    assert finished == pytest.approx([0.1] * 6)  # linger kutilmagan
+    assert len(client.sent) == 6
+
+
+def test_partial_batch_is_sent_after_linger():
+    client = FakeTelegramClient(CLIENT, latency=0.1)
+    batcher = RequestBatcher(batch_size=10, linger_ms=50)
+
+    async def main():
+        return await asyncio.gather(
+            send_at(batcher, client, request(1)),
+            send_at(batcher, client, request(2), delay=0.02),
+            send_at(batcher, client, request(3), delay=0.08),  # birinchi konteyner ketgandan keyin
+        )
+
+    finished = run(main())
+    assert client.requests == 2
+    assert finished == pytest.approx([0.15, 0.15, 0.08 + 0.05 + 0.1])
+
+
+def test_same_group_is_never_batched_twice():
+    client = FakeTelegramClient(CLIENT, latency=0.1)
+    batcher = RequestBatcher(batch_size=10, linger_ms=50)
+
+    async def main():
+        return await asyncio.gather(
+            send_at(batcher, client, request(1, random_id=11)),
+            send_at(batcher, client, request(1, random_id=12)),
+        )
+
+    finished = run(main())
+    # Ikkinchi xabar kelishi bilan birinchisi yuboriladi, ikkinchisi o'z linger'ini kutadi
+    assert finished == pytest.approx([0.1, 0.15])
+    assert [random_id for _, random_id, _ in client.sent] == [11, 12]
+
+
+def test_errors_are_returned_to_their_own_callers():
+    client = FakeTelegramClient(CLIENT, latency=0.1, dead_groups=[-2])
+    batcher = RequestBatcher(batch_size=3, linger_ms=50)
+
+    async def main():
+        return await asyncio.gather(
+            *(batcher.call(CLIENT, client, request(chat_id)) for chat_id in (1, 2, 3)),
+            return_exceptions=True,
+        )
+
+    first, second, third = run(main())
+    assert isinstance(second, errors.ChatWriteForbiddenError)
+    assert isinstance(first, types.Updates) and isinstance(third, types.Updates)
+    assert client.requests == 1
+    assert sorted(peer for peer, _, _ in client.sent) == [-3, -1]
+
+
+def test_batch_size_one_sends_directly():
+    client = FakeTelegramClient(CLIENT, latency=0.1)
+    batcher = RequestBatcher(batch_size=1, linger_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(send_at(batcher, client, request(chat_id)) for chat_id in (1, 2)))
+
+    assert run(main()) == pytest.approx([0.1, 0.1])
+    assert client.requests == 2 and batcher.batches == 0
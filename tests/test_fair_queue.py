@@ -0,0 +1,87 @@
+import asyncio
+
+from utils.scheduler.fair_queue import FairSendQueue, SEND_WEIGHTS, next_send_weight
+from utils.scheduler.timers import VirtualClock
+from utils.telegram.rate_limiter import AccountRateLimiter
+
+CLIENT = 7
+
+
+def make_queue(clock: VirtualClock) -> FairSendQueue:
+    return FairSendQueue(AccountRateLimiter(rate=8, burst=1, clock=clock))
+
+
+async def send_all(queue: FairSendQueue, plan: dict) -> list:
+    """plan: {ad_id: (owner, sends, weight)}; yuborishlar navbati bo'yicha ad_id lar ro'yxati"""
+    order = []
+
+    async def send(ad_id: int, owner: int, weight: float):
+        await queue.turn(CLIENT, ad_id, owner, weight)
+        order.append(ad_id)
+
+    await asyncio.gather(*(
+        send(ad_id, owner, weight)
+        for ad_id, (owner, sends, weight) in plan.items()
+        for _ in range(sends)
+    ))
+    return order
+
+
+def test_small_ad_is_not_starved_by_large_ad():
+    clock = VirtualClock()
+    queue = make_queue(clock)
+    order = asyncio.run(send_all(queue, {1: (100, 1000, 1.0), 2: (200, 10, 1.0)}))
+
+    assert len(order) == 1010
+    # Navbat almashib beriladi: kichik reklama birinchi 20 ta yuborishda tugaydi
+    assert order[:20].count(2) == 10
+    assert order[20:] == [1] * 990
+    # Akkaunt tezligi buzilmagan: 8/s, burst 1
+    assert clock.now() == 1009 / 8
+
+
+def test_weight_and_owner_shares():
+    queue = make_queue(VirtualClock())
+    # Admin 100 ning ikki reklamasi bitta ulushni bo'lishadi, ulushi x2 bo'lgan admin 200 ikki barobar oladi
+    order = asyncio.run(send_all(queue, {1: (100, 50, 1.0), 2: (100, 50, 1.0), 3: (200, 200, 2.0)}))
+
+    first = order[:60]
+    assert first.count(3) == 40
+    assert first.count(1) == first.count(2) == 10
+
+
+def test_queue_is_empty_after_sends_and_cancellations():
+    clock = VirtualClock()
+    queue = make_queue(clock)
+
+    async def run():
+        assert queue.stats() == {}
+        waiters = [asyncio.create_task(queue.turn(CLIENT, ad_id, 100)) for ad_id in (1, 1, 2, 2, 2)]
+        await asyncio.sleep(0)
+        account = queue._accounts[CLIENT]
+        assert account.pending == 5
+        assert queue.stats() == {CLIENT: {1: 2, 2: 3}}
+
+        # Kutayotgan yuborishlar bekor qilinsa token olinmaydi va dispatcher to'xtaydi
+        for task in waiters[2:]:
+            task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await account.dispatcher
+        assert account.pending == 0
+        assert not account.has_pending()
+        assert account.pop() is None
+        assert queue.stats() == {}
+        return clock.now()
+
+    # Ikki yuborish: birinchisi burst'dan, ikkinchisi 1/8 soniyadan keyin
+    assert asyncio.run(run()) == 1 / 8
+
+
+def test_next_send_weight_cycles():
+    weight = 1.0
+    seen = []
+    for _ in SEND_WEIGHTS:
+        weight = next_send_weight(weight)
+        seen.append(weight)
+    assert seen == [2.0, 4.0, 0.5, 1.0]
+    assert next_send_weight(3.0) == SEND_WEIGHTS[0]
@@ -0,0 +1,112 @@
+from utils.group_selection import GroupCatalog, GroupSelection, GroupSelectionStore
+
+GROUPS = [{"id": -1000 - i, "title": f"Guruh {i:02d}"} for i in range(25)]
+
+
+def test_toggle_and_selected_ids_round_trip():
+    selection = GroupSelection(7, GROUPS)
+    assert selection.count == 0 and selection.selected_ids() == []
+
+    assert selection.toggle(-1003) is True
+    assert selection.toggle(-1010) is True
+    assert selection.toggle(-1003) is False
+    assert selection.toggle(-99) is None  # katalogda yo'q
+    assert selection.selected_ids() == [-1010]
+    assert selection.count == 1
+    assert selection.is_selected(-1010) and not selection.is_selected(-1003)
+
+    assert selection.select_ids([-1001, -1010, -99]) == 2
+    assert selection.selected_ids() == [-1001, -1010]
+    assert selection.count == 2
+
+
+def test_select_page_and_select_all_toggle_back():
+    selection = GroupSelection(7, GROUPS)
+
+    assert selection.select_page(1, 10) is True
+    assert selection.selected_ids() == [group["id"] for group in GROUPS[10:20]]
+    assert [flag for _, _, flag in selection.page(1, 10)] == [True] * 10
+    assert selection.select_page(1, 10) is False  # hammasi tanlangan edi - bekor qilinadi
+    assert selection.count == 0
+
+    selection.toggle(-1000)
+    assert selection.select_all() is True
+    assert selection.count == len(GROUPS)
+    assert selection.select_all() is False
+    assert selection.count == 0 and selection.selected_ids() == []
+
+
+def test_bulk_select_follows_current_filter():
+    selection = GroupSelection(7, GROUPS)
+    selection.set_query("guruh 1")
+    assert selection.total == 10
+    assert [title for _, title, _ in selection.page(0, 3)] == ["Guruh 10", "Guruh 11", "Guruh 12"]
+
+    selection.select_all()
+    assert selection.selected_ids() == [group["id"] for group in GROUPS[10:20]]
+    selection.set_query("")
+    assert selection.total == len(GROUPS)
+    assert selection.count == 10
+
+
+def test_store_reload_keeps_selection_and_query():
+    store = GroupSelectionStore()
+    selection = store.open("chat:1", 7, GROUPS)
+    selection.select_ids([-1001, -1012, -1020])
+    selection.set_query("guruh 1")
+
+    # Yangi ro'yxatda -1001 yo'q, yangi guruh qo'shilgan
+    groups = [group for group in GROUPS if group["id"] != -1001] + [{"id": -2000, "title": "Guruh 19b"}]
+    reloaded = store.reload("chat:1", groups)
+    assert store.get("chat:1") is reloaded
+    assert reloaded.client_id == 7
+    assert reloaded.selected_ids() == [-1012, -1020]
+    assert reloaded.query == "guruh 1" and reloaded.total == 11
+
+    assert store.reload("chat:2", groups) is None
+    store.close("chat:1")
+    assert store.get("chat:1") is None
+
+
+def test_store_expires_idle_selections():
+    store = GroupSelectionStore(ttl_minutes=0)
+    store.open("chat:1", 7, GROUPS).touched -= 1
+    store.open("chat:2", 7, GROUPS)
+    assert store.get("chat:1") is None
+    assert store.get("chat:2") is not None
+
+
+def make_catalog(titles: list) -> GroupCatalog:
+    return GroupCatalog([{"id": -1000 - i, "title": title} for i, title in enumerate(titles)])
+
+
+def test_trigram_search_matches_substring_case_insensitively():
+    catalog = make_catalog(["Toshkent Bozor", "Samarqand bozori", "IT Jobs", None, "BOZOR UZ"])
+
+    assert catalog.search("bozor") == [0, 1, 4]
+    assert catalog.search("BOZORI") == [1]
+    assert catalog.search("it") == [2]  # 3 harfdan qisqa - indekssiz qidiruv
+    assert catalog.search("xyz") == []
+    assert catalog._trigrams is not None
+
+
+def test_trigram_search_falls_back_to_similar_titles():
+    catalog = make_catalog(["Toshkent ish e'lonlari", "Samarqand ish", "Toshkent avto"])
+
+    # Imlo xatosi: aniq moslik yo'q, lekin so'rov trigramlarining yarmidan ko'pi nomda uchraydi
+    assert catalog.search("toshknt ish") == [0]
+    assert catalog.search("samarkand") == [1]
+    assert catalog.search("toshkentt") == [0, 2]
+    # Eng o'xshashi birinchi
+    assert catalog.search("toshkent avtoo") == [2, 0]
+    assert catalog.search("buxoro") == []
+
+
+def test_search_agrees_with_plain_substring_scan():
+    titles = [f"{city} {topic} {i}" for i, (city, topic) in enumerate(
+        (city, topic) for city in ("Toshkent", "Buxoro", "Xiva") for topic in ("ish", "avto", "uy-joy")
+    )]
+    catalog = make_catalog(titles)
+    for query in ("ish", "Buxoro avto", "joy", "o a", "xiva uy"):
+        expected = [position for position, title in enumerate(titles) if query.casefold() in title.casefold()]
+        assert catalog.search(query) == expected
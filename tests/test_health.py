@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from utils.shortcuts import split_lines, TELEGRAM_MESSAGE_LIMIT
+from utils.telegram.health import SessionHealthChecker, classify_spam_reply
+from utils.telegram.fake_client import FakeTelegramClient
+
+
+@pytest.mark.parametrize("text, status", [
+    ("Good news, no limits are currently applied to your account. You're free as a bird!", "ok"),
+    ("Ваш аккаунт свободен от каких-либо ограничений.", "ok"),
+    ("I'm afraid some Telegram users found your messages annoying and forwarded them to our team.", "limited"),
+    ("Unfortunately, your account is now limited. You will be able to contact people on 1 May.", "limited"),
+    ("К сожалению, ваш аккаунт ограничен.", "limited"),
+    ("Hello! Please choose your language.", "unknown"),
+    ("", "unknown"),
+])
+def test_spam_bot_reply_classification(text, status):
+    assert classify_spam_reply(text) == status
+
+
+class ReplyConversation:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def send_message(self, message, **kwargs):
+        pass
+
+    async def get_response(self, **kwargs):
+        class Response:
+            raw_text = self.text
+        return Response()
+
+
+def test_unrecognized_spam_bot_reply_is_unknown():
+    client = FakeTelegramClient(7, latency=0)
+    client.conversation = lambda entity, **kwargs: ReplyConversation("Tilni tanlang")
+    checker = SessionHealthChecker(db=None, pool=None)
+    row = {"id": 7, "is_active": True, "is_banned": False}
+
+    assert asyncio.run(checker._inspect(row, client)) == (7, True, "unknown", "Tilni tanlang")
+
+    client = FakeTelegramClient(7, latency=0)
+    client.spam_limited = True
+    assert asyncio.run(checker._inspect(row, client))[2] == "limited"
+
+
+def test_split_lines_keeps_messages_under_telegram_limit():
+    lines = ["<b>Sarlavha</b>\n"] + [f"📱 +99890{i:07d} (#{i}) - ✅ Cheklov yo'q" for i in range(500)]
+    chunks = split_lines(lines)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= TELEGRAM_MESSAGE_LIMIT for chunk in chunks)
+    assert "\n".join(chunks) == "\n".join(lines)  # qatorlar bo'linmagan va yo'qolmagan
+    assert split_lines(["bitta"]) == ["bitta"]
+    assert split_lines(["a" * 10, "b" * 10], limit=15) == ["a" * 10, "b" * 10]
@@ -0,0 +1,154 @@
+"""
+Bitta Postgres ustida bir nechta scheduler: har bir (reklama, guruh, navbat) aynan bir marta yuboriladi.
+
+Telegram o'rnida akkaunt bo'yicha umumiy FakeTelegramClient (bir xil random_id ni
+ikkinchi marta qabul qilmaydi), qolgan hammasi - outbox, lease, loglar - haqiqiy.
+"""
+import asyncio
+from collections import Counter
+
+from conftest import with_database, connect
+from utils.telegram.sending import outbox_random_id
+
+NODES = 4
+GROUPS = [-1000000000000 - i for i in range(8)]
+
+
+async def make_cluster(db, nodes: int = NODES):
+    """Bitta akkaunt (tezlik cheklovisiz) va shu bazaga ulangan `nodes` ta scheduler"""
+    from scripts import AdvertisementScheduler
+    from utils.telegram.client_pool import ClientPool
+    from utils.telegram.fake_client import FakeTelegramClient
+
+    client = await db.add_client("1", "hash", "+998900000000", "session")
+    await db.set_client_rate(client["id"], 10_000, 10_000)
+    await db.add_user("Admin", None, 1)
+    await db.execute("UPDATE Users SET active_client_session = $1 WHERE telegram_id = 1", client["id"], execute=True)
+    telegram = FakeTelegramClient(client["id"], groups=[{"id": group_id} for group_id in GROUPS], latency=0.005)
+
+    def scheduler(node_id: str, database=db):
+        async def notify(text):
+            pass
+
+        pool = ClientPool(database, client_factory=lambda row: telegram)
+        return AdvertisementScheduler(node_id=node_id, database=database, pool=pool, notify=notify)
+
+    return telegram, scheduler, [scheduler(f"node-{i}") for i in range(nodes)]
+
+
+async def outbox(db, ad_id: int):
+    return await db.execute("SELECT * FROM AdvertisementOutbox WHERE ad_id = $1", ad_id, fetch=True)
+
+
+async def logged_groups(db, ad_id: int) -> set:
+    rows = await db.execute("SELECT group_id FROM AdvertisementLogs WHERE ad_id = $1", ad_id, fetch=True)
+    return {row["group_id"] for row in rows}
+
+
+def sent_count(telegram, rows) -> Counter:
+    """Outbox qatorlari bo'yicha Telegram qabul qilgan xabarlar soni"""
+    keys = {outbox_random_id(row["idempotency_key"]): row["idempotency_key"] for row in rows}
+    return Counter(keys[random_id] for _, random_id, _ in telegram.sent if random_id in keys)
+
+
+@with_database()
+async def test_nodes_race_for_every_slot_exactly_once(db):
+    telegram, _, schedulers = await make_cluster(db)
+    ad_ids = []
+    for _ in range(10):
+        ad = await db.add_advertisement("matn", 1, created_by=1, group_ids=GROUPS, catch_up="backfill")
+        ad_ids.append(ad["id"])
+    # backfill: o'tib ketgan 3 ta navbat birin-ketin yuboriladi - har raund yangi navbat
+    await db.execute(
+        "UPDATE Advertisements SET next_run_at = LOCALTIMESTAMP - INTERVAL '1 hour'", execute=True
+    )
+
+    delivered = []
+    for _ in range(3):
+        await asyncio.gather(*(scheduler.run_advertisement(ad_id) for scheduler in schedulers for ad_id in ad_ids))
+        for ad_id in ad_ids:
+            rows = await outbox(db, ad_id)
+            assert len({row["slot"] for row in rows}) == 1  # oldingi navbatlar tozalangan
+            assert [row["state"] for row in rows] == ["done"] * len(GROUPS)
+            assert all(row["attempts"] == 1 for row in rows)
+            assert await logged_groups(db, ad_id) == set(GROUPS)
+            delivered.extend(rows)
+
+    assert len({row["idempotency_key"] for row in delivered}) == 3 * len(ad_ids) * len(GROUPS)
+    assert set(sent_count(telegram, delivered).values()) == {1}
+    assert telegram.duplicates == 0
+    ads = await db.execute("SELECT * FROM Advertisements", fetch=True)
+    assert all(ad["claimed_by"] is None and ad["last_sent_at"] is not None for ad in ads)
+
+
+async def start_run(scheduler, ad_id: int, telegram, sends: int) -> asyncio.Task:
+    """Navbatni boshlab, Telegram `sends` ta xabarni qabul qilguncha kutish"""
+    task = asyncio.create_task(scheduler.run_advertisement(ad_id))
+    while len(telegram.sent) < sends:
+        assert not task.done()
+        await asyncio.sleep(0.001)
+    return task
+
+
+@with_database()
+async def test_crashed_node_run_is_taken_over_and_resumed(db):
+    telegram, make_scheduler, schedulers = await make_cluster(db)
+    ad = await db.add_advertisement("matn", 60, created_by=1, group_ids=GROUPS)
+    await db.execute("UPDATE Advertisements SET next_run_at = LOCALTIMESTAMP WHERE id = $1", ad["id"], execute=True)
+
+    # Node yiqiladi: bazaga ulanish yo'qoladi, loglar yozilmaydi, qatorlar `sending` da qoladi
+    crashed_db = await connect(migrate=False, reset=False)
+    crashed = make_scheduler("node-crashed", crashed_db)
+    task = await start_run(crashed, ad["id"], telegram, sends=3)
+    crashed_db.pool.terminate()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    sent_before_crash = len(telegram.sent)
+
+    row = await db.execute("SELECT * FROM Advertisements WHERE id = $1", ad["id"], fetchrow=True)
+    assert row["claimed_by"] == "node-crashed"
+    slot = row["next_run_at"]
+    assert {row["state"] for row in await outbox(db, ad["id"])} == {"sending"}
+
+    # Lease muddati o'tmaguncha boshqa node'lar olmaydi
+    await asyncio.gather(*(scheduler.run_advertisement(ad["id"]) for scheduler in schedulers))
+    assert await logged_groups(db, ad["id"]) == set()
+
+    await db.execute(
+        "UPDATE Advertisements SET lease_expires_at = CURRENT_TIMESTAMP - INTERVAL '1 second' WHERE id = $1",
+        ad["id"], execute=True
+    )
+    await asyncio.gather(*(scheduler.run_advertisement(ad["id"]) for scheduler in schedulers))
+
+    rows = await outbox(db, ad["id"])
+    assert {row["slot"] for row in rows} == {slot}  # navbat surilmagan, o'sha navbat davom ettirilgan
+    assert [row["state"] for row in rows] == ["done"] * len(GROUPS)
+    assert await logged_groups(db, ad["id"]) == set(GROUPS)
+    assert set(sent_count(telegram, rows).values()) == {1}
+    # Yiqilgan node yuborgan xabarlar qayta urinishda bir xil random_id tufayli rad etilgan
+    assert telegram.duplicates == sent_before_crash
+    row = await db.execute("SELECT * FROM Advertisements WHERE id = $1", ad["id"], fetchrow=True)
+    assert row["claimed_by"] is None and row["next_run_at"] == slot
+
+
+@with_database()
+async def test_cancelled_run_is_checkpointed_and_resumed_without_resends(db):
+    telegram, _, schedulers = await make_cluster(db, nodes=2)
+    ad = await db.add_advertisement("matn", 60, created_by=1, group_ids=GROUPS)
+    await db.execute("UPDATE Advertisements SET next_run_at = LOCALTIMESTAMP WHERE id = $1", ad["id"], execute=True)
+
+    task = await start_run(schedulers[0], ad["id"], telegram, sends=3)
+    task.cancel()  # drain muddati tugadi - checkpoint
+    await asyncio.gather(task, return_exceptions=True)
+
+    states = Counter(row["state"] for row in await outbox(db, ad["id"]))
+    assert states["done"] == len(telegram.sent) and states["sending"] == 0
+    assert await logged_groups(db, ad["id"]) == {peer for peer, _, _ in telegram.sent}
+
+    await schedulers[1].run_advertisement(ad["id"])
+
+    rows = await outbox(db, ad["id"])
+    assert len({row["slot"] for row in rows}) == 1
+    assert [row["state"] for row in rows] == ["done"] * len(GROUPS)
+    assert await logged_groups(db, ad["id"]) == set(GROUPS)
+    assert telegram.duplicates == 0
@@ -0,0 +1,222 @@
+from datetime import timedelta
+
+from conftest import with_database
+from utils.scheduler.phase import next_slot
+
+
+async def make_due(db, ad_id: int):
+    """Reklama navbatini o'tgan vaqtga surish (keyingi poll'da olinadi)"""
+    await db.execute(
+        "UPDATE Advertisements SET next_run_at = LOCALTIMESTAMP - INTERVAL '1 second' WHERE id = $1",
+        ad_id, execute=True
+    )
+
+
+async def now(db):
+    return await db.execute("SELECT LOCALTIMESTAMP", fetchval=True)
+
+
+@with_database(migrate=False)
+async def test_migrate_fresh_database(db):
+    """Bo'sh bazada barcha migratsiyalar ishlaydi va qayta ishga tushirish xavfsiz"""
+    await db.migrate()
+    await db.migrate()
+    tables = {
+        row["tablename"] for row in
+        await db.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'", fetch=True)
+    }
+    assert {"clients", "users", "advertisements", "advertisementlogs", "advertisementoutbox",
+            "clientdialogs", "clientpeers", "clienthealth", "groupsets"} <= tables
+
+
+@with_database(migrate=False)
+async def test_migrate_backfills_existing_advertisements(db):
+    """Eski sxemadagi reklama loglardan last_sent_at va siljishga tekislangan next_run_at oladi"""
+    await db.execute(
+        """
+        CREATE TABLE Advertisements (
+            id SERIAL PRIMARY KEY,
+            photo_id TEXT NOT NULL,
+            text TEXT NOT NULL,
+            duration_minutes INT NOT NULL,
+            created_by BIGINT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            group_ids BIGINT[] NOT NULL
+        );
+        CREATE TABLE AdvertisementLogs (
+            id SERIAL PRIMARY KEY,
+            ad_id INT REFERENCES Advertisements(id),
+            group_id BIGINT NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO Advertisements (photo_id, text, duration_minutes, created_by, group_ids)
+        VALUES ('photo', 'eski', 10, 1, ARRAY[-1001]);
+        INSERT INTO AdvertisementLogs (ad_id, group_id, sent_at) VALUES (1, -1001, '2024-01-01 12:03:00');
+        """,
+        execute=True
+    )
+    await db.migrate()
+
+    ad = await db.execute("SELECT * FROM Advertisements WHERE id = 1", fetchrow=True)
+    assert ad["last_sent_at"].isoformat() == "2024-01-01T12:03:00"
+    assert ad["next_run_at"] == next_slot(1, 10, ad["last_sent_at"] + timedelta(minutes=10))
+
+
+@with_database()
+async def test_add_advertisement_schedules_first_slot(db):
+    before = await now(db)
+    ad = await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001, -1002])
+
+    assert ad["next_run_at"] == next_slot(ad["id"], 5, ad["next_run_at"])
+    assert before <= ad["next_run_at"] <= before + timedelta(minutes=5, seconds=1)
+    assert ad["claimed_by"] is None
+
+
+@with_database()
+async def test_claim_advertisement_run_once_per_slot(db):
+    ad = await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001])
+    assert await db.claim_advertisement_run(ad["id"], "node-a", 30) is None  # navbati kelmagan
+
+    await make_due(db, ad["id"])
+    claimed = await db.claim_advertisement_run(ad["id"], "node-a", 30)
+    assert claimed is not None
+    assert claimed["claimed_by"] == "node-a"
+    assert claimed["previous_owner"] is None
+    assert claimed["next_run_at"] > await now(db)
+    assert claimed["next_run_at"] == next_slot(ad["id"], 5, claimed["next_run_at"])
+
+    # Lease tugamaguncha boshqa node ololmaydi
+    assert await db.claim_advertisement_run(ad["id"], "node-b", 30) is None
+
+    await db.finish_advertisement_run(ad["id"], "node-a")
+    row = await db.execute("SELECT * FROM Advertisements WHERE id = $1", ad["id"], fetchrow=True)
+    assert row["claimed_by"] is None
+    assert row["last_sent_at"] is not None
+    assert row["next_run_at"] == claimed["next_run_at"]
+    assert await db.claim_advertisement_run(ad["id"], "node-b", 30) is None
+
+
+@with_database()
+async def test_claim_advertisement_run_takes_over_expired_lease(db):
+    ad = await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001])
+    await make_due(db, ad["id"])
+    claimed = await db.claim_advertisement_run(ad["id"], "node-a", 30)
+
+    await db.expire_advertisement_lease(ad["id"], "node-a")
+    taken = await db.claim_advertisement_run(ad["id"], "node-b", 30)
+    assert taken["previous_owner"] == "node-a"
+    assert taken["claimed_by"] == "node-b"
+    # Yarim qolgan navbat davom ettiriladi - next_run_at surilmaydi
+    assert taken["next_run_at"] == claimed["next_run_at"]
+
+
+@with_database()
+async def test_claim_advertisement_run_backfill(db):
+    ad = await db.add_advertisement("matn", 1, created_by=1, group_ids=[-1001], catch_up="backfill")
+    await db.execute(
+        "UPDATE Advertisements SET next_run_at = LOCALTIMESTAMP - INTERVAL '1 hour' WHERE id = $1",
+        ad["id"], execute=True
+    )
+    claimed = await db.claim_advertisement_run(ad["id"], "node-a", 30, backfill_limit=3)
+    # Oxirgi 3 ta o'tgan navbat birin-ketin yuboriladi - keyingi navbat hali o'tmishda
+    current = await now(db)
+    assert current - timedelta(minutes=4) <= claimed["next_run_at"] <= current
+
+
+@with_database()
+async def test_outbox_claim_and_release(db):
+    ad = await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001, -1002, -1003])
+    slot = ad["next_run_at"]
+    plan = {7: [-1001, -1002], 8: [-1003]}
+    await db.create_outbox_rows(ad["id"], slot, plan)
+    await db.create_outbox_rows(ad["id"], slot, plan)  # takroriy reja qator qo'shmaydi
+    assert await db.count_outbox_rows(ad["id"], slot) == 3
+
+    rows = await db.claim_outbox_rows(ad["id"], slot, "node-a")
+    assert {(row["client_id"], row["group_id"]) for row in rows} == {(7, -1001), (7, -1002), (8, -1003)}
+    assert all(row["attempts"] == 1 for row in rows)
+    assert len({row["idempotency_key"] for row in rows}) == 3
+    # Shu node olgan qatorlar qayta olinmaydi
+    assert await db.claim_outbox_rows(ad["id"], slot, "node-a") == []
+
+    await db.release_outbox_rows(ad["id"], slot, "node-a")
+    released = await db.claim_outbox_rows(ad["id"], slot, "node-b")
+    assert len(released) == 3
+    assert all(row["attempts"] == 2 for row in released)
+    assert {row["idempotency_key"] for row in released} == {row["idempotency_key"] for row in rows}
+
+
+@with_database()
+async def test_outbox_reassign_and_fail(db):
+    ad = await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001, -1002])
+    slot = ad["next_run_at"]
+    await db.create_outbox_rows(ad["id"], slot, {7: [-1001, -1002]})
+    await db.claim_outbox_rows(ad["id"], slot, "node-a")
+
+    await db.reassign_outbox_rows(ad["id"], slot, 7, {9: [-1001]})
+    assert await db.get_unsent_outbox_groups(ad["id"], slot, 9) == [-1001]
+    assert await db.get_unsent_outbox_groups(ad["id"], slot, 7) == [-1002]
+
+    await db.fail_outbox_rows(ad["id"], slot, 7, "banned")
+    assert await db.get_unsent_outbox_groups(ad["id"], slot, 7) == []
+    rows = await db.claim_outbox_rows(ad["id"], slot, "node-b")
+    assert [(row["client_id"], row["group_id"]) for row in rows] == [(9, -1001)]
+
+
+@with_database()
+async def test_outbox_retry_is_scheduled_by_database_clock(db):
+    ad = await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001, -1002])
+    slot = ad["next_run_at"]
+    await db.create_outbox_rows(ad["id"], slot, {7: [-1001, -1002]})
+    first, second = await db.claim_outbox_rows(ad["id"], slot, "node-a")
+    assert await db.next_outbox_attempt_delay(ad["id"], slot) is None
+
+    await db.reschedule_outbox_row(first["id"], "pending", 60, "xato")
+    # FloodWait: cooldown backoff'dan uzun bo'lsa, shu tugaguncha olinmaydi
+    await db.reschedule_outbox_row(second["id"], "pending", 60, "FloodWait", 120)
+    assert await db.claim_outbox_rows(ad["id"], slot, "node-a") == []
+    assert 55 < await db.next_outbox_attempt_delay(ad["id"], slot) <= 60
+
+    await db.reschedule_outbox_row(first["id"], "pending", 0, "xato")
+    [row] = await db.claim_outbox_rows(ad["id"], slot, "node-a")
+    assert row["id"] == first["id"] and row["attempts"] == 2
+    assert 115 < await db.next_outbox_attempt_delay(ad["id"], slot) <= 120
+
+    await db.reschedule_outbox_row(second["id"], "failed", 0, "xato")
+    assert await db.next_outbox_attempt_delay(ad["id"], slot) is None
+
+
+@with_database()
+async def test_client_cooldown_is_measured_by_database_clock(db):
+    client = await db.add_client("1", "hash", "+998900000000", "session")
+    await db.set_client_cooldown(client["id"], 60, 0.25)
+
+    [row] = await db.get_client_cooldowns()
+    assert row["id"] == client["id"]
+    assert row["current_rate"] == 0.25
+    assert 55 < row["cooldown_seconds"] <= 60
+
+    # Tezlik tiklangan, lekin cooldown tugagan akkaunt
+    await db.set_client_cooldown(client["id"], -1, 0.5)
+    [row] = await db.get_client_cooldowns()
+    assert row["cooldown_seconds"] is None
+
+    await db.set_client_cooldown(client["id"], None, None)
+    assert await db.get_client_cooldowns() == []
+
+
+@with_database()
+async def test_renew_advertisement_leases_only_renews_own_leases(db):
+    ads = [await db.add_advertisement("matn", 5, created_by=1, group_ids=[-1001]) for _ in range(3)]
+    for ad in ads:
+        await make_due(db, ad["id"])
+    await db.claim_advertisement_run(ads[0]["id"], "node-a", 1)
+    await db.claim_advertisement_run(ads[1]["id"], "node-a", 1)
+    await db.claim_advertisement_run(ads[2]["id"], "node-b", 1)
+    await db.finish_advertisement_run(ads[1]["id"], "node-a")
+
+    renewed = await db.renew_advertisement_leases([ad["id"] for ad in ads], "node-a", 60)
+    assert renewed == [ads[0]["id"]]
+    row = await db.execute("SELECT * FROM Advertisements WHERE id = $1", ads[0]["id"], fetchrow=True)
+    assert row["lease_expires_at"] > await now(db) + timedelta(seconds=55)
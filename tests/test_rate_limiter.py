@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from data.config import FLOOD_RATE_DECREASE, FLOOD_RATE_STEP, FLOOD_MIN_RATE
+from utils.scheduler.timers import VirtualClock
+from utils.telegram.rate_limiter import TokenBucket, AccountRateLimiter
+
+
+def test_bucket_starts_full_and_refills_at_rate():
+    clock = VirtualClock()
+    bucket = TokenBucket(rate=2, burst=5, clock=clock)
+
+    assert bucket.tokens == 5
+    for _ in range(5):
+        assert asyncio.run(bucket.acquire()) == 0
+    assert bucket.tokens == 0
+    assert bucket.wait_time() == pytest.approx(0.5)
+
+    clock.advance(1)
+    assert bucket.tokens == pytest.approx(2)
+    clock.advance(100)
+    assert bucket.tokens == 5  # burst'dan oshmaydi
+
+
+def test_acquire_waits_for_tokens_at_steady_rate():
+    clock = VirtualClock()
+    bucket = TokenBucket(rate=2, burst=1, clock=clock)
+
+    async def send(count):
+        return [await bucket.acquire() for _ in range(count)]
+
+    waits = asyncio.run(send(5))
+    assert waits[0] == 0
+    assert waits[1:] == [pytest.approx(0.5)] * 4
+    assert clock.now() == pytest.approx(2)
+
+
+def test_pause_stops_refill_until_it_ends():
+    clock = VirtualClock()
+    bucket = TokenBucket(rate=1, burst=3, clock=clock)
+    bucket.pause(10)
+
+    assert bucket.tokens == 0
+    assert bucket.wait_time() == pytest.approx(11)
+    clock.advance(10)
+    assert bucket.tokens == 0
+    clock.advance(2)
+    assert bucket.tokens == pytest.approx(2)
+
+
+def test_flood_wait_cuts_rate_once_and_pauses_account():
+    clock = VirtualClock()
+    limiter = AccountRateLimiter(rate=1, burst=3, clock=clock)
+
+    paused_until, rate = limiter.penalize(7, 30)
+    assert paused_until == 30
+    assert rate == pytest.approx(max(1 * FLOOD_RATE_DECREASE, FLOOD_MIN_RATE))
+    # Parallel yuborishlar bir vaqtda FloodWait olsa tezlik yana kamaymaydi
+    assert limiter.penalize(7, 20) == (30, pytest.approx(rate))
+    assert limiter.stats()[7]["paused_seconds"] == 30
+    # Boshqa akkauntlarga ta'sir qilmaydi
+    assert limiter.bucket(8).wait_time() == 0
+
+
+def test_rate_floor_and_additive_recovery():
+    clock = VirtualClock()
+    limiter = AccountRateLimiter(rate=1, burst=3, clock=clock)
+    for _ in range(20):
+        limiter.penalize(7, 1)
+        clock.advance(2)
+    assert limiter.bucket(7).rate == pytest.approx(FLOOD_MIN_RATE)
+
+    steps = 0
+    while not limiter.record_success(7):
+        steps += 1
+        assert limiter.bucket(7).rate < 1
+    assert limiter.bucket(7).rate == 1
+    assert steps + 1 == pytest.approx((1 - FLOOD_MIN_RATE) / FLOOD_RATE_STEP, abs=1)
+    assert not limiter.record_success(7)  # to'liq tiklangan - o'zgarmaydi
+
+
+def test_configure_does_not_undo_backoff():
+    limiter = AccountRateLimiter(rate=1, burst=3, clock=VirtualClock())
+    limiter.penalize(7, 5)
+    reduced = limiter.bucket(7).rate
+
+    limiter.configure(7, rate=2, burst=4)
+    assert limiter.bucket(7).rate == pytest.approx(reduced)
+    assert limiter.bucket(7).max_rate == 2
+    assert limiter.bucket(7).burst == 4
+
+
+def test_restore_applies_saved_cooldown():
+    clock = VirtualClock(start=1000)
+    limiter = AccountRateLimiter(rate=1, burst=3, clock=clock)
+    limiter.restore(7, paused_until=1060, rate=0.25)
+
+    assert limiter.bucket(7).paused_seconds == 60
+    assert limiter.bucket(7).rate == 0.25
+    limiter.restore(8, paused_until=None, rate=5)
+    assert limiter.bucket(8).rate == 1  # max_rate dan oshmaydi
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime
+
+from conftest import run_scheduler
+from utils.db.memory import InMemoryDatabase
+from utils.scheduler.phase import next_slot
+from utils.scheduler.timers import VirtualClock
+
+START = datetime(2024, 1, 1).timestamp()
+
+
+def make_scheduler(clock, database):
+    """Yuborish o'rniga ishga tushishlarni yozib boradigan scheduler (Telegram ishlatilmaydi)"""
+    from scripts import AdvertisementScheduler
+    from utils.telegram.client_pool import ClientPool
+
+    scheduler = AdvertisementScheduler(clock=clock, node_id="test-node", database=database,
+                                       pool=ClientPool(database))
+    scheduler.fired = []
+
+    async def record(ad):
+        scheduler.fired.append((ad["id"], clock.now()))
+        return True
+
+    scheduler.process_advertisement = record
+    return scheduler
+
+
+def test_scheduler_fires_every_slot_on_time():
+    clock = VirtualClock(start=START)
+    database = InMemoryDatabase(clock)
+    durations = {}
+    for number in range(60):
+        duration = (1, 2, 5, 15, 60)[number % 5]
+        durations[database.add_advertisement("matn", duration, created_by=1, group_ids=[-1001])] = duration
+    horizon = START + 3 * 3600 + 0.5
+    scheduler = make_scheduler(clock, database)
+
+    asyncio.run(run_scheduler(scheduler, clock, horizon))
+
+    fired = [(ad_id, when) for ad_id, when in scheduler.fired if when <= horizon]
+    for ad_id, duration in durations.items():
+        first = next_slot(ad_id, duration, datetime.fromtimestamp(START)).timestamp()
+        expected = [first + k * duration * 60 for k in range(int((horizon - first) // (duration * 60)) + 1)]
+        assert [when for fired_id, when in fired if fired_id == ad_id] == expected
+
+
+def test_scheduler_picks_up_changed_advertisement_before_next_poll():
+    clock = VirtualClock(start=START)
+    database = InMemoryDatabase(clock)
+    scheduler = make_scheduler(clock, database)
+    poll = scheduler.sync_timers
+    added = []
+
+    async def poll_then_notify():
+        await poll()
+        if not added:
+            # Poll'dan keyin yaratilgan reklama: keyingi poll 60s dan keyin, taymerga NOTIFY orqali tushadi
+            added.append(database.add_advertisement("matn", 5, created_by=1, group_ids=[-1001],
+                                                    next_run_at=datetime.fromtimestamp(START + 20)))
+            await scheduler.on_advertisement_changed("INSERT", added[0])
+
+    scheduler.sync_timers = poll_then_notify
+    asyncio.run(run_scheduler(scheduler, clock, START + 50))
+
+    assert scheduler.fired == [(added[0], START + 20)]
+
+
+def test_scheduler_drops_deactivated_advertisement():
+    clock = VirtualClock(start=START)
+    database = InMemoryDatabase(clock)
+    ad_id = database.add_advertisement("matn", 1, created_by=1, group_ids=[-1001])
+    scheduler = make_scheduler(clock, database)
+
+    async def scenario():
+        await scheduler.sync_timers()
+        assert ad_id in scheduler.timers
+        database.advertisements[ad_id]["is_active"] = False
+        await scheduler.on_advertisement_changed("UPDATE", ad_id)
+        assert ad_id not in scheduler.timers
+        await run_scheduler(scheduler, clock, START + 600)
+
+    asyncio.run(scenario())
+    assert scheduler.fired == []
+
+
+def test_scheduler_respects_max_runs():
+    clock = VirtualClock(start=START)
+    database = InMemoryDatabase(clock)
+    for _ in range(5):
+        database.add_advertisement("matn", 60, created_by=1, group_ids=[-1001],
+                                   next_run_at=datetime.fromtimestamp(START))
+    scheduler = make_scheduler(clock, database)
+    scheduler.max_runs = 2
+    running = []
+    release = asyncio.Event()
+
+    async def slow(ad):
+        running.append(ad["id"])
+        await release.wait()
+        return True
+
+    scheduler.process_advertisement = slow
+
+    async def scenario():
+        scheduler.is_running = True
+        task = asyncio.create_task(scheduler.schedule_advertisements())
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert len(running) == 2
+        assert scheduler.timers.due_count(clock.now()) == 3
+        release.set()
+        for _ in range(20):
+            await asyncio.sleep(0)
+        scheduler.is_running = False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert sorted(running) == sorted(database.advertisements)
@@ -0,0 +1,55 @@
+import random
+
+from utils.scheduler.sharding import shard_groups
+
+GROUPS = [-1000000000000 - i for i in range(30)]
+
+
+def test_same_input_gives_same_plan():
+    members = {group_id: {1, 2, 3} for group_id in GROUPS}
+    budgets = {1: (1.0, 0), 2: (1.0, 0), 3: (1.0, 0)}
+
+    plan, unassigned = shard_groups(GROUPS, members, budgets)
+    assert unassigned == []
+    assert shard_groups(GROUPS, members, budgets) == (plan, [])
+    assert sorted(group_id for groups in plan.values() for group_id in groups) == sorted(GROUPS)
+    # Tezligi teng akkauntlar guruhlarni teng bo'lishadi
+    assert {client_id: len(groups) for client_id, groups in plan.items()} == {1: 10, 2: 10, 3: 10}
+
+
+def test_group_order_does_not_change_shares():
+    members = {group_id: {1, 2} for group_id in GROUPS}
+    budgets = {1: (2.0, 0), 2: (1.0, 0)}
+    shuffled = GROUPS[:]
+    random.Random(1).shuffle(shuffled)
+
+    for group_ids in (GROUPS, shuffled):
+        plan, _ = shard_groups(group_ids, members, budgets)
+        # Ikki barobar tez akkaunt ikki barobar ko'p guruh oladi
+        assert {client_id: len(groups) for client_id, groups in plan.items()} == {1: 20, 2: 10}
+
+
+def test_groups_go_only_to_member_accounts():
+    members = {GROUPS[0]: {1}, GROUPS[1]: {2}, GROUPS[2]: {1, 2}, GROUPS[3]: {9}}
+    budgets = {1: (1.0, 0), 2: (1.0, 100)}
+
+    plan, unassigned = shard_groups(GROUPS[:5], members, budgets, fallback=1)
+    # Faqat 2-akkaunt a'zo guruh kech boshlasa ham unga beriladi; umumiy guruh tezroq tugatadiganga
+    assert {client_id: sorted(groups) for client_id, groups in plan.items()} == {
+        1: sorted([GROUPS[0], GROUPS[2], GROUPS[3], GROUPS[4]]), 2: [GROUPS[1]]
+    }
+    assert unassigned == []
+
+    plan, unassigned = shard_groups(GROUPS[:5], members, budgets)
+    assert sorted(unassigned) == sorted([GROUPS[3], GROUPS[4]])
+    assert GROUPS[3] not in plan.get(1, []) + plan.get(2, [])
+
+
+def test_stopped_account_gets_groups_only_without_alternative():
+    members = {group_id: {1, 2} for group_id in GROUPS[:4]}
+    members[GROUPS[4]] = {2}
+    budgets = {1: (1.0, 0), 2: (0.0, 0)}
+
+    plan, unassigned = shard_groups(GROUPS[:5], members, budgets)
+    assert plan == {1: GROUPS[:4], 2: [GROUPS[4]]}
+    assert unassigned == []
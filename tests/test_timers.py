@@ -0,0 +1,94 @@
+import asyncio
+
+from utils.scheduler.timers import TimerHeap, VirtualClock
+
+
+def test_pop_due_returns_entries_in_time_order():
+    timers = TimerHeap()
+    timers.schedule("c", 30, "payload-c")
+    timers.schedule("a", 10)
+    timers.schedule("b", 20)
+
+    assert timers.next_fire_time() == 10
+    assert timers.pop_due(25) == [("a", 10, None), ("b", 20, None)]
+    assert len(timers) == 1
+    assert timers.pop_due(25) == []
+    assert timers.pop_due(30) == [("c", 30, "payload-c")]
+    assert timers.next_fire_time() is None
+
+
+def test_reschedule_keeps_one_entry_per_key():
+    timers = TimerHeap()
+    timers.schedule(1, 10)
+    timers.schedule(1, 50, "new")
+
+    assert len(timers) == 1
+    assert timers.when(1) == 50
+    assert timers.next_fire_time() == 50
+    assert timers.pop_due(40) == []
+    assert timers.pop_due(50) == [(1, 50, "new")]
+
+
+def test_cancel_skips_entry():
+    timers = TimerHeap()
+    timers.schedule(1, 10)
+    timers.schedule(2, 20)
+
+    assert timers.cancel(1)
+    assert not timers.cancel(1)
+    assert 1 not in timers
+    assert timers.next_fire_time() == 20
+    assert timers.due_count(100) == 1
+    assert timers.pop_due(100) == [(2, 20, None)]
+
+
+def test_pop_due_limit_leaves_rest_for_next_call():
+    timers = TimerHeap()
+    for key in range(5):
+        timers.schedule(key, key)
+
+    assert [key for key, _, _ in timers.pop_due(10, limit=2)] == [0, 1]
+    assert timers.due_count(10) == 3
+    assert [key for key, _, _ in timers.pop_due(10)] == [2, 3, 4]
+
+
+def test_same_time_fires_in_schedule_order():
+    timers = TimerHeap()
+    for key in ("x", "y", "z"):
+        timers.schedule(key, 5)
+
+    assert [key for key, _, _ in timers.pop_due(5)] == ["x", "y", "z"]
+
+
+def test_update_payload_keeps_time():
+    timers = TimerHeap()
+    timers.schedule(1, 10, "old")
+    timers.update_payload(1, "new")
+
+    assert timers.payload(1) == "new"
+    assert timers.when(1) == 10
+
+
+def test_cancelled_entries_are_compacted():
+    timers = TimerHeap()
+    for key in range(1000):
+        timers.schedule(key, key)
+    for key in range(999):
+        timers.cancel(key)
+    timers.schedule("last", 5000)
+
+    assert len(timers) == 2
+    assert len(timers._heap) <= 2 * len(timers) + 64
+    assert timers.next_fire_time() == 999
+
+
+def test_virtual_clock_wait_advances_time_without_event():
+    clock = VirtualClock(start=100)
+    event = asyncio.Event()
+
+    assert asyncio.run(clock.wait(event, 30)) is False
+    assert clock.now() == 130
+
+    event.set()
+    assert asyncio.run(clock.wait(event, 30)) is True
+    assert clock.now() == 130
@@ -1,4 +1,4 @@
-from .notify_admins import on_startup_notify
+from .notify_admins import on_startup_notify, notify_admins
 from .set_bot_commands import set_default_commands
 from .misc import logging
 
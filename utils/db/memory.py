@@ -0,0 +1,445 @@
+import itertools
+from collections import Counter
+from datetime import datetime, timedelta
+
+from utils.scheduler.phase import next_slot
+
+
+class _Listener:
+    """create_listener() qaytaradigan ulanish o'rnini bosuvchi (NOTIFY kelmaydi)"""
+
+    def __init__(self):
+        self._closed = False
+
+    def add_termination_listener(self, callback):
+        pass
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    async def close(self):
+        self._closed = True
+
+
+class InMemoryDatabase:
+    """
+    Scheduler ishlatadigan Database metodlarining xotiradagi nusxasi (benchmark uchun).
+
+    Semantikasi postgres.py dagi SQL bilan bir xil: lease, outbox holatlari,
+    ON CONFLICT va h.k. CURRENT_TIMESTAMP o'rniga `clock` vaqti ishlatiladi.
+    Har bir metod chaqiruvi bitta so'rov sifatida `queries` da hisoblanadi.
+    """
+
+    def __init__(self, clock, phase_slots: bool = True):
+        self.clock = clock
+        # False - eski xatti-harakat: navbat yaratilgan vaqtdan boshlab hisoblanadi
+        self.phase_slots = phase_slots
+        self.queries = 0
+        self.clients = {}
+        self.users = {}  # telegram_id -> active_client_session
+        self.advertisements = {}
+        self.dialogs = {}  # client_id -> {group_id: {"title": ..., "can_write": ..., "updated_at": ...}}
+        self.peers = {}  # (client_id, peer_id) -> ClientPeers qatori
+        self.health = {}  # client_id -> ClientHealth qatori
+        self.group_failures = {}  # (client_id, group_id) -> {"failures": ..., "is_dead": ...}
+        self.logs = {}  # (ad_id, group_id) -> sent_at
+        self.outbox = {}
+        self.lateness = []  # navbat vaqtidan band qilingangacha kechikish (soniya)
+        self.send_delays = []  # navbat vaqtidan guruhga yuborilgangacha (soniya)
+        self.send_delays_by_ad = {}  # ad_id -> [kechikish, ...]
+        self.planned = set()  # (ad_id, group_id, slot) - outbox'ga yoyilgan yuborishlar
+        self.delivered = Counter()  # (ad_id, group_id, slot) -> loglarga yozilgan marta
+        self.failed = set()  # butunlay muvaffaqiyatsiz (failed) yuborishlar
+        self._slot_due = {}  # (ad_id, slot) -> navbatning asl vaqti (slot keyingi next_run_at bo'ladi)
+        self._ad_ids = itertools.count(1)
+        self._outbox_ids = itertools.count(1)
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.clock.now())
+
+    def _query(self):
+        self.queries += 1
+
+    # --- benchmark uchun ma'lumot qo'shish ---
+    def add_client(self, client_id: int, owner_id: int = None, send_rate=None, send_burst=None) -> dict:
+        self.clients[client_id] = {
+            "id": client_id, "api_id": 0, "api_hash": "", "stringsession": "", "phone": str(client_id),
+            "is_active": True, "is_banned": False, "send_rate": send_rate, "send_burst": send_burst,
+            "cooldown_until": None, "current_rate": None, "ban_reason": None, "banned_at": None,
+        }
+        if owner_id is not None:
+            self.users[owner_id] = client_id
+        return self.clients[client_id]
+
+    def add_advertisement(self, text: str, duration_minutes: int, created_by: int, group_ids: list,
+                          photo_id: str = None, multi_account: bool = False, next_run_at: datetime = None,
+                          catch_up: str = "once") -> int:
+        ad_id = next(self._ad_ids)
+        self.advertisements[ad_id] = {
+            "id": ad_id, "text": text, "photo_id": photo_id, "duration_minutes": duration_minutes,
+            "created_by": created_by, "group_ids": list(group_ids), "is_active": True,
+            "multi_account": multi_account, "last_sent_at": None, "next_run_at": next_run_at,
+            "claimed_by": None, "lease_expires_at": None, "catch_up": catch_up,
+            "send_weight": 1.0,
+        }
+        if next_run_at is None:
+            after = self.now() + timedelta(minutes=0 if self.phase_slots else duration_minutes)
+            self.advertisements[ad_id]["next_run_at"] = self._slot(ad_id, duration_minutes, after)
+        return ad_id
+
+    def _slot(self, ad_id: int, duration_minutes: int, after: datetime) -> datetime:
+        return next_slot(ad_id, duration_minutes, after) if self.phase_slots else after
+
+    async def create_listener(self, channel: str, callback):
+        self._query()
+        return _Listener()
+
+    # --- Clients ---
+    async def get_client_by_id(self, client_id: int):
+        self._query()
+        row = self.clients.get(client_id)
+        return dict(row) if row else None
+
+    async def get_client_for_advertisement(self, created_by: int):
+        self._query()
+        row = self.clients.get(self.users.get(created_by))
+        if row and row["is_active"] and not row["is_banned"]:
+            return dict(row)
+        return None
+
+    async def get_sending_clients(self):
+        self._query()
+        return [dict(row) for row in self.clients.values() if row["is_active"] and not row["is_banned"]]
+
+    async def set_client_cooldown(self, client_id: int, cooldown_seconds, current_rate):
+        self._query()
+        if client_id in self.clients:
+            cooldown_until = None if cooldown_seconds is None else self.now() + timedelta(seconds=cooldown_seconds)
+            self.clients[client_id].update(cooldown_until=cooldown_until, current_rate=current_rate)
+
+    async def get_client_cooldowns(self):
+        self._query()
+        now = self.now()
+        rows = []
+        for row in self.clients.values():
+            active = row["cooldown_until"] is not None and row["cooldown_until"] > now
+            if active or row["current_rate"] is not None:
+                rows.append({
+                    "id": row["id"], "current_rate": row["current_rate"],
+                    "cooldown_seconds": (row["cooldown_until"] - now).total_seconds() if active else None,
+                })
+        return rows
+
+    async def disable_client(self, client_id: int, reason: str, banned: bool):
+        self._query()
+        row = self.clients.get(client_id)
+        if row:
+            row.update(is_banned=row["is_banned"] or banned, is_active=row["is_active"] and banned,
+                       ban_reason=reason, banned_at=self.now())
+
+    async def restore_client(self, client_id: int):
+        self._query()
+        row = self.clients.get(client_id)
+        if row and row["ban_reason"] == "spam":
+            row.update(is_banned=False, ban_reason=None, banned_at=None)
+
+    async def get_all_clients(self):
+        self._query()
+        return [dict(row) for row in self.clients.values()]
+
+    async def save_client_health(self, results: list):
+        self._query()
+        now = self.now()
+        for client_id, authorized, spam_status, details in results:
+            self.health[client_id] = {
+                "authorized": authorized, "spam_status": spam_status, "details": details, "checked_at": now,
+            }
+
+    async def get_client_health(self):
+        self._query()
+        empty = {"authorized": None, "spam_status": None, "details": None, "checked_at": None}
+        return [dict(row, **self.health.get(client_id, empty)) for client_id, row in sorted(self.clients.items())]
+
+    async def set_client_rate(self, client_id: int, send_rate, send_burst):
+        self._query()
+        if client_id in self.clients:
+            self.clients[client_id].update(send_rate=send_rate, send_burst=send_burst)
+
+    # --- ClientDialogs ---
+    async def save_client_dialogs(self, client_id: int, groups: list):
+        self._query()
+        now = self.now()
+        self.dialogs[client_id] = {
+            group["id"]: {
+                "title": group["title"], "type": group.get("type"), "members": group.get("members"),
+                "can_write": group.get("can_write", True), "updated_at": now,
+            }
+            for group in groups
+        }
+
+    async def get_client_dialogs(self, client_id: int):
+        self._query()
+        rows = [dict(row, id=group_id) for group_id, row in self.dialogs.get(client_id, {}).items()]
+        return sorted(rows, key=lambda row: row["title"])
+
+    # --- ClientPeers ---
+    async def save_client_peers(self, client_id: int, peers: list):
+        self._query()
+        for peer_id, peer_type, entity_id, access_hash in peers:
+            self.peers[(client_id, peer_id)] = {
+                "peer_id": peer_id, "peer_type": peer_type, "entity_id": entity_id, "access_hash": access_hash,
+            }
+
+    async def get_client_peers(self, client_id: int, peer_ids: list):
+        self._query()
+        return [self.peers[(client_id, peer_id)] for peer_id in peer_ids if (client_id, peer_id) in self.peers]
+
+    async def delete_client_peer(self, client_id: int, peer_id: int):
+        self._query()
+        self.peers.pop((client_id, peer_id), None)
+
+    async def get_fresh_dialog_clients(self, ttl_minutes: int):
+        self._query()
+        since = self.now() - timedelta(minutes=ttl_minutes)
+        return [
+            client_id for client_id, groups in self.dialogs.items()
+            if groups and max(group["updated_at"] for group in groups.values()) > since
+        ]
+
+    async def get_group_members(self, group_ids: list):
+        self._query()
+        return self._group_members(set(group_ids))
+
+    def _group_members(self, wanted: set) -> list:
+        return [
+            {"client_id": client_id, "group_id": group_id}
+            for client_id, groups in self.dialogs.items()
+            if self.clients.get(client_id, {}).get("is_active") and not self.clients[client_id]["is_banned"]
+            for group_id, group in groups.items()
+            if group_id in wanted and group["can_write"]
+            and not self.group_failures.get((client_id, group_id), {}).get("is_dead")
+        ]
+
+    async def record_group_failure(self, client_id: int, group_id: int, error: str, threshold: int):
+        self._query()
+        row = self.group_failures.setdefault((client_id, group_id), {"failures": 0, "is_dead": False})
+        row["failures"] += 1
+        row.update(is_dead=row["failures"] >= threshold, last_error=error, updated_at=self.now())
+        return row["failures"], row["is_dead"]
+
+    async def clear_group_failures(self, client_id: int, group_id: int):
+        self._query()
+        self.group_failures.pop((client_id, group_id), None)
+
+    async def remove_dead_group(self, ad_id: int, group_id: int) -> bool:
+        self._query()
+        ad = self.advertisements.get(ad_id)
+        if not ad or group_id not in ad["group_ids"]:
+            return False
+        if ad["multi_account"] and self._group_members({group_id}):
+            return False
+        ad["group_ids"] = [gid for gid in ad["group_ids"] if gid != group_id]
+        return True
+
+    # --- Advertisements ---
+    async def get_due_advertisements(self, horizon):
+        self._query()
+        rows = []
+        for ad in self.advertisements.values():
+            if not ad["is_active"] or ad["duration_minutes"] <= 0:
+                continue
+            when = ad["next_run_at"] if ad["claimed_by"] is None else ad["lease_expires_at"]
+            if when <= horizon:
+                rows.append({"id": ad["id"], "duration_minutes": ad["duration_minutes"], "next_run_at": when})
+        return sorted(rows, key=lambda row: row["next_run_at"])
+
+    async def claim_advertisement_run(self, ad_id: int, node_id: str, lease_seconds: int, backfill_limit: int = 0):
+        self._query()
+        now = self.now()
+        ad = self.advertisements.get(ad_id)
+        if not ad or not ad["is_active"] or ad["duration_minutes"] <= 0:
+            return None
+        previous_owner = ad["claimed_by"]
+        due_at = ad["next_run_at"]
+        if previous_owner is None:
+            if ad["next_run_at"] > now + timedelta(seconds=5):
+                return None
+            due = ad["next_run_at"]
+            self.lateness.append(max((now - due).total_seconds(), 0))
+            interval = timedelta(minutes=ad["duration_minutes"])
+            earliest = now - interval * backfill_limit if ad["catch_up"] == "backfill" else now
+            ad["next_run_at"] = self._slot(ad_id, ad["duration_minutes"], max(due + interval, earliest))
+            self._slot_due[(ad_id, ad["next_run_at"])] = due
+        elif ad["lease_expires_at"] >= now:
+            return None
+        ad["claimed_by"] = node_id
+        ad["lease_expires_at"] = now + timedelta(seconds=lease_seconds)
+        return dict(ad, previous_owner=previous_owner, due_at=due_at)
+
+    async def renew_advertisement_leases(self, ad_ids: list, node_id: str, lease_seconds: int) -> list:
+        self._query()
+        renewed = []
+        for ad_id in ad_ids:
+            ad = self.advertisements.get(ad_id)
+            if ad and ad["claimed_by"] == node_id:
+                ad["lease_expires_at"] = self.now() + timedelta(seconds=lease_seconds)
+                renewed.append(ad_id)
+        return renewed
+
+    async def get_advertisement_schedule(self, ad_id: int):
+        self._query()
+        ad = self.advertisements.get(ad_id)
+        if not ad:
+            return None
+        return {key: ad[key] for key in ("id", "is_active", "duration_minutes", "next_run_at")}
+
+    async def finish_advertisement_run(self, ad_id: int, node_id: str):
+        self._query()
+        ad = self.advertisements.get(ad_id)
+        if ad and ad["claimed_by"] == node_id:
+            ad.update(last_sent_at=self.now(), claimed_by=None, lease_expires_at=None)
+
+    async def expire_advertisement_lease(self, ad_id: int, node_id: str):
+        self._query()
+        ad = self.advertisements.get(ad_id)
+        if ad and ad["claimed_by"] == node_id:
+            ad["lease_expires_at"] = self.now() - timedelta(seconds=1)
+
+    # --- AdvertisementLogs ---
+    async def insert_advertisement_logs(self, records: list):
+        self._query()
+        now = self.now()
+        for ad_id, group_id, sent_at, outbox_id in records:
+            if ad_id in self.advertisements:
+                key = (ad_id, group_id)
+                self.logs[key] = max(self.logs.get(key, sent_at), sent_at)
+            row = self.outbox.get(outbox_id)
+            if row:
+                self.delivered[(row["ad_id"], row["group_id"], row["slot"])] += 1
+                due = self._slot_due.get((row["ad_id"], row["slot"]), row["slot"])
+                self.send_delays.append((sent_at - due).total_seconds())
+                self.send_delays_by_ad.setdefault(row["ad_id"], []).append(self.send_delays[-1])
+                row.update(state="done", last_error=None, updated_at=now)
+
+    # --- AdvertisementOutbox ---
+    async def count_outbox_rows(self, ad_id: int, slot):
+        self._query()
+        return sum(1 for row in self.outbox.values() if row["ad_id"] == ad_id and row["slot"] == slot)
+
+    async def create_outbox_rows(self, ad_id: int, slot, plan: dict):
+        self._query()
+        now = self.now()
+        existing = {
+            row["group_id"] for row in self.outbox.values() if row["ad_id"] == ad_id and row["slot"] == slot
+        }
+        for client_id, group_ids in plan.items():
+            for group_id in group_ids:
+                if group_id in existing:
+                    continue
+                existing.add(group_id)
+                self.planned.add((ad_id, group_id, slot))
+                row_id = next(self._outbox_ids)
+                self.outbox[row_id] = {
+                    "id": row_id, "ad_id": ad_id, "group_id": group_id, "slot": slot, "client_id": client_id,
+                    "idempotency_key": f"{ad_id}:{group_id}:{slot.isoformat()}", "state": "pending",
+                    "attempts": 0, "next_attempt_at": now, "claimed_by": None, "last_error": None,
+                    "updated_at": now,
+                }
+
+    async def claim_outbox_rows(self, ad_id: int, slot, node_id: str):
+        self._query()
+        now = self.now()
+        claimed = []
+        for row in self.outbox.values():
+            if row["ad_id"] != ad_id or row["slot"] != slot or row["next_attempt_at"] > now:
+                continue
+            if row["state"] == "pending" or (row["state"] == "sending" and row["claimed_by"] != node_id):
+                row.update(state="sending", attempts=row["attempts"] + 1, claimed_by=node_id, updated_at=now)
+                claimed.append({key: row[key] for key in
+                                ("id", "group_id", "client_id", "attempts", "idempotency_key")})
+        return claimed
+
+    async def release_outbox_rows(self, ad_id: int, slot, node_id: str):
+        self._query()
+        now = self.now()
+        for row in self.outbox.values():
+            if (row["ad_id"] == ad_id and row["slot"] == slot and row["claimed_by"] == node_id
+                    and row["state"] == "sending"):
+                row.update(state="pending", claimed_by=None, next_attempt_at=now, updated_at=now)
+
+    async def reschedule_outbox_row(self, row_id: int, state: str, delay_seconds: float, error: str,
+                                    min_delay_seconds: float = 0):
+        self._query()
+        row = self.outbox.get(row_id)
+        if row:
+            next_attempt_at = self.now() + timedelta(seconds=max(delay_seconds, min_delay_seconds))
+            row.update(state=state, next_attempt_at=next_attempt_at, last_error=error, updated_at=self.now())
+            if state == "failed":
+                self.failed.add((row["ad_id"], row["group_id"], row["slot"]))
+
+    def _unsent_rows(self, ad_id: int, slot, client_id: int) -> list:
+        return [
+            row for row in self.outbox.values()
+            if row["ad_id"] == ad_id and row["slot"] == slot and row["client_id"] == client_id
+            and row["state"] in ("pending", "sending")
+        ]
+
+    async def get_unsent_outbox_groups(self, ad_id: int, slot, client_id: int):
+        self._query()
+        return [row["group_id"] for row in self._unsent_rows(ad_id, slot, client_id)]
+
+    async def reassign_outbox_rows(self, ad_id: int, slot, client_id: int, plan: dict):
+        self._query()
+        now = self.now()
+        targets = {group_id: new_client_id for new_client_id, group_ids in plan.items() for group_id in group_ids}
+        for row in self._unsent_rows(ad_id, slot, client_id):
+            if row["group_id"] in targets:
+                row.update(client_id=targets[row["group_id"]], state="pending", claimed_by=None,
+                           next_attempt_at=now, updated_at=now)
+
+    async def fail_outbox_rows(self, ad_id: int, slot, client_id: int, error: str):
+        self._query()
+        for row in self._unsent_rows(ad_id, slot, client_id):
+            row.update(state="failed", last_error=error, updated_at=self.now())
+            self.failed.add((row["ad_id"], row["group_id"], row["slot"]))
+
+    async def next_outbox_attempt_delay(self, ad_id: int, slot):
+        self._query()
+        pending = [
+            row["next_attempt_at"] for row in self.outbox.values()
+            if row["ad_id"] == ad_id and row["slot"] == slot and row["state"] == "pending"
+        ]
+        return (min(pending) - self.now()).total_seconds() if pending else None
+
+    def delivery_report(self) -> dict:
+        """
+        Yo'qolgan va takroriy yuborishlar (benchmark tekshiruvi uchun).
+
+        lost - outbox'dan yuborilmasdan o'chib ketgan qatorlar; duplicate_sends - bitta
+        (reklama, guruh, navbat) ikki marta yuborilgan; duplicate_slots - bitta reklamaning
+        bir intervaldan yaqin ikki navbati (navbat qayta rejalashtirilgan).
+        """
+        in_outbox = {(row["ad_id"], row["group_id"], row["slot"]) for row in self.outbox.values()}
+        lost = [key for key in self.planned if key not in self.delivered and key not in self.failed
+                and key not in in_outbox]
+        slots = {}
+        for ad_id, _, slot in self.planned:
+            slots.setdefault(ad_id, set()).add(slot)
+        duplicate_slots = 0
+        for ad_id, ad_slots in slots.items():
+            interval = timedelta(minutes=self.advertisements[ad_id]["duration_minutes"])
+            ordered = sorted(ad_slots)
+            duplicate_slots += sum(1 for a, b in zip(ordered, ordered[1:]) if b - a < interval)
+        return {
+            "planned": len(self.planned),
+            "delivered": len(self.delivered),
+            "lost": len(lost),
+            "duplicate_sends": sum(count - 1 for count in self.delivered.values() if count > 1),
+            "duplicate_slots": duplicate_slots,
+        }
+
+    async def prune_outbox(self, ad_id: int, slot):
+        self._query()
+        stale = [row_id for row_id, row in self.outbox.items() if row["ad_id"] == ad_id and row["slot"] < slot]
+        for row_id in stale:
+            del self.outbox[row_id]
@@ -6,6 +6,8 @@ from asyncpg.pool import Pool
 from aiogram.client.session.middlewares.request_logging import logger
 from data import config
 
+# Advertisements o'zgarganda NOTIFY yuboriladigan kanal
+ADVERTISEMENTS_CHANNEL = "advertisements_changed"
 
 
 class Database:
@@ -22,6 +24,12 @@ class Database:
         context = ssl.create_default_context(cafile=config.SSL_CERT_FILE)
         return context
 
+    async def create_listener(self, channel: str, callback) -> Connection:
+        """LISTEN uchun puldan tashqaridagi alohida ulanish"""
+        connection = await asyncpg.connect(dsn=config.DATABASE_URL, ssl=self.get_ssl_context())
+        await connection.add_listener(channel, callback)
+        return connection
+
     async def execute(
         self,
         command,
@@ -45,6 +53,33 @@ class Database:
                     result = await connection.execute(command, *args)
             return result
 
+    async def migrate(self):
+        """
+        Jadvallar va migratsiyalar.
+
+        Avval barcha jadvallar (CREATE TABLE IF NOT EXISTS), keyin ALTER, eski
+        ma'lumotlarni to'ldirish, funksiya va triggerlar - ular boshqa jadvallar
+        va keyin qo'shilgan ustunlarga tayanadi (yangi bazada ham ishlashi uchun).
+        """
+        await self.create_table_clients()
+        await self.create_table_users()
+        await self.create_table_advertisement()
+        await self.create_table_client_dialogs()
+        await self.create_table_client_peers()
+        await self.create_table_client_group_failures()
+        await self.create_table_client_health()
+        await self.create_table_group_sets()
+        await self.create_table_advertisement_logs()
+        await self.create_table_advertisement_outbox()
+
+        await self.alter_clients_table()
+        await self.alter_advertisement_table()
+        await self.alter_client_dialogs_table()
+        await self.alter_advertisement_logs_table()
+        await self.alter_advertisement_columns()
+        await self.create_advertisement_slot_function()
+        await self.create_advertisement_triggers()
+
     async def create_table_advertisement(self):
         sql = """
         CREATE TABLE IF NOT EXISTS Advertisements (
@@ -61,6 +96,180 @@ class Database:
         await self.execute(sql, execute=True)
 
 
+    async def alter_advertisement_columns(self):
+        """Advertisements jadvaliga keyin qo'shilgan ustunlar"""
+        sql = """
+        ALTER TABLE Advertisements
+        ADD COLUMN IF NOT EXISTS multi_account BOOLEAN DEFAULT FALSE,
+        ADD COLUMN IF NOT EXISTS last_sent_at TIMESTAMP NULL,
+        ADD COLUMN IF NOT EXISTS next_run_at TIMESTAMP NULL;
+
+        -- Eski reklamalar uchun oxirgi yuborilgan va keyingi navbat vaqtini loglardan to'ldirish
+        UPDATE Advertisements a SET last_sent_at = l.last_sent
+        FROM (SELECT ad_id, MAX(sent_at) AS last_sent FROM AdvertisementLogs GROUP BY ad_id) l
+        WHERE l.ad_id = a.id AND a.last_sent_at IS NULL;
+
+        UPDATE Advertisements
+        SET next_run_at = COALESCE(last_sent_at, created_at) + make_interval(mins => duration_minutes)
+        WHERE next_run_at IS NULL;
+
+        CREATE INDEX IF NOT EXISTS advertisements_next_run_at_idx
+        ON Advertisements (next_run_at) WHERE is_active;
+
+        -- Bir nechta scheduler node'lari uchun lease
+        ALTER TABLE Advertisements
+        ADD COLUMN IF NOT EXISTS claimed_by TEXT NULL,
+        ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP NULL;
+
+        CREATE INDEX IF NOT EXISTS advertisements_lease_expires_at_idx
+        ON Advertisements (lease_expires_at) WHERE claimed_by IS NOT NULL;
+
+        -- O'tkazib yuborilgan navbatlar siyosati: once, skip yoki backfill
+        ALTER TABLE Advertisements
+        ADD COLUMN IF NOT EXISTS catch_up TEXT NOT NULL DEFAULT 'once';
+
+        -- Akkaunt navbatidagi ulush (adolatli navbat, 1 - oddiy)
+        ALTER TABLE Advertisements
+        ADD COLUMN IF NOT EXISTS send_weight REAL NOT NULL DEFAULT 1;
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_advertisement_slot_function(self):
+        """
+        advertisement_slot(id, duration_minutes, after) - reklamaning `after` dan keyingi navbati.
+
+        Navbatlar k * interval + siljish ko'rinishida bo'ladi, siljish esa id dan
+        olinadi (utils/scheduler/phase.py bilan bir xil). Bir vaqtda yaratilgan
+        reklamalar interval bo'ylab tarqaladi va bir soniyaga to'planib qolmaydi.
+        """
+        sql = """
+        CREATE OR REPLACE FUNCTION advertisement_slot(ad_id INT, duration_minutes INT, after TIMESTAMP)
+        RETURNS TIMESTAMP AS $$
+            SELECT TIMESTAMP '1970-01-01' + make_interval(secs =>
+                (ceil((extract(epoch FROM after)::float8 - phase) / period) * period + phase)::float8
+            )
+            FROM (
+                SELECT duration_minutes * 60 AS period,
+                    floor(
+                        (ad_id * 0.6180339887498949::float8 - floor(ad_id * 0.6180339887498949::float8))
+                        * (duration_minutes * 60)
+                    ) AS phase
+            ) p
+        $$ LANGUAGE sql IMMUTABLE;
+
+        -- Mavjud reklamalarni o'z siljishiga tekislash (tekislanganlari o'zgarmaydi)
+        UPDATE Advertisements
+        SET next_run_at = advertisement_slot(id, duration_minutes, next_run_at)
+        WHERE duration_minutes > 0
+        AND claimed_by IS NULL
+        AND next_run_at IS DISTINCT FROM advertisement_slot(id, duration_minutes, next_run_at);
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_advertisement_triggers(self):
+        """Reklama qo'shilganda, o'zgartirilganda yoki o'chirilganda NOTIFY yuborish"""
+        sql = f"""
+        CREATE OR REPLACE FUNCTION notify_advertisement_changed() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('{ADVERTISEMENTS_CHANNEL}', json_build_object('op', TG_OP, 'id', OLD.id)::text);
+                RETURN OLD;
+            END IF;
+            PERFORM pg_notify('{ADVERTISEMENTS_CHANNEL}', json_build_object('op', TG_OP, 'id', NEW.id)::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS advertisements_changed ON Advertisements;
+        -- next_run_at ni scheduler o'zi suradi, shuning uchun u kuzatilmaydi
+        CREATE TRIGGER advertisements_changed
+        AFTER INSERT OR DELETE OR UPDATE OF is_active, duration_minutes, group_ids, text, photo_id, multi_account
+        ON Advertisements
+        FOR EACH ROW EXECUTE FUNCTION notify_advertisement_changed();
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_table_client_dialogs(self):
+        """Akkaunt a'zo bo'lgan guruhlar (ko'p akkauntli tarqatish uchun)"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS ClientDialogs (
+            client_id INT NOT NULL REFERENCES Clients(id) ON DELETE CASCADE,
+            group_id BIGINT NOT NULL,
+            title TEXT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (client_id, group_id)
+        );
+        CREATE INDEX IF NOT EXISTS clientdialogs_group_id_idx ON ClientDialogs (group_id);
+        """
+        await self.execute(sql, execute=True)
+
+    async def alter_client_dialogs_table(self):
+        """Guruh tanlash katalogi uchun: turi, a'zolar soni va yozish huquqi"""
+        sql = """
+        ALTER TABLE ClientDialogs
+        ADD COLUMN IF NOT EXISTS peer_type TEXT NULL,
+        ADD COLUMN IF NOT EXISTS members INT NULL,
+        ADD COLUMN IF NOT EXISTS can_write BOOLEAN NOT NULL DEFAULT TRUE;
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_table_client_peers(self):
+        """Akkaunt bo'yicha guruhlarning InputPeer ma'lumotlari (StringSession entity keshi o'rniga)"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS ClientPeers (
+            client_id INT NOT NULL REFERENCES Clients(id) ON DELETE CASCADE,
+            peer_id BIGINT NOT NULL,
+            peer_type TEXT NOT NULL,
+            entity_id BIGINT NOT NULL,
+            access_hash BIGINT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (client_id, peer_id)
+        );
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_table_client_health(self):
+        """Akkauntlar sessiyasi va spam holatining oxirgi tekshiruvi (SessionHealthChecker)"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS ClientHealth (
+            client_id INT PRIMARY KEY REFERENCES Clients(id) ON DELETE CASCADE,
+            authorized BOOLEAN NULL,
+            spam_status TEXT NOT NULL DEFAULT 'unknown',
+            details TEXT NULL,
+            checked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_table_group_sets(self):
+        """Admin saqlagan guruh to'plamlari (reklama uchun qayta tanlash)"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS GroupSets (
+            id SERIAL PRIMARY KEY,
+            owner_id BIGINT NOT NULL,
+            name TEXT NOT NULL,
+            group_ids BIGINT[] NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (owner_id, name)
+        );
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_table_client_group_failures(self):
+        """Akkaunt + guruh bo'yicha doimiy yuborish xatoliklari (o'lik guruhlarni aniqlash uchun)"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS ClientGroupFailures (
+            client_id INT NOT NULL REFERENCES Clients(id) ON DELETE CASCADE,
+            group_id BIGINT NOT NULL,
+            failures INT NOT NULL DEFAULT 0,
+            is_dead BOOLEAN NOT NULL DEFAULT FALSE,
+            last_error TEXT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (client_id, group_id)
+        );
+        """
+        await self.execute(sql, execute=True)
+
     async def create_table_clients(self):
         sql = """
         CREATE TABLE IF NOT EXISTS Clients (
@@ -75,6 +284,91 @@ class Database:
         """
         await self.execute(sql, execute=True)
         
+    async def alter_clients_table(self):
+        """Akkaunt bo'yicha yuborish tezligi (NULL - standart sozlama)"""
+        sql = """
+        ALTER TABLE Clients
+        ADD COLUMN IF NOT EXISTS send_rate REAL NULL,
+        ADD COLUMN IF NOT EXISTS send_burst INT NULL,
+        ADD COLUMN IF NOT EXISTS cooldown_until TIMESTAMP NULL,
+        ADD COLUMN IF NOT EXISTS current_rate REAL NULL,
+        ADD COLUMN IF NOT EXISTS ban_reason TEXT NULL,
+        ADD COLUMN IF NOT EXISTS banned_at TIMESTAMP NULL;
+        """
+        await self.execute(sql, execute=True)
+
+    async def set_client_cooldown(self, client_id: int, cooldown_seconds, current_rate):
+        """
+        FloodWait holatini saqlash (NULL - akkaunt to'liq tiklangan).
+        Muddat bazaning soati bo'yicha hisoblanadi - ilova va baza vaqt zonasi farq qilishi mumkin.
+        """
+        sql = """
+        UPDATE Clients
+        SET cooldown_until = CURRENT_TIMESTAMP + make_interval(secs => $1), current_rate = $2
+        WHERE id = $3
+        """
+        await self.execute(sql, cooldown_seconds, current_rate, client_id, execute=True)
+
+    async def get_client_cooldowns(self):
+        """Cooldown'dagi akkauntlar: cooldown_seconds - qolgan vaqt (soniya, tugagan bo'lsa NULL)"""
+        sql = """
+        SELECT id, current_rate,
+               CASE WHEN cooldown_until > CURRENT_TIMESTAMP
+                    THEN EXTRACT(EPOCH FROM cooldown_until - CURRENT_TIMESTAMP)::FLOAT END AS cooldown_seconds
+        FROM Clients
+        WHERE cooldown_until > CURRENT_TIMESTAMP OR current_rate IS NOT NULL;
+        """
+        return await self.execute(sql, fetch=True)
+
+    async def disable_client(self, client_id: int, reason: str, banned: bool):
+        """Akkauntni yuborishdan chiqarish: banned - is_banned = TRUE, aks holda is_active = FALSE"""
+        sql = """
+        UPDATE Clients
+        SET is_banned = is_banned OR $3,
+            is_active = is_active AND $3,
+            ban_reason = $2,
+            banned_at = CURRENT_TIMESTAMP
+        WHERE id = $1;
+        """
+        await self.execute(sql, client_id, reason, banned, execute=True)
+
+    async def restore_client(self, client_id: int):
+        """Spam-cheklov tugagan akkauntni yana yuborishga qaytarish"""
+        sql = """
+        UPDATE Clients SET is_banned = FALSE, ban_reason = NULL, banned_at = NULL
+        WHERE id = $1 AND ban_reason = 'spam';
+        """
+        await self.execute(sql, client_id, execute=True)
+
+    async def save_client_health(self, results: list):
+        """(client_id, authorized, spam_status, details) natijalarini yozish"""
+        sql = """
+        INSERT INTO ClientHealth (client_id, authorized, spam_status, details, checked_at)
+        VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+        ON CONFLICT (client_id) DO UPDATE
+        SET authorized = EXCLUDED.authorized,
+            spam_status = EXCLUDED.spam_status,
+            details = EXCLUDED.details,
+            checked_at = EXCLUDED.checked_at;
+        """
+        async with self.pool.acquire() as connection:
+            await connection.executemany(sql, results)
+
+    async def get_client_health(self):
+        """Barcha akkauntlar va ularning oxirgi tekshiruv natijasi (tekshirilmagan bo'lsa NULL)"""
+        sql = """
+        SELECT c.id, c.phone, c.is_active, c.is_banned, c.ban_reason, c.banned_at,
+               h.authorized, h.spam_status, h.details, h.checked_at
+        FROM Clients c
+        LEFT JOIN ClientHealth h ON h.client_id = c.id
+        ORDER BY c.id;
+        """
+        return await self.execute(sql, fetch=True)
+
+    async def set_client_rate(self, client_id: int, send_rate, send_burst):
+        sql = "UPDATE Clients SET send_rate = $1, send_burst = $2 WHERE id = $3"
+        await self.execute(sql, send_rate, send_burst, client_id, execute=True)
+
     async def create_table_advertisement_logs(self):
         sql = """
         CREATE TABLE IF NOT EXISTS AdvertisementLogs (
@@ -86,6 +380,46 @@ class Database:
         """
         await self.execute(sql, execute=True)
 
+    async def alter_advertisement_logs_table(self):
+        """Har bir (reklama, guruh) uchun bitta yozuv va reklama o'chirilganda loglarni ham o'chirish"""
+        sql = """
+        DELETE FROM AdvertisementLogs a
+        USING AdvertisementLogs b
+        WHERE a.ad_id = b.ad_id AND a.group_id = b.group_id AND a.id < b.id;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS advertisementlogs_ad_group_key
+        ON AdvertisementLogs (ad_id, group_id);
+
+        ALTER TABLE AdvertisementLogs DROP CONSTRAINT IF EXISTS advertisementlogs_ad_id_fkey;
+        ALTER TABLE AdvertisementLogs ADD CONSTRAINT advertisementlogs_ad_id_fkey
+        FOREIGN KEY (ad_id) REFERENCES Advertisements(id) ON DELETE CASCADE;
+        """
+        await self.execute(sql, execute=True)
+
+    async def create_table_advertisement_outbox(self):
+        """Har bir reklama navbati uchun (reklama, guruh) yuborishlari - qayta ishga tushganda davom ettiriladi"""
+        sql = """
+        CREATE TABLE IF NOT EXISTS AdvertisementOutbox (
+            id BIGSERIAL PRIMARY KEY,
+            ad_id INT NOT NULL REFERENCES Advertisements(id) ON DELETE CASCADE,
+            group_id BIGINT NOT NULL,
+            slot TIMESTAMP NOT NULL,
+            client_id INT NULL,
+            state TEXT NOT NULL DEFAULT 'pending'
+                CHECK (state IN ('pending', 'sending', 'done', 'failed')),
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            claimed_by TEXT NULL,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            last_error TEXT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (ad_id, group_id, slot)
+        );
+        CREATE INDEX IF NOT EXISTS advertisementoutbox_run_idx
+        ON AdvertisementOutbox (ad_id, slot, state);
+        """
+        await self.execute(sql, execute=True)
+
     async def create_table_users(self):
         sql = """
         CREATE TABLE IF NOT EXISTS Users (
@@ -106,12 +440,20 @@ class Database:
         )
         return sql, tuple(parameters.values())
 
-    async def add_advertisement(self, text, duration_minutes, created_by, group_ids, photo_id=None):
+    async def add_advertisement(self, text, duration_minutes, created_by, group_ids, photo_id=None, multi_account=False,
+                                catch_up="once"):
+        # id oldindan olinadi, chunki birinchi navbat reklama siljishiga bog'liq
         sql = """
-        INSERT INTO advertisements (photo_id, text, duration_minutes, created_by, group_ids)
-        VALUES ($1, $2, $3, $4, $5) RETURNING *;
+        WITH new_ad AS (SELECT nextval(pg_get_serial_sequence('advertisements', 'id'))::INT AS id)
+        INSERT INTO advertisements (id, photo_id, text, duration_minutes, created_by, group_ids, multi_account,
+                                    catch_up, next_run_at)
+        SELECT id, $1, $2, $3, $4, $5, $6, $7, advertisement_slot(id, $3, LOCALTIMESTAMP)
+        FROM new_ad
+        RETURNING *;
         """
-        return await self.execute(sql, photo_id, text, duration_minutes, created_by, group_ids, fetchrow=True)
+        return await self.execute(
+            sql, photo_id, text, duration_minutes, created_by, group_ids, multi_account, catch_up, fetchrow=True
+        )
 
     async def add_user(self, full_name, username, telegram_id):
         sql = "INSERT INTO users (full_name, username, telegram_id) VALUES($1, $2, $3) returning *"
@@ -158,6 +500,247 @@ class Database:
         """
         await self.execute(sql, ad_id, group_id, execute=True)
 
+    async def insert_advertisement_logs(self, records: list):
+        """
+        Yuborilgan reklamalarni bitta batch bilan qayd qilish.
+
+        :param records: [(ad_id, group_id, sent_at, outbox_id), ...] - outbox_id bo'lsa
+                        o'sha outbox qatori ham shu tranzaksiyada `done` qilinadi
+        """
+        sql = """
+        INSERT INTO AdvertisementLogs (ad_id, group_id, sent_at)
+        SELECT $1, $2, $3
+        WHERE EXISTS (SELECT 1 FROM Advertisements WHERE id = $1)
+        ON CONFLICT (ad_id, group_id)
+        DO UPDATE SET sent_at = GREATEST(AdvertisementLogs.sent_at, EXCLUDED.sent_at);
+        """
+        outbox_ids = [record[3] for record in records if record[3] is not None]
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(sql, [record[:3] for record in records])
+                if outbox_ids:
+                    await connection.execute(
+                        """
+                        UPDATE AdvertisementOutbox
+                        SET state = 'done', last_error = NULL, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ANY($1::BIGINT[])
+                        """,
+                        outbox_ids
+                    )
+
+    async def get_due_advertisements(self, horizon):
+        """
+        `horizon` gacha navbati keladigan faol reklamalar (next_run_at indeksi orqali).
+
+        Boshqa node band qilgan reklamalar lease tugash vaqtida tekshiriladi -
+        node yiqilgan bo'lsa ular shu vaqtda qayta olinadi.
+        """
+        sql = """
+        SELECT id, duration_minutes,
+            CASE WHEN claimed_by IS NULL THEN next_run_at ELSE lease_expires_at END AS next_run_at
+        FROM Advertisements
+        WHERE is_active = TRUE
+        AND duration_minutes > 0
+        AND (
+            (claimed_by IS NULL AND next_run_at <= $1)
+            OR (claimed_by IS NOT NULL AND lease_expires_at <= $1)
+        )
+        ORDER BY 3
+        """
+        return await self.execute(sql, horizon, fetch=True)
+
+    async def claim_advertisement_run(self, ad_id: int, node_id: str, lease_seconds: int, backfill_limit: int = 0):
+        """
+        Reklama navbatini shu node uchun band qilish (lease).
+
+        Navbati kelgan reklamada next_run_at keyingi navbatga (siljish bo'yicha) suriladi:
+        o'tib ketgan navbatlar tashlab yuboriladi, `backfill` siyosatida esa oxirgi
+        `backfill_limit` tasi birin-ketin yuboriladi. Lease'i tugagan (node yiqilgan)
+        reklama navbatni surmasdan qayta olinadi. Boshqa node band qilib turgan qator
+        SKIP LOCKED bilan o'tkazib yuboriladi.
+
+        :return: Reklama qatori (+ previous_owner, due_at - band qilingan navbat vaqti) yoki None
+        """
+        sql = """
+        WITH due AS (
+            SELECT id, claimed_by AS previous_owner, next_run_at AS due_at
+            FROM Advertisements
+            WHERE id = $1
+            AND is_active = TRUE
+            AND duration_minutes > 0
+            AND (
+                (claimed_by IS NULL
+                 AND next_run_at <= CURRENT_TIMESTAMP + INTERVAL '5 seconds')  -- soatlar farqi uchun zaxira
+                OR (claimed_by IS NOT NULL AND lease_expires_at < CURRENT_TIMESTAMP)
+            )
+            FOR UPDATE SKIP LOCKED
+        )
+        UPDATE Advertisements a
+        SET next_run_at = CASE
+                WHEN due.previous_owner IS NULL THEN advertisement_slot(
+                    a.id,
+                    a.duration_minutes,
+                    GREATEST(
+                        a.next_run_at + make_interval(mins => a.duration_minutes),
+                        CASE WHEN a.catch_up = 'backfill'
+                            THEN CURRENT_TIMESTAMP - make_interval(mins => a.duration_minutes * $4)
+                            ELSE CURRENT_TIMESTAMP
+                        END
+                    )::timestamp  -- advertisement_slot TIMESTAMP qabul qiladi, CURRENT_TIMESTAMP esa timestamptz
+                )
+                ELSE a.next_run_at
+            END,
+            claimed_by = $2,
+            lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3)
+        FROM due
+        WHERE a.id = due.id
+        RETURNING a.*, due.previous_owner, due.due_at;
+        """
+        return await self.execute(sql, ad_id, node_id, lease_seconds, backfill_limit, fetchrow=True)
+
+    async def renew_advertisement_leases(self, ad_ids: list, node_id: str, lease_seconds: int) -> list:
+        """Node'ning barcha lease'larini bitta so'rovda uzaytirish (heartbeat). Uzaytirilgan id'lar qaytadi"""
+        sql = """
+        UPDATE Advertisements
+        SET lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3)
+        WHERE id = ANY($1::INT[]) AND claimed_by = $2
+        RETURNING id;
+        """
+        return [row["id"] for row in await self.execute(sql, ad_ids, node_id, lease_seconds, fetch=True)]
+
+    async def get_advertisement_schedule(self, ad_id: int):
+        sql = "SELECT id, is_active, duration_minutes, next_run_at FROM Advertisements WHERE id = $1"
+        return await self.execute(sql, ad_id, fetchrow=True)
+
+    async def finish_advertisement_run(self, ad_id: int, node_id: str):
+        sql = """
+        UPDATE Advertisements
+        SET last_sent_at = CURRENT_TIMESTAMP, claimed_by = NULL, lease_expires_at = NULL
+        WHERE id = $1 AND claimed_by = $2;
+        """
+        await self.execute(sql, ad_id, node_id, execute=True)
+
+    async def expire_advertisement_lease(self, ad_id: int, node_id: str):
+        """
+        Yakunlanmagan navbatni bo'shatish: lease darhol tugaydi, next_run_at o'zgarmaydi.
+
+        Shu yoki boshqa node reklamani lease'i tugagan sifatida qayta oladi va
+        outbox'dagi qolgan qatorlarni o'sha navbat uchun davom ettiradi.
+        """
+        sql = """
+        UPDATE Advertisements
+        SET lease_expires_at = CURRENT_TIMESTAMP - INTERVAL '1 second'
+        WHERE id = $1 AND claimed_by = $2;
+        """
+        await self.execute(sql, ad_id, node_id, execute=True)
+
+    async def count_outbox_rows(self, ad_id: int, slot):
+        sql = "SELECT COUNT(*) FROM AdvertisementOutbox WHERE ad_id = $1 AND slot = $2"
+        return await self.execute(sql, ad_id, slot, fetchval=True)
+
+    async def create_outbox_rows(self, ad_id: int, slot, plan: dict):
+        """Reklama navbatini outbox qatorlariga yoyish: plan = {client_id: [group_id, ...]}"""
+        sql = """
+        INSERT INTO AdvertisementOutbox (ad_id, group_id, slot, client_id, idempotency_key)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT DO NOTHING;
+        """
+        rows = [
+            (ad_id, group_id, slot, client_id, f"{ad_id}:{group_id}:{slot.isoformat()}")
+            for client_id, group_ids in plan.items()
+            for group_id in group_ids
+        ]
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(sql, rows)
+
+    async def claim_outbox_rows(self, ad_id: int, slot, node_id: str):
+        """Navbati kelgan pending (va yiqilgan node qoldirgan sending) qatorlarni olish"""
+        sql = """
+        UPDATE AdvertisementOutbox
+        SET state = 'sending', attempts = attempts + 1, claimed_by = $3, updated_at = CURRENT_TIMESTAMP
+        WHERE ad_id = $1
+        AND slot = $2
+        AND next_attempt_at <= CURRENT_TIMESTAMP
+        AND (state = 'pending' OR (state = 'sending' AND claimed_by IS DISTINCT FROM $3))
+        RETURNING id, group_id, client_id, attempts, idempotency_key;
+        """
+        return await self.execute(sql, ad_id, slot, node_id, fetch=True)
+
+    async def release_outbox_rows(self, ad_id: int, slot, node_id: str):
+        """Shu node olgan, lekin yuborilgani tasdiqlanmagan qatorlarni pending holatiga qaytarish"""
+        sql = """
+        UPDATE AdvertisementOutbox
+        SET state = 'pending', claimed_by = NULL, next_attempt_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE ad_id = $1 AND slot = $2 AND claimed_by = $3 AND state = 'sending';
+        """
+        await self.execute(sql, ad_id, slot, node_id, execute=True)
+
+    async def reschedule_outbox_row(self, row_id: int, state: str, delay_seconds: float, error: str,
+                                    min_delay_seconds: float = 0):
+        """
+        Muvaffaqiyatsiz yuborish: `delay_seconds` dan keyin qayta urinish (pending) yoki butunlay failed.
+        Vaqt bazaning soati bo'yicha - claim_outbox_rows ham CURRENT_TIMESTAMP bilan solishtiradi.
+        `min_delay_seconds` - FloodWait cooldown'i tugaguncha olinmaydi.
+        """
+        sql = """
+        UPDATE AdvertisementOutbox
+        SET state = $2,
+            next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => GREATEST($3::FLOAT, $5::FLOAT)),
+            last_error = $4,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = $1;
+        """
+        await self.execute(sql, row_id, state, delay_seconds, error, min_delay_seconds, execute=True)
+
+    async def get_unsent_outbox_groups(self, ad_id: int, slot, client_id: int):
+        """Akkauntga biriktirilgan, hali yuborilmagan guruhlar"""
+        sql = """
+        SELECT group_id FROM AdvertisementOutbox
+        WHERE ad_id = $1 AND slot = $2 AND client_id = $3 AND state IN ('pending', 'sending');
+        """
+        rows = await self.execute(sql, ad_id, slot, client_id, fetch=True)
+        return [row["group_id"] for row in rows]
+
+    async def reassign_outbox_rows(self, ad_id: int, slot, client_id: int, plan: dict):
+        """Yuborilmagan qatorlarni boshqa akkauntlarga o'tkazish: plan = {yangi_client_id: [group_id, ...]}"""
+        sql = """
+        UPDATE AdvertisementOutbox
+        SET client_id = $4, state = 'pending', claimed_by = NULL,
+            next_attempt_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+        WHERE ad_id = $1 AND slot = $2 AND client_id = $3
+        AND group_id = ANY($5::BIGINT[])
+        AND state IN ('pending', 'sending');
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.executemany(sql, [
+                    (ad_id, slot, client_id, new_client_id, group_ids)
+                    for new_client_id, group_ids in plan.items()
+                ])
+
+    async def fail_outbox_rows(self, ad_id: int, slot, client_id: int, error: str):
+        """Akkauntga biriktirilgan yuborilmagan qatorlarni failed qilish (o'tkazadigan akkaunt yo'q)"""
+        sql = """
+        UPDATE AdvertisementOutbox
+        SET state = 'failed', last_error = $4, updated_at = CURRENT_TIMESTAMP
+        WHERE ad_id = $1 AND slot = $2 AND client_id = $3 AND state IN ('pending', 'sending');
+        """
+        await self.execute(sql, ad_id, slot, client_id, error, execute=True)
+
+    async def next_outbox_attempt_delay(self, ad_id: int, slot):
+        """Navbatdagi eng yaqin qayta urinishgacha soniyalar (pending qator qolmagan bo'lsa None)"""
+        sql = """
+        SELECT EXTRACT(EPOCH FROM MIN(next_attempt_at) - CURRENT_TIMESTAMP)::FLOAT FROM AdvertisementOutbox
+        WHERE ad_id = $1 AND slot = $2 AND state = 'pending';
+        """
+        return await self.execute(sql, ad_id, slot, fetchval=True)
+
+    async def prune_outbox(self, ad_id: int, slot):
+        """Oldingi navbatlarning outbox qatorlarini o'chirish"""
+        sql = "DELETE FROM AdvertisementOutbox WHERE ad_id = $1 AND slot < $2"
+        await self.execute(sql, ad_id, slot, execute=True)
+
     async def mark_advertisement_completed(self, ad_id: int):
         """Reklamani tugatilgan deb belgilash"""
         sql = """
@@ -188,7 +771,7 @@ class Database:
     async def get_client_for_advertisement(self, created_by: int):
         """Get client info for advertisement sending"""
         sql = """
-        SELECT c.api_id, c.api_hash, c.stringsession 
+        SELECT c.id, c.api_id, c.api_hash, c.stringsession, c.send_rate, c.send_burst 
         FROM Clients c
         JOIN Users u ON u.active_client_session = c.id
         WHERE u.telegram_id = $1 
@@ -197,6 +780,10 @@ class Database:
         """
         return await self.execute(sql, created_by, fetchrow=True)
 
+    async def get_client_by_id(self, client_id: int):
+        sql = "SELECT * FROM Clients WHERE id = $1"
+        return await self.execute(sql, client_id, fetchrow=True)
+
     async def get_active_client(self, telegram_id: int):
         """
         Retrieve the active client session for a user based on their telegram_id.
@@ -251,6 +838,180 @@ class Database:
                     "DELETE FROM Clients WHERE id = $1",
                     client_id
                 )
+    async def get_sending_clients(self):
+        """Reklama yuborishi mumkin bo'lgan (faol va banlanmagan) akkauntlar"""
+        sql = """
+        SELECT id, send_rate, send_burst FROM Clients
+        WHERE is_active = TRUE AND is_banned = FALSE;
+        """
+        return await self.execute(sql, fetch=True)
+
+    async def save_client_dialogs(self, client_id: int, groups: list):
+        """Akkaunt guruhlari katalogini yangilash: mavjudlari yangilanadi, chiqib ketilganlari o'chiriladi"""
+        sql = """
+        INSERT INTO ClientDialogs (client_id, group_id, title, peer_type, members, can_write, updated_at)
+        VALUES ($1, $2, $3, $4, $5, $6, CURRENT_TIMESTAMP)
+        ON CONFLICT (client_id, group_id) DO UPDATE
+        SET title = EXCLUDED.title,
+            peer_type = EXCLUDED.peer_type,
+            members = EXCLUDED.members,
+            can_write = EXCLUDED.can_write,
+            updated_at = EXCLUDED.updated_at;
+        """
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    "DELETE FROM ClientDialogs WHERE client_id = $1 AND NOT (group_id = ANY($2::BIGINT[]))",
+                    client_id, [group["id"] for group in groups]
+                )
+                await connection.executemany(sql, [
+                    (client_id, group["id"], group["title"], group.get("type"), group.get("members"),
+                     group.get("can_write", True))
+                    for group in groups
+                ])
+
+    async def get_client_dialogs(self, client_id: int):
+        """Akkaunt guruhlari katalogi (nomi bo'yicha)"""
+        sql = """
+        SELECT group_id AS id, title, peer_type AS type, members, can_write, updated_at
+        FROM ClientDialogs
+        WHERE client_id = $1
+        ORDER BY title;
+        """
+        return await self.execute(sql, client_id, fetch=True)
+
+    async def save_client_peers(self, client_id: int, peers: list):
+        """(peer_id, peer_type, entity_id, access_hash) qatorlarini yozish yoki yangilash"""
+        sql = """
+        INSERT INTO ClientPeers (client_id, peer_id, peer_type, entity_id, access_hash)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (client_id, peer_id) DO UPDATE
+        SET peer_type = EXCLUDED.peer_type,
+            entity_id = EXCLUDED.entity_id,
+            access_hash = EXCLUDED.access_hash,
+            updated_at = CURRENT_TIMESTAMP;
+        """
+        async with self.pool.acquire() as connection:
+            await connection.executemany(sql, [(client_id, *peer) for peer in peers])
+
+    async def get_client_peers(self, client_id: int, peer_ids: list):
+        sql = """
+        SELECT peer_id, peer_type, entity_id, access_hash FROM ClientPeers
+        WHERE client_id = $1 AND peer_id = ANY($2::BIGINT[]);
+        """
+        return await self.execute(sql, client_id, peer_ids, fetch=True)
+
+    async def delete_client_peer(self, client_id: int, peer_id: int):
+        sql = "DELETE FROM ClientPeers WHERE client_id = $1 AND peer_id = $2"
+        await self.execute(sql, client_id, peer_id, execute=True)
+
+    async def get_fresh_dialog_clients(self, ttl_minutes: int):
+        """Guruhlar ro'yxati `ttl_minutes` ichida yangilangan akkauntlar"""
+        sql = """
+        SELECT client_id FROM ClientDialogs
+        GROUP BY client_id
+        HAVING MAX(updated_at) > CURRENT_TIMESTAMP - make_interval(mins => $1);
+        """
+        rows = await self.execute(sql, ttl_minutes, fetch=True)
+        return [row["client_id"] for row in rows]
+
+    async def get_group_members(self, group_ids: list):
+        """Guruhga yoza oladigan faol akkauntlar (o'lik deb belgilangan juftliklarsiz)"""
+        sql = """
+        SELECT d.client_id, d.group_id FROM ClientDialogs d
+        JOIN Clients c ON c.id = d.client_id
+        WHERE d.group_id = ANY($1::BIGINT[])
+        AND d.can_write
+        AND c.is_active = TRUE
+        AND c.is_banned = FALSE
+        AND NOT EXISTS (
+            SELECT 1 FROM ClientGroupFailures f
+            WHERE f.client_id = d.client_id AND f.group_id = d.group_id AND f.is_dead
+        );
+        """
+        return await self.execute(sql, group_ids, fetch=True)
+
+    async def record_group_failure(self, client_id: int, group_id: int, error: str, threshold: int):
+        """
+        Doimiy xatolikni qayd qilish.
+
+        :return: (failures, is_dead) - xatoliklar soni `threshold` ga yetsa juftlik o'lik deb belgilanadi
+        """
+        sql = """
+        INSERT INTO ClientGroupFailures (client_id, group_id, failures, is_dead, last_error)
+        VALUES ($1, $2, 1, 1 >= $4, $3)
+        ON CONFLICT (client_id, group_id) DO UPDATE
+        SET failures = ClientGroupFailures.failures + 1,
+            is_dead = ClientGroupFailures.failures + 1 >= $4,
+            last_error = EXCLUDED.last_error,
+            updated_at = CURRENT_TIMESTAMP
+        RETURNING failures, is_dead;
+        """
+        row = await self.execute(sql, client_id, group_id, error, threshold, fetchrow=True)
+        return row["failures"], row["is_dead"]
+
+    async def clear_group_failures(self, client_id: int, group_id: int):
+        """Muvaffaqiyatli yuborishdan keyin xatoliklar hisobini nolga tushirish"""
+        sql = "DELETE FROM ClientGroupFailures WHERE client_id = $1 AND group_id = $2"
+        await self.execute(sql, client_id, group_id, execute=True)
+
+    async def remove_dead_group(self, ad_id: int, group_id: int) -> bool:
+        """
+        O'lik guruhni reklamaning guruhlar ro'yxatidan olib tashlash.
+
+        multi_account reklamada guruhga yoza oladigan boshqa akkaunt qolgan bo'lsa
+        guruh qoldiriladi - keyingi navbatda u o'sha akkauntga taqsimlanadi.
+        """
+        sql = """
+        UPDATE Advertisements a
+        SET group_ids = array_remove(a.group_ids, $2)
+        WHERE a.id = $1
+        AND $2 = ANY(a.group_ids)
+        AND (
+            a.multi_account IS NOT TRUE
+            OR NOT EXISTS (
+                SELECT 1 FROM ClientDialogs d
+                JOIN Clients c ON c.id = d.client_id
+                WHERE d.group_id = $2
+                AND c.is_active = TRUE
+                AND c.is_banned = FALSE
+                AND NOT EXISTS (
+                    SELECT 1 FROM ClientGroupFailures f
+                    WHERE f.client_id = d.client_id AND f.group_id = d.group_id AND f.is_dead
+                )
+            )
+        )
+        RETURNING a.id;
+        """
+        return await self.execute(sql, ad_id, group_id, fetchval=True) is not None
+
+    async def save_group_set(self, owner_id: int, name: str, group_ids: list):
+        """Guruh to'plamini saqlash (shu nomli to'plam bo'lsa almashtiriladi)"""
+        sql = """
+        INSERT INTO GroupSets (owner_id, name, group_ids) VALUES ($1, $2, $3)
+        ON CONFLICT (owner_id, name) DO UPDATE
+        SET group_ids = EXCLUDED.group_ids, created_at = CURRENT_TIMESTAMP
+        RETURNING id;
+        """
+        return await self.execute(sql, owner_id, name, group_ids, fetchval=True)
+
+    async def get_group_sets(self, owner_id: int):
+        sql = """
+        SELECT id, name, cardinality(group_ids) AS groups_count
+        FROM GroupSets
+        WHERE owner_id = $1
+        ORDER BY name;
+        """
+        return await self.execute(sql, owner_id, fetch=True)
+
+    async def get_group_set(self, set_id: int, owner_id: int):
+        sql = "SELECT id, name, group_ids FROM GroupSets WHERE id = $1 AND owner_id = $2"
+        return await self.execute(sql, set_id, owner_id, fetchrow=True)
+
+    async def delete_group_set(self, set_id: int, owner_id: int):
+        sql = "DELETE FROM GroupSets WHERE id = $1 AND owner_id = $2"
+        await self.execute(sql, set_id, owner_id, execute=True)
+
     async def get_all_clients(self):
         sql = "SELECT * FROM Clients"
         return await self.execute(sql, fetch=True)
@@ -0,0 +1,203 @@
+import time
+from array import array
+from collections import Counter
+
+from data.config import GROUP_SELECTION_TTL_MINUTES
+
+# Qidiruvda aniq moslik topilmasa, so'rov trigramlarining shuncha qismi uchragan nomlar ko'rsatiladi
+# (pg_trgm word_similarity kabi)
+SIMILARITY_THRESHOLD = 0.5
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class GroupCatalog:
+    """
+    Guruh tanlash uchun id bo'yicha indekslangan katalog.
+
+    Guruhlar nomi bo'yicha tartiblangan ro'yxatda turadi, `index` esa guruh
+    id'sini pozitsiyaga o'giradi - tanlov shu pozitsiyalar bo'yicha saqlanadi.
+    Qidiruv uchun trigram -> pozitsiyalar indeksi birinchi qidiruvda quriladi.
+    """
+
+    def __init__(self, groups: list):
+        self.ids = [group["id"] for group in groups]
+        self.titles = [group["title"] or "" for group in groups]
+        self.index = {group_id: position for position, group_id in enumerate(self.ids)}
+        self._search_titles = [title.casefold() for title in self.titles]
+        self._trigrams = None  # trigram -> array(pozitsiyalar)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: str) -> list:
+        """
+        Nomida `query` uchraydigan guruhlar pozitsiyalari (nomi bo'yicha).
+        Bunday guruh bo'lmasa - imlo xatosiga chidamli o'xshashlik bo'yicha (eng o'xshashi birinchi).
+        """
+        query = query.casefold()
+        grams = trigrams(query)
+        if not grams:
+            # 3 harfdan qisqa so'rov - indekssiz
+            return [position for position, title in enumerate(self._search_titles) if query in title]
+
+        index = self._index()
+        postings = sorted((index.get(gram, ()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        matches = sorted(position for position in candidates if query in self._search_titles[position])
+        return matches or self._similar(grams, postings)
+
+    def _similar(self, grams: set, postings: list) -> list:
+        shared = Counter()
+        for posting in postings:
+            shared.update(posting)
+        scored = []
+        for position, count in shared.items():
+            similarity = count / len(grams)
+            if similarity >= SIMILARITY_THRESHOLD:
+                scored.append((-similarity, position))
+        return [position for _, position in sorted(scored)]
+
+    def _index(self) -> dict:
+        if self._trigrams is None:
+            self._trigrams = {}
+            for position, title in enumerate(self._search_titles):
+                for gram in trigrams(title):
+                    self._trigrams.setdefault(gram, array("I")).append(position)
+        return self._trigrams
+
+
+class GroupSelection:
+    """
+    Bitta admin sessiyasidagi guruh tanlovi: katalog + tanlov bitmap'i (har guruhga 1 bayt).
+
+    Tanlash/bekor qilish O(1), sahifa esa joriy filtr (qidiruv) natijasidan
+    kesib olinadi - guruhlar soni oshsa ham bitta bosish narxi o'zgarmaydi.
+    """
+
+    def __init__(self, client_id: int, groups: list):
+        self.client_id = client_id
+        self.catalog = GroupCatalog(groups)
+        self.selected = bytearray(len(self.catalog))
+        self.count = 0
+        self.query = ""
+        self._matches = None  # qidiruv natijasi (pozitsiyalar); None - filtr yo'q
+        self.touched = time.monotonic()
+
+    @property
+    def total(self) -> int:
+        """Joriy filtrdagi guruhlar soni"""
+        return len(self.catalog) if self._matches is None else len(self._matches)
+
+    def set_query(self, query: str):
+        self.query = (query or "").strip()
+        self._matches = self.catalog.search(self.query) if self.query else None
+
+    def positions(self, start: int = 0, end: int = None) -> range:
+        end = self.total if end is None else min(end, self.total)
+        if self._matches is None:
+            return range(start, end)
+        return [self._matches[i] for i in range(start, end)]
+
+    def page(self, page: int, page_size: int) -> list:
+        """Sahifadagi guruhlar: [(id, title, tanlanganmi)]"""
+        catalog = self.catalog
+        return [
+            (catalog.ids[position], catalog.titles[position], bool(self.selected[position]))
+            for position in self.positions(page * page_size, (page + 1) * page_size)
+        ]
+
+    def is_selected(self, group_id: int) -> bool:
+        position = self.catalog.index.get(group_id)
+        return position is not None and bool(self.selected[position])
+
+    def toggle(self, group_id: int):
+        """Guruhni tanlash yoki bekor qilish. Yangi holatni qaytaradi (guruh katalogda bo'lmasa None)"""
+        position = self.catalog.index.get(group_id)
+        if position is None:
+            return None
+        self._set(position, not self.selected[position])
+        return bool(self.selected[position])
+
+    def select_page(self, page: int, page_size: int) -> bool:
+        """Sahifani to'liq tanlash, hammasi tanlangan bo'lsa - bekor qilish"""
+        return self._select_many(self.positions(page * page_size, (page + 1) * page_size))
+
+    def select_all(self) -> bool:
+        """Joriy filtrdagi barcha guruhlarni tanlash, hammasi tanlangan bo'lsa - bekor qilish"""
+        return self._select_many(self.positions())
+
+    def select_ids(self, group_ids: list) -> int:
+        """Berilgan guruhlarni tanlash (saqlangan to'plam). Katalogda topilganlari sonini qaytaradi"""
+        found = 0
+        for group_id in group_ids:
+            position = self.catalog.index.get(group_id)
+            if position is not None:
+                self._set(position, True)
+                found += 1
+        return found
+
+    def selected_ids(self) -> list:
+        ids = self.catalog.ids
+        return [ids[position] for position, flag in enumerate(self.selected) if flag]
+
+    def _select_many(self, positions) -> bool:
+        value = not all(self.selected[position] for position in positions)
+        for position in positions:
+            self._set(position, value)
+        return value
+
+    def _set(self, position: int, value: bool):
+        if bool(self.selected[position]) != value:
+            self.selected[position] = value
+            self.count += 1 if value else -1
+
+
+class GroupSelectionStore:
+    """
+    Guruh tanlovlari FSM kaliti (chat + foydalanuvchi) bo'yicha.
+
+    FSM ma'lumotida butun guruhlar ro'yxati saqlanmaydi - u har bir
+    `update_data` da qayta yoziladi. Tanlov shu yerda turadi va
+    `ttl_minutes` davomida ishlatilmasa o'chiriladi.
+    """
+
+    def __init__(self, ttl_minutes: int = GROUP_SELECTION_TTL_MINUTES):
+        self.ttl = ttl_minutes * 60
+        self._selections = {}
+
+    def open(self, key, client_id: int, groups: list) -> GroupSelection:
+        self._expire()
+        selection = self._selections[key] = GroupSelection(client_id, groups)
+        return selection
+
+    def get(self, key):
+        selection = self._selections.get(key)
+        if selection is not None:
+            selection.touched = time.monotonic()
+        return selection
+
+    def reload(self, key, groups: list):
+        """Katalog yangilanganda tanlov va qidiruvni yangi ro'yxatga ko'chirish"""
+        old = self._selections.get(key)
+        if old is None:
+            return None
+        selection = self.open(key, old.client_id, groups)
+        for group_id in old.selected_ids():
+            selection.toggle(group_id)
+        selection.set_query(old.query)
+        return selection
+
+    def close(self, key):
+        self._selections.pop(key, None)
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        for key in [key for key, selection in self._selections.items() if selection.touched < deadline]:
+            del self._selections[key]
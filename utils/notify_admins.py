@@ -15,3 +15,11 @@ async def on_startup_notify(bot: Bot):
             await bot.send_message(int(admin), "\n".join(message))
         except Exception as err:
             logging.exception(err)
+
+
+async def notify_admins(bot: Bot, text: str):
+    for admin in ADMINS:
+        try:
+            await bot.send_message(int(admin), text)
+        except Exception as err:
+            logging.exception(err)
@@ -0,0 +1,8 @@
+from .timers import TimerHeap, SystemClock, VirtualClock, LoopClock, VirtualTimeLoop  # noqa
+from .sharding import shard_groups  # noqa
+from .log_writer import AdvertisementLogWriter  # noqa
+from .phase import phase_offset, next_slot  # noqa
+from .metrics import SendConcurrencyMeter, WaitStats  # noqa
+from .limits import SendLimiter  # noqa
+from .catch_up import CATCH_UP_POLICIES, CATCH_UP_LABELS, CATCH_UP_SKIP, next_catch_up_policy  # noqa
+from .fair_queue import FairSendQueue, SEND_WEIGHTS, next_send_weight  # noqa
@@ -0,0 +1,17 @@
+CATCH_UP_ONCE = "once"
+CATCH_UP_SKIP = "skip"
+CATCH_UP_BACKFILL = "backfill"
+
+# Bot ishlamay turganda o'tib ketgan navbatlar bilan nima qilinadi
+CATCH_UP_POLICIES = (CATCH_UP_ONCE, CATCH_UP_SKIP, CATCH_UP_BACKFILL)
+CATCH_UP_LABELS = {
+    CATCH_UP_ONCE: "bir marta yuborish",
+    CATCH_UP_SKIP: "o'tkazib yuborish",
+    CATCH_UP_BACKFILL: "hammasini yetkazish",
+}
+
+
+def next_catch_up_policy(policy: str) -> str:
+    """Tugma bosilganda keyingi siyosat (aylanma)"""
+    index = CATCH_UP_POLICIES.index(policy) if policy in CATCH_UP_POLICIES else -1
+    return CATCH_UP_POLICIES[(index + 1) % len(CATCH_UP_POLICIES)]
@@ -0,0 +1,137 @@
+import asyncio
+from collections import deque, Counter
+
+# Reklama ulushi (Advertisements.send_weight): tugma bosilganda aylanma tanlanadi
+SEND_WEIGHTS = (1.0, 2.0, 4.0, 0.5)
+
+
+def next_send_weight(weight: float) -> float:
+    """Tugma bosilganda keyingi ulush (aylanma)"""
+    index = SEND_WEIGHTS.index(weight) if weight in SEND_WEIGHTS else -1
+    return SEND_WEIGHTS[(index + 1) % len(SEND_WEIGHTS)]
+
+
+class _Flow:
+    __slots__ = ("ad_id", "owner", "weight", "items", "deficit", "in_turn")
+
+    def __init__(self, ad_id: int, owner: int, weight: float):
+        self.ad_id = ad_id
+        self.owner = owner
+        self.weight = weight
+        self.items = deque()
+        self.deficit = 0.0
+        self.in_turn = False
+
+
+class _AccountQueue:
+    """
+    Bitta akkaunt uchun deficit round robin.
+
+    Har bir reklama - alohida oqim. Oqimning navbatdagi ulushi (quantum) uning
+    og'irligi / shu admin'ning faol reklamalari soni, ya'ni avval adminlar o'rtasida,
+    keyin admin reklamalari o'rtasida teng bo'linadi.
+    """
+
+    def __init__(self):
+        self.flows = {}
+        self.active = deque()
+        self.owner_flows = Counter()
+        self.dispatcher = None
+        # Bekor qilinmagan va hali berilmagan yuborishlar soni (has_pending navbatni aylanib chiqmasin)
+        self.pending = 0
+
+    def push(self, ad_id: int, owner: int, weight: float, future: asyncio.Future):
+        flow = self.flows.get(ad_id)
+        if flow is None:
+            flow = self.flows[ad_id] = _Flow(ad_id, owner, weight)
+            self.active.append(ad_id)
+            self.owner_flows[owner] += 1
+        flow.weight = weight
+        flow.items.append(future)
+        self.pending += 1
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future: asyncio.Future):
+        # Kutish bekor qilindi - qatorning o'zi pop() da tashlab ketiladi
+        if future.cancelled():
+            self.pending -= 1
+
+    def has_pending(self) -> bool:
+        return self.pending > 0
+
+    def pop(self):
+        """Navbatdagi kutayotgan yuborish (future) yoki None"""
+        while self.active:
+            flow = self.flows[self.active[0]]
+            while flow.items and flow.items[0].cancelled():
+                flow.items.popleft()
+            if not flow.items:
+                self._remove(flow)
+                continue
+            if not flow.in_turn:
+                flow.deficit += flow.weight / self.owner_flows[flow.owner]
+                flow.in_turn = True
+            if flow.deficit >= 1:
+                flow.deficit -= 1
+                self.pending -= 1
+                return flow.items.popleft()
+            flow.in_turn = False
+            self.active.rotate(-1)
+        return None
+
+    def _remove(self, flow: _Flow):
+        self.active.popleft()
+        del self.flows[flow.ad_id]
+        self.owner_flows[flow.owner] -= 1
+        if not self.owner_flows[flow.owner]:
+            del self.owner_flows[flow.owner]
+
+
+class FairSendQueue:
+    """
+    Guruhga yuborishlar uchun akkaunt bo'yicha adolatli navbat.
+
+    Har bir yuborish `turn()` da kutadi; akkaunt token-bucket'i ruxsat berganda
+    navbat deficit round robin bo'yicha keyingi reklamaga beriladi. Shuning uchun
+    1000 guruhli reklama bir akkauntni egallab olmaydi - kichik reklamalar ham
+    har aylanishda o'z ulushini oladi, katta reklama esa to'xtamasdan davom etadi.
+    """
+
+    def __init__(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+        self._accounts = {}
+
+    async def turn(self, client_id: int, ad_id: int, owner: int, weight: float = 1.0):
+        """Navbat kelguncha kutish; qaytganda akkaunt tezlik limitidan ruxsat olingan bo'ladi"""
+        queue = self._accounts.get(client_id)
+        if queue is None:
+            queue = self._accounts[client_id] = _AccountQueue()
+        future = asyncio.get_running_loop().create_future()
+        queue.push(ad_id, owner, max(weight, 0.01), future)
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.create_task(self._dispatch(client_id, queue))
+        await future
+
+    async def _dispatch(self, client_id: int, queue: _AccountQueue):
+        # Token faqat kutayotgan yuborish bo'lsa olinadi
+        while queue.has_pending():
+            await self.rate_limiter.acquire(client_id)
+            future = queue.pop()
+            if future is not None:
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        """Akkauntlar bo'yicha navbatda turgan yuborishlar: {client_id: {ad_id: soni}}"""
+        return {
+            client_id: {ad_id: len(flow.items) for ad_id, flow in queue.flows.items() if flow.items}
+            for client_id, queue in self._accounts.items()
+            if queue.flows
+        }
+
+    async def close(self):
+        """Ishlayotgan dispatcher'larni to'xtatish (scheduler to'xtaganda)"""
+        tasks = [queue.dispatcher for queue in self._accounts.values() if queue.dispatcher]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._accounts.clear()
@@ -0,0 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from utils.scheduler.metrics import WaitStats
+
+
+class SendLimiter:
+    """
+    Bir vaqtda davom etayotgan yuborishlar chegarasi: umumiy va har bir akkaunt uchun.
+
+    Token-bucket yuborishlar tezligini cheklaydi, bu esa sekin javob berayotgan
+    Telegram so'rovlari to'planib, xotira va ulanishlarni band qilib qo'yishidan saqlaydi.
+    """
+
+    def __init__(self, clock, global_limit: int, account_limit: int):
+        self.clock = clock
+        self.account_limit = account_limit
+        self._global = asyncio.Semaphore(global_limit)
+        self._accounts = {}
+        self.global_limit = global_limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.waits = WaitStats()
+
+    @asynccontextmanager
+    async def slot(self, client_id: int):
+        started = self.clock.now()
+        account = self._accounts.get(client_id)
+        if account is None:
+            account = self._accounts[client_id] = asyncio.Semaphore(self.account_limit)
+        self.waiting += 1
+        try:
+            await account.acquire()
+            try:
+                await self._global.acquire()
+            except BaseException:
+                account.release()
+                raise
+        finally:
+            self.waiting -= 1
+        self.waits.record(self.clock.now() - started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._global.release()
+            account.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "limit": self.global_limit,
+            "waiting": self.waiting,
+            "wait": self.waits.snapshot(),
+        }
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from data.config import LOG_BATCH_SIZE, LOG_FLUSH_MS
+
+logger = logging.getLogger(__name__)
+
+
+class AdvertisementLogWriter:
+    """
+    AdvertisementLogs (va AdvertisementOutbox holati) uchun write-behind bufer.
+
+    Yuborilgan har bir reklama xotirada yig'iladi va LOG_BATCH_SIZE ta yozuv
+    to'planganda yoki har LOG_FLUSH_MS millisekundda bitta so'rov bilan
+    bazaga yoziladi. `stop()` qolgan yozuvlarni albatta yozib tugatadi.
+    """
+
+    def __init__(self, db, batch_size: int = LOG_BATCH_SIZE, flush_ms: int = LOG_FLUSH_MS):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._buffer = []
+        self._flush_event = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self.flushes = 0
+
+    def add(self, ad_id: int, group_id: int, sent_at: datetime = None, outbox_id: int = None):
+        """Yuborishni qayd qilish; `outbox_id` berilsa flush'da outbox qatori ham `done` bo'ladi"""
+        self._buffer.append((ad_id, group_id, sent_at or datetime.now(), outbox_id))
+        if len(self._buffer) >= self.batch_size:
+            self._flush_event.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        """Buferdagi yozuvlarni bitta batch bilan bazaga yozish"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+            try:
+                await self.db.insert_advertisement_logs(records)
+                self.flushes += 1
+            except Exception as e:
+                # Yozuvlarni yo'qotmaymiz - keyingi flush'da qayta urinamiz
+                self._buffer = records + self._buffer
+                logger.error(f"Reklama loglarini yozishda xatolik: yozuvlar={len(records)}, xato={str(e)}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
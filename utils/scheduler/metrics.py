@@ -0,0 +1,90 @@
+from collections import deque
+from contextlib import contextmanager
+
+
+class SendConcurrencyMeter:
+    """
+    Soniya bo'yicha yuborishlar statistikasi: har soniyada boshlangan yuborishlar
+    soni va bir vaqtda davom etayotgan yuborishlarning eng ko'pi.
+
+    Oxirgi `window_seconds` soniya saqlanadi. Yuklama tekis bo'lsa peak va
+    o'rtacha qiymat bir-biriga yaqin, "to'lqin"li bo'lsa peak ancha katta bo'ladi.
+    """
+
+    def __init__(self, clock, window_seconds: int = 600):
+        self.clock = clock
+        self.window_seconds = window_seconds
+        self.in_flight = 0
+        self.total = 0
+        self._seconds = deque()  # [second, started, peak_in_flight]
+
+    def started(self):
+        bucket = self._bucket()
+        self.in_flight += 1
+        self.total += 1
+        bucket[1] += 1
+        bucket[2] = max(bucket[2], self.in_flight)
+
+    def finished(self):
+        self.in_flight = max(self.in_flight - 1, 0)
+        self._bucket()
+
+    @contextmanager
+    def track(self):
+        """Bitta yuborishni o'lchash: `with meter.track(): await send(...)`"""
+        self.started()
+        try:
+            yield
+        finally:
+            self.finished()
+
+    def _bucket(self) -> list:
+        second = int(self.clock.now())
+        if not self._seconds or self._seconds[-1][0] != second:
+            self._seconds.append([second, 0, self.in_flight])
+            while self._seconds[0][0] <= second - self.window_seconds:
+                self._seconds.popleft()
+        return self._seconds[-1]
+
+    def snapshot(self) -> dict:
+        """Oyna bo'yicha soniyalik yuborishlar: peak, o'rtacha, p99 va bo'sh soniyalar ulushi"""
+        if not self._seconds:
+            return {"seconds": 0, "peak_per_s": 0, "mean_per_s": 0.0, "p99_per_s": 0,
+                    "idle_share": 1.0, "peak_in_flight": 0}
+        first, last = self._seconds[0][0], int(self.clock.now())
+        span = max(last - first + 1, 1)
+        counts = sorted(bucket[1] for bucket in self._seconds)
+        # Yozuvi yo'q soniyalar ham bo'sh (0 ta yuborish) hisoblanadi
+        idle = span - sum(1 for count in counts if count)
+        counts = [0] * (span - len(counts)) + counts
+        return {
+            "seconds": span,
+            "peak_per_s": counts[-1],
+            "mean_per_s": round(sum(counts) / span, 3),
+            "p99_per_s": counts[min(int(span * 0.99), span - 1)],
+            "idle_share": round(idle / span, 3),
+            "peak_in_flight": max(bucket[2] for bucket in self._seconds),
+        }
+
+
+class WaitStats:
+    """Oxirgi `maxlen` ta kutish vaqti bo'yicha p50/p99/max (navbat va semaforlar uchun)"""
+
+    def __init__(self, maxlen: int = 1000):
+        self._waits = deque(maxlen=maxlen)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self._waits.append(max(seconds, 0.0))
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits)
+        if not waits:
+            return {"count": self.count, "p50_s": 0.0, "p99_s": 0.0, "max_s": 0.0}
+        return {
+            "count": self.count,
+            "p50_s": round(waits[len(waits) // 2], 3),
+            "p99_s": round(waits[min(int(len(waits) * 0.99), len(waits) - 1)], 3),
+            "max_s": round(waits[-1], 3),
+        }
@@ -0,0 +1,24 @@
+import math
+from datetime import datetime, timedelta
+
+# Oltin kesim: ketma-ket id'lar interval bo'ylab eng tekis taqsimlanadi
+GOLDEN_RATIO_FRACTION = 0.6180339887498949
+EPOCH = datetime(1970, 1, 1)
+
+
+def phase_offset(ad_id: int, period_seconds: int) -> int:
+    """
+    Reklamaning interval ichidagi doimiy siljishi (butun soniya).
+
+    Bazadagi advertisement_slot() funksiyasi bilan bir xil hisoblanadi.
+    """
+    x = ad_id * GOLDEN_RATIO_FRACTION
+    return math.floor((x - math.floor(x)) * period_seconds)
+
+
+def next_slot(ad_id: int, duration_minutes: int, after: datetime) -> datetime:
+    """`after` dan keyingi (yoki unga teng) birinchi navbat: k * interval + siljish"""
+    period = duration_minutes * 60
+    phase = phase_offset(ad_id, period)
+    elapsed = (after - EPOCH).total_seconds()
+    return EPOCH + timedelta(seconds=math.ceil((elapsed - phase) / period) * period + phase)
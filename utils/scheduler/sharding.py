@@ -0,0 +1,37 @@
+def shard_groups(group_ids: list, members: dict, budgets: dict, fallback: int = None):
+    """
+    Reklama guruhlarini bir nechta akkaunt o'rtasida taqsimlash.
+
+    :param group_ids: Reklama guruhlari
+    :param members: {group_id: {client_id, ...}} - qaysi akkaunt qaysi guruhda a'zo
+    :param budgets: {client_id: (rate, delay)} - akkauntning hozirgi tezligi (soniyasiga)
+                    va birinchi yuborishgacha kutish vaqti
+    :param fallback: A'zolar noma'lum guruhlar uchun akkaunt (reklama egasi)
+    :return: ({client_id: [group_id, ...]}, [taqsimlanmagan group_id, ...])
+
+    Har bir guruh o'zini yuborishni eng erta tugatadigan akkauntga beriladi,
+    shuning uchun tezroq akkauntlar ko'proq guruh oladi. Kamroq akkaunt a'zo
+    bo'lgan guruhlar birinchi taqsimlanadi.
+    """
+    plan = {client_id: [] for client_id in budgets}
+    unassigned = []
+
+    def finish_time(client_id):
+        rate, delay = budgets[client_id]
+        if rate <= 0:
+            return float("inf")
+        return delay + (len(plan[client_id]) + 1) / rate
+
+    ordered = sorted(group_ids, key=lambda group_id: len(members.get(group_id, ())))
+    for group_id in ordered:
+        candidates = [client_id for client_id in members.get(group_id, ()) if client_id in budgets]
+        if not candidates:
+            if fallback in budgets:
+                candidates = [fallback]
+            else:
+                unassigned.append(group_id)
+                continue
+        best = min(candidates, key=finish_time)
+        plan[best].append(group_id)
+
+    return {client_id: groups for client_id, groups in plan.items() if groups}, unassigned
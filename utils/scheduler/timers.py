@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class SystemClock:
+    """Haqiqiy vaqt manbai (epoch soniyalarda)"""
+
+    def now(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(max(seconds, 0))
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Event yoki timeout - qaysi biri oldin bo'lsa. Event bo'lsa True qaytaradi"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout=max(timeout, 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class VirtualClock:
+    """Test va benchmark uchun virtual soat: kutish vaqtni darhol oldinga suradi"""
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float):
+        self._now += max(seconds, 0)
+
+    async def sleep(self, seconds: float):
+        self.advance(seconds)
+        await asyncio.sleep(0)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        # Boshqa tasklarga navbat beramiz, keyin event bo'lmasa vaqtni surib yuboramiz
+        await asyncio.sleep(0)
+        if event.is_set():
+            return True
+        self.advance(timeout)
+        return event.is_set()
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Virtual vaqtli event loop: bajariladigan ish qolmaganda vaqt darhol eng
+    yaqin taymergacha suriladi. asyncio.sleep/wait_for va boshqalar haqiqiy
+    kutishsiz, lekin to'g'ri tartibda ishlaydi (benchmark uchun).
+    """
+
+    def __init__(self, start: float = 0.0):
+        super().__init__()
+        self._virtual_now = start
+
+    def time(self) -> float:
+        return self._virtual_now
+
+    def _run_once(self):
+        # Bekor qilingan taymerlar vaqtni oldinga surmasligi kerak
+        while self._scheduled and self._scheduled[0]._cancelled:
+            self._timer_cancelled_count -= 1
+            handle = heapq.heappop(self._scheduled)
+            handle._scheduled = False
+        if not self._ready and self._scheduled:
+            self._virtual_now = max(self._virtual_now, self._scheduled[0]._when)
+        super()._run_once()
+
+
+class LoopClock(SystemClock):
+    """Event loop vaqtiga bog'langan soat (VirtualTimeLoop bilan virtual epoch beradi)"""
+
+    def __init__(self, epoch: float = None):
+        self.epoch = time.time() if epoch is None else epoch
+
+    def now(self) -> float:
+        return self.epoch + asyncio.get_running_loop().time()
+
+
+class TimerHeap:
+    """
+    Reklamalar uchun min-heap taymer: har bir kalit (reklama) uchun bitta yozuv.
+
+    schedule/reschedule - O(log n), cancel - O(1) (yozuv belgilanadi va heap
+    tepasiga chiqqanda tashlab yuboriladi), next_fire_time - amortizatsiyalangan O(1).
+    """
+
+    _REMOVED = object()
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, when: float, payload=None):
+        """Kalitni `when` vaqtiga rejalashtirish (mavjud bo'lsa qayta rejalashtiriladi)"""
+        if key in self._entries:
+            self.cancel(key)
+        entry = [when, next(self._counter), key, payload]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        self._compact()
+
+    reschedule = schedule
+
+    def cancel(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[2] = self._REMOVED
+        entry[3] = None
+        return True
+
+    def when(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def payload(self, key):
+        entry = self._entries.get(key)
+        return entry[3] if entry else None
+
+    def update_payload(self, key, payload):
+        """Vaqtini o'zgartirmasdan yozuv ma'lumotini yangilash"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[3] = payload
+
+    def keys(self):
+        return list(self._entries)
+
+    def next_fire_time(self):
+        """Eng yaqin ishga tushish vaqti yoki None"""
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, limit: int = None) -> list:
+        """Vaqti kelgan yozuvlarni (key, when, payload) ko'rinishida olib tashlash (ko'pi bilan `limit` ta)"""
+        due = []
+        while limit is None or len(due) < limit:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            when, _, key, payload = heapq.heappop(self._heap)
+            del self._entries[key]
+            due.append((key, when, payload))
+        return due
+
+    def due_count(self, now: float) -> int:
+        """Vaqti kelgan, lekin hali olinmagan yozuvlar soni (O(n), metrikalar uchun)"""
+        return sum(1 for entry in self._heap if entry[0] <= now and entry[2] is not self._REMOVED)
+
+    def _prune(self):
+        while self._heap and self._heap[0][2] is self._REMOVED:
+            heapq.heappop(self._heap)
+
+    def _compact(self):
+        # Bekor qilingan yozuvlar ko'payib ketsa heapni qayta quramiz
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if entry[2] is not self._REMOVED]
+            heapq.heapify(self._heap)
@@ -10,3 +10,22 @@ def safe_markdown(_string):
         else:
             text += letter
     return text
+
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def split_lines(lines, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Qatorlarni Telegram xabari sig'adigan bo'laklarga yig'ish (qator bo'linmaydi)"""
+    chunks = []
+    current = ""
+    for line in lines:
+        line = line[:limit]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
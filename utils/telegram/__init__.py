@@ -0,0 +1,8 @@
+from .client_pool import ClientPool, ClientUnavailableError, ClientUnauthorizedError  # noqa
+from .media_cache import MediaCache  # noqa
+from .peers import PeerCache, dialog_peers  # noqa
+from .dialogs import DialogCatalog  # noqa
+from .batching import RequestBatcher  # noqa
+from .health import AccountCircuitBreaker, SessionHealthChecker  # noqa
+from .rate_limiter import TokenBucket, AccountRateLimiter  # noqa
+from .fake_client import FakeTelegramClient  # noqa
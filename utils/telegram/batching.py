@@ -0,0 +1,101 @@
+import asyncio
+import logging
+
+from telethon import errors, utils
+
+from data.config import SEND_BATCH_SIZE, SEND_BATCH_LINGER_MS
+
+logger = logging.getLogger(__name__)
+
+
+class RequestBatcher:
+    """
+    Bitta akkauntning yuborish so'rovlarini MTProto konteynerga yig'ish.
+
+    Token-bucket'dan ruxsat olgan so'rovlar `linger_ms` davomida yig'iladi va
+    ko'pi bilan `batch_size` tasi (har biri boshqa guruhga) `client([...])` bilan
+    bitta round trip'da yuboriladi. Har bir so'rov natijasi yoki xatoligi
+    (MultiError ichidan) o'z chaqiruvchisiga alohida qaytariladi.
+    `batch_size` 1 bo'lsa so'rovlar odatdagidek birma-bir yuboriladi.
+    """
+
+    def __init__(self, batch_size: int = SEND_BATCH_SIZE, linger_ms: int = SEND_BATCH_LINGER_MS):
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self._pending = {}  # client_id -> [(peer_id, request, future)]
+        self._tasks = set()
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def call(self, client_id: int, client, request):
+        if self.batch_size <= 1:
+            return await client(request)
+
+        peer_id = utils.get_peer_id(request.peer)
+        batch = self._pending.get(client_id)
+        if batch and any(pending_peer == peer_id for pending_peer, _, _ in batch):
+            # Bir konteynerda bitta guruhga ikki xabar yubormaymiz
+            self._send(client_id, client)
+            batch = None
+        if batch is None:
+            batch = self._pending[client_id] = []
+            self._spawn(self._send_later(client_id, client, batch))
+
+        future = asyncio.get_running_loop().create_future()
+        batch.append((peer_id, request, future))
+        if len(batch) >= self.batch_size:
+            self._send(client_id, client)
+        return await future
+
+    async def close(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for batch in self._pending.values():
+            for _, _, future in batch:
+                future.cancel()
+        self._pending.clear()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_later(self, client_id: int, client, batch: list):
+        await asyncio.sleep(self.linger)
+        if self._pending.get(client_id) is batch:
+            self._send(client_id, client)
+
+    def _send(self, client_id: int, client):
+        batch = self._pending.pop(client_id, None)
+        if batch:
+            self._spawn(self._invoke(client, batch))
+
+    async def _invoke(self, client, batch: list):
+        requests = [request for _, request, _ in batch]
+        futures = [future for _, _, future in batch]
+        self.batches += 1
+        self.batched_requests += len(requests)
+        try:
+            if len(requests) == 1:
+                results, exceptions = [await client(requests[0])], [None]
+            else:
+                results, exceptions = await client(requests, ordered=False), [None] * len(requests)
+        except errors.MultiError as e:
+            results, exceptions = e.results, e.exceptions
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            # Konteyner umuman yuborilmadi (ulanish uzildi va h.k.) - hammasiga bir xil xato
+            results, exceptions = [None] * len(requests), [e] * len(requests)
+
+        for future, result, exception in zip(futures, results, exceptions):
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from telethon import TelegramClient
+from telethon.sessions import StringSession
+
+from data.config import CLIENT_IDLE_SECONDS, CLIENT_POOL_MAX_CONNECTIONS
+from utils.scheduler.metrics import WaitStats
+
+logger = logging.getLogger(__name__)
+
+
+class ClientUnavailableError(Exception):
+    """Klient topilmadi, o'chirilgan, banlangan yoki avtorizatsiyadan o'tmagan"""
+
+
+class ClientUnauthorizedError(ClientUnavailableError):
+    """Sessiya bekor qilingan - akkauntga qayta login qilish kerak"""
+
+
+class _PooledClient:
+    def __init__(self, client: TelegramClient):
+        self.client = client
+        self.leases = 0
+        self.last_used = time.monotonic()
+
+
+class ClientPool:
+    """
+    Clients.id bo'yicha bittadan doimiy ulangan Telethon klientlari.
+
+    Har bir yuborishda yangi MTProto ulanish ochish o'rniga scheduler va
+    handlerlar `lease()` orqali tayyor klientni oladi. Uzilgan klient keyingi
+    lease'da qayta ulanadi, uzoq ishlatilmagani esa yopiladi.
+
+    Ochiq ulanishlar soni `max_connections` bilan cheklanadi: limitga yetganda
+    eng uzoq ishlatilmagan bo'sh klient yopiladi, bo'sh klient bo'lmasa yangi
+    ulanish biror lease bo'shaguncha kutadi.
+    """
+
+    def __init__(self, db, idle_seconds: int = CLIENT_IDLE_SECONDS, client_factory=None,
+                 max_connections: int = CLIENT_POOL_MAX_CONNECTIONS):
+        self.db = db
+        self.idle_seconds = idle_seconds
+        # Clients qatoridan klient yaratuvchi (benchmarkda soxta klient beriladi)
+        self.client_factory = client_factory or self._create_client
+        self._clients = {}
+        self._locks = {}
+        self._evict_task = None
+        self.max_connections = max_connections
+        self._connecting = 0
+        self._capacity_freed = asyncio.Event()
+        self.waiting = 0
+        self.peak_connections = 0
+        self.connect_waits = WaitStats()
+
+    async def start(self):
+        if self._evict_task is None:
+            self._evict_task = asyncio.create_task(self._evict_idle_loop())
+
+    async def stop(self):
+        if self._evict_task:
+            self._evict_task.cancel()
+            try:
+                await self._evict_task
+            except asyncio.CancelledError:
+                pass
+            self._evict_task = None
+        for client_id in list(self._clients):
+            await self.close(client_id)
+
+    @asynccontextmanager
+    async def lease(self, client_id: int):
+        """Ulangan va avtorizatsiyadan o'tgan klientni vaqtincha olish"""
+        entry = await self._acquire(client_id)
+        entry.leases += 1
+        try:
+            yield entry.client
+        except (ConnectionError, OSError):
+            # Ulanish buzilgan - keyingi lease'da qaytadan ulanadi
+            await self.close(client_id)
+            raise
+        finally:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+            if entry.leases == 0:
+                self._capacity_freed.set()
+
+    async def close(self, client_id: int):
+        """Klientni puldan chiqarib, ulanishni yopish"""
+        entry = self._clients.pop(client_id, None)
+        if entry is None:
+            return
+        self._capacity_freed.set()
+        try:
+            await entry.client.disconnect()
+        except Exception as e:
+            logger.warning(f"Klientni yopishda xatolik: client={client_id}, xato={str(e)}")
+        logger.info(f"Klient puldan chiqarildi: client={client_id}")
+
+    def is_connected(self, client_id: int) -> bool:
+        entry = self._clients.get(client_id)
+        return bool(entry and entry.client.is_connected())
+
+    def stats(self) -> dict:
+        return {
+            "connected": len(self._clients),
+            "max": self.max_connections,
+            "peak": self.peak_connections,
+            "waiting": self.waiting,
+            "wait": self.connect_waits.snapshot(),
+        }
+
+    async def _acquire(self, client_id: int) -> _PooledClient:
+        lock = self._locks.setdefault(client_id, asyncio.Lock())
+        async with lock:
+            entry = self._clients.get(client_id)
+            if entry is not None:
+                if entry.client.is_connected():
+                    return entry
+                try:
+                    await entry.client.connect()
+                    return entry
+                except Exception as e:
+                    logger.warning(f"Klientga qayta ulanib bo'lmadi: client={client_id}, xato={str(e)}")
+                    await self.close(client_id)
+
+            row = await self.db.get_client_by_id(client_id)
+            if not row or not row["is_active"] or row["is_banned"]:
+                raise ClientUnavailableError(f"Klient faol emas: {client_id}")
+
+            await self._reserve_connection()
+            try:
+                client = self.client_factory(row)
+                await client.connect()
+                if not await client.is_user_authorized():
+                    await client.disconnect()
+                    raise ClientUnauthorizedError(f"Klient avtorizatsiyadan o'tmagan: {client_id}")
+
+                entry = _PooledClient(client)
+                self._clients[client_id] = entry
+                self.peak_connections = max(self.peak_connections, len(self._clients))
+            finally:
+                self._connecting -= 1
+                self._capacity_freed.set()
+            logger.info(f"Klient pulga ulandi: client={client_id}")
+            return entry
+
+    async def _reserve_connection(self):
+        """Yangi ulanish uchun joy band qilish (kerak bo'lsa bo'sh klientni yopib yoki kutib)"""
+        started = time.monotonic()
+        while len(self._clients) + self._connecting >= self.max_connections:
+            idle = [(entry.last_used, client_id) for client_id, entry in self._clients.items() if entry.leases == 0]
+            if idle:
+                await self.close(min(idle)[1])
+                continue
+            self._capacity_freed.clear()
+            self.waiting += 1
+            try:
+                await self._capacity_freed.wait()
+            finally:
+                self.waiting -= 1
+        self._connecting += 1
+        self.connect_waits.record(time.monotonic() - started)
+
+    @staticmethod
+    def _create_client(row) -> TelegramClient:
+        # FloodWait'ni Telethon o'zi uxlab o'tkazmasin - scheduler akkauntni to'xtatadi va tezligini kamaytiradi
+        return TelegramClient(StringSession(row["stringsession"]), int(row["api_id"]), row["api_hash"],
+                              flood_sleep_threshold=0)
+
+    async def _evict_idle_loop(self):
+        while True:
+            await asyncio.sleep(max(self.idle_seconds // 4, 1))
+            now = time.monotonic()
+            for client_id, entry in list(self._clients.items()):
+                if entry.leases == 0 and now - entry.last_used >= self.idle_seconds:
+                    await self.close(client_id)
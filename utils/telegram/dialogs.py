@@ -0,0 +1,103 @@
+import asyncio
+import logging
+
+from data.config import MEMBERSHIP_TTL_MINUTES
+from utils.scheduler.timers import SystemClock
+from utils.telegram.peers import dialog_peers
+
+logger = logging.getLogger(__name__)
+
+
+def catalog_row(dialog):
+    """Dialogdan katalog qatori: id, title, type, members, can_write (guruh/kanal bo'lmasa None)"""
+    if not (dialog.is_group or dialog.is_channel):
+        return None
+    entity = dialog.entity
+    if getattr(entity, "broadcast", False):
+        peer_type = "channel"
+    elif getattr(entity, "megagroup", False):
+        peer_type = "supergroup"
+    else:
+        peer_type = "group"
+    return {
+        "id": dialog.id,
+        "title": dialog.title or "",
+        "type": peer_type,
+        "members": getattr(entity, "participants_count", None),
+        "can_write": can_write(entity),
+    }
+
+
+def can_write(entity) -> bool:
+    """Akkaunt guruhga xabar yoza oladimi (kanalda - faqat admin, guruhda - cheklanmagan bo'lsa)"""
+    if getattr(entity, "creator", False) or getattr(entity, "admin_rights", None):
+        return True
+    if getattr(entity, "broadcast", False):
+        return False
+    for rights in (getattr(entity, "banned_rights", None), getattr(entity, "default_banned_rights", None)):
+        if rights is not None and getattr(rights, "send_messages", False):
+            return False
+    return True
+
+
+class DialogCatalog:
+    """
+    Akkaunt guruhlari katalogi (ClientDialogs).
+
+    Guruh tanlash har safar `get_dialogs()` chaqirmasdan bazadan beriladi.
+    Katalog `iter_dialogs` bilan yangilanadi: bo'sh bo'lsa darhol, `ttl_minutes`
+    dan eskirgan bo'lsa fonda, "yangilash" tugmasi bosilganda esa majburan.
+    """
+
+    def __init__(self, db, pool, ttl_minutes: int = MEMBERSHIP_TTL_MINUTES, peer_cache=None, clock=None):
+        self.db = db
+        self.pool = pool
+        self.ttl_minutes = ttl_minutes
+        self.peer_cache = peer_cache
+        self.clock = clock or SystemClock()
+        self._locks = {}
+        self._background = {}  # client_id -> fonda yangilash task'i
+
+    async def get_groups(self, client_id: int, writable_only: bool = True) -> list:
+        """Katalogdagi guruhlar (nomi bo'yicha); eskirgan bo'lsa fonda yangilanadi"""
+        rows = await self.db.get_client_dialogs(client_id)
+        if not rows:
+            await self.refresh(client_id)
+            rows = await self.db.get_client_dialogs(client_id)
+        elif max(row["updated_at"] for row in rows).timestamp() < self.clock.now() - self.ttl_minutes * 60:
+            self.refresh_later(client_id)
+        return [dict(row) for row in rows if row["can_write"] or not writable_only]
+
+    async def refresh(self, client_id: int) -> int:
+        """Katalogni Telegram'dan qayta o'qish. Guruhlar sonini qaytaradi"""
+        lock = self._locks.setdefault(client_id, asyncio.Lock())
+        async with lock:
+            async with self.pool.lease(client_id) as client:
+                dialogs = [dialog async for dialog in client.iter_dialogs(ignore_migrated=True)]
+            rows = [row for row in map(catalog_row, dialogs) if row]
+            await self.db.save_client_dialogs(client_id, rows)
+            if self.peer_cache is not None:
+                await self.peer_cache.remember_dialogs(client_id, dialogs)
+            else:
+                await self.db.save_client_peers(client_id, dialog_peers(dialogs))
+            logger.info(f"Guruhlar katalogi yangilandi: client={client_id}, guruhlar={len(rows)}")
+            return len(rows)
+
+    def refresh_later(self, client_id: int):
+        """Katalogni fonda yangilash (shu akkaunt uchun allaqachon ketayotgan bo'lsa qaytadan boshlanmaydi)"""
+        task = self._background.get(client_id)
+        if task is None or task.done():
+            self._background[client_id] = asyncio.create_task(self._refresh_quietly(client_id))
+
+    async def refresh_stale(self, client_ids: list):
+        """Katalogi `ttl_minutes` dan eskirgan akkauntlarni yangilash"""
+        fresh = set(await self.db.get_fresh_dialog_clients(self.ttl_minutes))
+        for client_id in client_ids:
+            if client_id not in fresh:
+                await self._refresh_quietly(client_id)
+
+    async def _refresh_quietly(self, client_id: int):
+        try:
+            await self.refresh(client_id)
+        except Exception as e:
+            logger.error(f"Akkaunt guruhlarini yangilashda xatolik: client={client_id}, xato={str(e)}")
@@ -0,0 +1,214 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+from telethon import errors, utils
+from telethon.tl import types
+from telethon.tl.functions.messages import SendMessageRequest, SendMediaRequest
+
+
+class FakeTelegramClient:
+    """
+    Telegram'ga ulanmaydigan TelegramClient o'rinbosari (benchmark va oflayn sinovlar uchun).
+
+    Har bir so'rov `latency` soniya davom etadi (event loop vaqti bilan, shuning
+    uchun VirtualTimeLoop ostida haqiqiy kutish yo'q). `flood_rate` ehtimol bilan
+    FloodWaitError(`flood_seconds`), `error_rate` ehtimol bilan `error_factory()`
+    xatoligi qaytariladi. Bir xil random_id ikkinchi marta kelsa RandomIdDuplicateError (`duplicates`),
+    `dead_groups` dagi guruhlarga yuborish esa har doim ChatWriteForbiddenError.
+    StringSession kabi entity keshi xotirada: get_dialogs'da ko'rilmagan guruh
+    uchun `get_input_entity` tarmoq so'rovi bo'ladi (`resolves`). So'rovlar ro'yxati
+    bitta konteyner (bitta round trip) sifatida bajariladi, xatolar MultiError bilan.
+    `account_error` berilsa (masalan UserDeactivatedBanError) har bir so'rov shu xatolikni qaytaradi.
+    `conversation()` @SpamBot kabi javob beradi (`spam_limited` bo'yicha).
+    """
+
+    def __init__(self, client_id: int = 0, groups: list = None, latency: float = 0.05,
+                 flood_rate: float = 0.0, flood_seconds: int = 30, error_rate: float = 0.0,
+                 error_factory=None, seed: int = None, dead_groups=None):
+        self.client_id = client_id
+        self.groups = list(groups or [])
+        self.dead_groups = set(dead_groups or ())
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.error_rate = error_rate
+        self.error_factory = error_factory or (lambda: errors.ChatWriteForbiddenError(request=None))
+        self.random = random.Random(seed if seed is not None else client_id)
+        self.connected = False
+        self.authorized = True
+        self.sent = []  # [(peer, random_id, has_media)]
+        self.requests = 0
+        self.dead_requests = 0
+        self.duplicates = 0
+        self.resolves = 0
+        self.account_error = None
+        self.spam_limited = False
+        self._entities = set()
+        self._random_ids = set()
+        self._saved_photos = {}
+
+    # --- ulanish ---
+    async def connect(self):
+        await self._rpc()
+        self.connected = True
+
+    def reset_session(self):
+        """Yangi StringSession bilan yaratilgan klient kabi entity keshini tozalash"""
+        self._entities.clear()
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def is_user_authorized(self) -> bool:
+        return self.authorized
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.disconnect()
+
+    # --- so'rovlar ---
+    async def _rpc(self, request=None):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        self._roll(request)
+
+    def _roll(self, request=None):
+        if self.account_error is not None:
+            raise self.account_error()
+        roll = self.random.random()
+        if roll < self.flood_rate:
+            raise errors.FloodWaitError(request=request, capture=self.flood_seconds)
+        if roll < self.flood_rate + self.error_rate:
+            raise self.error_factory()
+
+    async def __call__(self, request, ordered: bool = False):
+        if isinstance(request, list):
+            return await self._container(request)
+        await self._rpc(request)
+        return self._handle(request)
+
+    async def _container(self, requests: list):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        results, exceptions = [], []
+        for request in requests:
+            try:
+                self._roll(request)
+                results.append(self._handle(request))
+                exceptions.append(None)
+            except errors.RPCError as e:
+                results.append(None)
+                exceptions.append(e)
+        if any(exception is not None for exception in exceptions):
+            raise errors.MultiError(exceptions, results, requests)
+        return results
+
+    def _handle(self, request):
+        if isinstance(request, (SendMessageRequest, SendMediaRequest)):
+            return self._deliver(request.peer, request.random_id, isinstance(request, SendMediaRequest))
+        return None
+
+    def _deliver(self, peer, random_id, has_media: bool):
+        if not isinstance(peer, int):
+            peer = utils.get_peer_id(peer)
+        if peer in self.dead_groups:
+            self.dead_requests += 1
+            raise errors.ChatWriteForbiddenError(request=None)
+        if random_id in self._random_ids:
+            self.duplicates += 1
+            raise errors.RandomIdDuplicateError(request=None)
+        self._random_ids.add(random_id)
+        self.sent.append((peer, random_id, has_media))
+        return types.Updates(updates=[], users=[], chats=[], date=None, seq=0)
+
+    async def get_input_entity(self, peer):
+        if not isinstance(peer, int):
+            return peer
+        if peer not in self._entities:
+            self.resolves += 1
+            await self._rpc()
+            self._entities.add(peer)
+        return self._input_peer(peer)
+
+    def _input_peer(self, peer_id: int):
+        real_id, peer_type = utils.resolve_id(peer_id)
+        if peer_type is types.PeerChat:
+            return types.InputPeerChat(chat_id=real_id)
+        return types.InputPeerChannel(channel_id=real_id, access_hash=real_id ^ self.client_id)
+
+    async def send_message(self, entity, message, **kwargs):
+        await self._rpc()
+        return self._deliver(entity, self.random.getrandbits(63), False)
+
+    async def send_file(self, entity, file, caption=None, **kwargs):
+        await self._rpc()
+        return self._deliver(entity, self.random.getrandbits(63), True)
+
+    async def upload_file(self, file, **kwargs):
+        await self._rpc()
+        return types.InputFile(id=self.random.getrandbits(63), parts=1, name="photo.jpg", md5_checksum="")
+
+    async def get_messages(self, entity, ids=None, limit=None, **kwargs):
+        await self._rpc()
+        if ids is None:
+            return []
+        photo = self._saved_photos.setdefault(ids, types.Photo(
+            id=ids, access_hash=self.client_id, file_reference=b"", date=None, sizes=[], dc_id=2
+        ))
+        return SimpleNamespace(id=ids, photo=photo, media=types.MessageMediaPhoto(photo=photo))
+
+    async def download_media(self, message, file=None, **kwargs):
+        await self._rpc()
+        return f"photo-{message.id}".encode()
+
+    def conversation(self, entity, timeout=None, **kwargs):
+        return _FakeConversation(self)
+
+    async def get_dialogs(self, limit=None, **kwargs):
+        return [dialog async for dialog in self.iter_dialogs(limit=limit)]
+
+    async def iter_dialogs(self, limit=None, **kwargs):
+        await self._rpc()
+        for group in self.groups[:limit]:
+            self._entities.add(group["id"])
+            yield SimpleNamespace(
+                input_entity=self._input_peer(group["id"]),
+                id=group["id"],
+                title=group.get("title", str(group["id"])),
+                is_group=True,
+                is_channel=False,
+                entity=SimpleNamespace(
+                    participants_count=group.get("members"), left=False, broadcast=False, megagroup=True,
+                    creator=False, admin_rights=None, banned_rights=None,
+                    default_banned_rights=SimpleNamespace(send_messages=not group.get("can_write", True)),
+                ),
+            )
+
+
+class _FakeConversation:
+    def __init__(self, client: FakeTelegramClient):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def send_message(self, message, **kwargs):
+        await self.client._rpc()
+
+    async def get_response(self, **kwargs):
+        await self.client._rpc()
+        if self.client.spam_limited:
+            text = "I'm afraid some Telegram users found your messages annoying and forwarded them to our team."
+        else:
+            text = "Good news, no limits are currently applied to your account. You're free as a bird!"
+        return SimpleNamespace(raw_text=text)
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+
+from data.config import (ACCOUNT_SPAM_FAILURES, ACCOUNT_BREAKER_RESET_SECONDS, HEALTH_CHECK_WORKERS,
+                         HEALTH_CHECK_INTERVAL_MINUTES, HEALTH_CHECK_TIMEOUT_SECONDS)
+from utils.scheduler.timers import SystemClock
+from utils.telegram.client_pool import ClientUnauthorizedError
+from utils.telegram.sending import account_failure
+
+logger = logging.getLogger(__name__)
+
+SPAM_BOT = "SpamBot"
+# @SpamBot javobida cheklov yo'qligini bildiruvchi iboralar (akkaunt tiliga qarab)
+SPAM_FREE_MARKERS = ("no limits", "free as a bird", "нет ограничений", "свободен", "cheklovlar yo'q")
+# Cheklov borligini bildiruvchi iboralar - ikkalasiga ham mos kelmagan javob "unknown"
+SPAM_LIMITED_MARKERS = (
+    "account is limited", "account is now limited", "limited until", "found your messages annoying",
+    "ваш аккаунт ограничен", "ограничения будут сняты", "сочли ваши сообщения", "cheklangan",
+)
+
+
+def classify_spam_reply(text: str) -> str:
+    """@SpamBot javobi: ok, limited yoki unknown (tanilmagan javob cheklov deb hisoblanmaydi)"""
+    text = text.lower()
+    if any(marker in text for marker in SPAM_FREE_MARKERS):
+        return "ok"
+    if any(marker in text for marker in SPAM_LIMITED_MARKERS):
+        return "limited"
+    return "unknown"
+
+
+class AccountCircuitBreaker:
+    """
+    Akkaunt bo'yicha circuit breaker.
+
+    Sessiya bekor qilingan yoki akkaunt banlangan bo'lsa birinchi xatolikdayoq,
+    PeerFlood (spam-cheklov) esa ketma-ket `spam_failures` marta takrorlanganda
+    ochiladi. Ochiq akkauntga so'rov yuborilmaydi; `reset_seconds` dan keyin
+    breaker yarim ochiladi - akkaunt bazada qayta yoqilgan bo'lsa yana ishlatiladi.
+    """
+
+    def __init__(self, clock=None, spam_failures: int = ACCOUNT_SPAM_FAILURES,
+                 reset_seconds: int = ACCOUNT_BREAKER_RESET_SECONDS):
+        self.clock = clock or SystemClock()
+        self.spam_failures = spam_failures
+        self.reset_seconds = reset_seconds
+        self._failures = {}  # client_id -> ketma-ket PeerFlood soni
+        self._opened = {}  # client_id -> (ochilgan vaqt, sabab)
+
+    def record_failure(self, client_id: int, error: Exception, reason: str = None):
+        """
+        Akkaunt xatoligini qayd qilish (`reason` berilmasa xatolik turidan aniqlanadi).
+
+        :return: breaker aynan shu xatolik bilan ochilgan bo'lsa sabab, aks holda None
+        """
+        reason = reason or account_failure(error)
+        if reason is None or self.is_open(client_id):
+            return None
+        if reason == "spam":
+            self._failures[client_id] = self._failures.get(client_id, 0) + 1
+            if self._failures[client_id] < self.spam_failures:
+                return None
+        self._failures.pop(client_id, None)
+        self._opened[client_id] = (self.clock.now(), reason)
+        return reason
+
+    def record_success(self, client_id: int):
+        self._failures.pop(client_id, None)
+
+    def is_open(self, client_id: int) -> bool:
+        opened = self._opened.get(client_id)
+        if opened is None:
+            return False
+        if self.clock.now() - opened[0] >= self.reset_seconds:
+            del self._opened[client_id]
+            return False
+        return True
+
+    def reason(self, client_id: int):
+        opened = self._opened.get(client_id)
+        return opened[1] if opened else None
+
+    def reset(self, client_id: int):
+        self._failures.pop(client_id, None)
+        self._opened.pop(client_id, None)
+
+
+class SessionHealthChecker:
+    """
+    Barcha akkauntlar sessiyasi va spam holatini fonda tekshirish.
+
+    Har HEALTH_CHECK_INTERVAL_MINUTES daqiqada Clients qatorlari ko'pi bilan
+    HEALTH_CHECK_WORKERS ta parallel tekshiriladi: `is_user_authorized` va
+    @SpamBot javobi. Natija ClientHealth jadvaliga vaqti bilan yoziladi,
+    handlerlar esa Telegram'ga murojaat qilmasdan shu jadvaldan javob beradi.
+    """
+
+    def __init__(self, db, pool, workers: int = HEALTH_CHECK_WORKERS,
+                 interval_minutes: int = HEALTH_CHECK_INTERVAL_MINUTES,
+                 timeout_seconds: int = HEALTH_CHECK_TIMEOUT_SECONDS):
+        self.db = db
+        self.pool = pool
+        self.workers = workers
+        self.interval = interval_minutes * 60
+        self.timeout = timeout_seconds
+        self._task = None
+        self._running = None  # hozir ishlayotgan check_all task
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._check_loop())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, self._running) if task and not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    @property
+    def is_checking(self) -> bool:
+        return self._running is not None and not self._running.done()
+
+    def trigger(self) -> bool:
+        """Tekshiruvni darhol fonda boshlash (allaqachon ketayotgan bo'lsa False)"""
+        if self.is_checking:
+            return False
+        self._running = asyncio.create_task(self.check_all())
+        return True
+
+    async def _check_loop(self):
+        while True:
+            if not self.is_checking:
+                self._running = asyncio.create_task(self.check_all())
+            try:
+                await asyncio.shield(self._running)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Akkauntlarni tekshirishda xatolik: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def check_all(self) -> list:
+        """Barcha akkauntlarni parallel tekshirib, natijalarni bitta batch bilan saqlash"""
+        started = time.monotonic()
+        clients = await self.db.get_all_clients()
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def check_one(row):
+            async with semaphore:
+                return await self.check(row)
+
+        results = await asyncio.gather(*(check_one(row) for row in clients))
+        await self.db.save_client_health(results)
+        logger.info(f"Akkauntlar tekshirildi: {len(results)} ta, {time.monotonic() - started:.1f}s")
+        return results
+
+    async def check(self, row) -> tuple:
+        """(client_id, authorized, spam_status, details) - spam_status: ok, limited yoki unknown"""
+        client_id = row["id"]
+        try:
+            return await asyncio.wait_for(self._check(row), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return client_id, None, "unknown", "Tekshiruv vaqti tugadi"
+        except Exception as e:
+            reason = "deauthorized" if isinstance(e, ClientUnauthorizedError) else account_failure(e)
+            if reason in ("deauthorized", "banned"):
+                if row["is_active"] and not row["is_banned"]:
+                    await self.db.disable_client(client_id, reason, banned=reason == "banned")
+                return client_id, False if reason == "deauthorized" else None, "unknown", type(e).__name__
+            return client_id, None, "unknown", f"Xatolik: {str(e)}"
+
+    async def _check(self, row) -> tuple:
+        client_id = row["id"]
+        if row["is_active"] and not row["is_banned"]:
+            # Yuborishda ishlatilayotgan akkauntlar puldagi ulanish orqali tekshiriladi
+            async with self.pool.lease(client_id) as client:
+                return await self._inspect(row, client)
+        client = self.pool.client_factory(row)
+        await client.connect()
+        try:
+            return await self._inspect(row, client)
+        finally:
+            await client.disconnect()
+
+    async def _inspect(self, row, client) -> tuple:
+        client_id = row["id"]
+        if not await client.is_user_authorized():
+            if row["is_active"]:
+                await self.db.disable_client(client_id, "deauthorized", banned=False)
+            return client_id, False, "unknown", "Sessiya bekor qilingan"
+
+        async with client.conversation(SPAM_BOT, timeout=self.timeout) as conversation:
+            await conversation.send_message("/start")
+            response = await conversation.get_response()
+        text = response.raw_text or ""
+        spam_status = classify_spam_reply(text)
+        if spam_status == "ok" and row["is_banned"] and row.get("ban_reason") == "spam":
+            # Spam-cheklov olib tashlangan - akkaunt yana yuborishda ishlatiladi
+            await self.db.restore_client(client_id)
+            logger.info(f"Akkaunt spam-cheklovdan chiqdi: client={client_id}")
+        return client_id, True, spam_status, text[:500]
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from data.config import MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """
+    Reklama rasmlari uchun akkaunt bo'yicha kesh.
+
+    Rasm bir marta yuklab olinadi va diskda sha256 nomi bilan saqlanadi
+    (hajmi MEDIA_CACHE_MAX_MB dan oshsa eng eski fayllar o'chiriladi).
+    Yuborish uchun esa server tomonidagi havola (Photo yoki yuklangan fayl)
+    qayta ishlatiladi, shuning uchun har bir guruhga qayta yuklash bo'lmaydi.
+    """
+
+    def __init__(self, cache_dir: str = MEDIA_CACHE_DIR, max_mb: int = MEDIA_CACHE_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_mb * 1024 * 1024
+        self._digests = {}  # (client_id, message_id) -> sha256
+        self._refs = {}  # (client_id, sha256) -> server tomonidagi havola
+        self._locks = {}
+
+    async def get_photo(self, client_id: int, client, message_id: int):
+        """Saved Messages dagi rasmni yuborishga tayyor havola sifatida olish"""
+        key = (client_id, message_id)
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            digest = self._digests.get(key)
+            if digest and (client_id, digest) in self._refs:
+                return self._refs[(client_id, digest)]
+
+            message = await client.get_messages('me', ids=message_id)
+            if message and message.photo:
+                if digest is None or not self._path(digest).exists():
+                    data = await client.download_media(message, file=bytes)
+                    digest = self._store(data)
+                self._digests[key] = digest
+                self._refs[(client_id, digest)] = message.photo
+                return message.photo
+
+            # Xabar o'chirilgan bo'lsa diskdagi nusxani bir marta qayta yuklaymiz
+            if digest and self._path(digest).exists():
+                path = self._path(digest)
+                os.utime(path)
+                uploaded = await client.upload_file(str(path))
+                self._refs[(client_id, digest)] = uploaded
+                return uploaded
+
+            logger.warning(f"Rasm topilmadi: client={client_id}, xabar={message_id}")
+            return None
+
+    def remember_sent(self, client_id: int, message_id: int, photo):
+        """Yuborilgan xabardagi yangi havolani (Photo) keyingi yuborishlar uchun saqlash"""
+        digest = self._digests.get((client_id, message_id))
+        if digest and photo is not None:
+            self._refs[(client_id, digest)] = photo
+
+    def invalidate(self, client_id: int, message_id: int):
+        """Havola eskirganda (FileReferenceExpired) uni tashlab yuborish"""
+        digest = self._digests.get((client_id, message_id))
+        if digest:
+            self._refs.pop((client_id, digest), None)
+
+    def _path(self, digest: str) -> Path:
+        return self.cache_dir / f"{digest}.jpg"
+
+    def _store(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not path.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            self._enforce_limit()
+        else:
+            os.utime(path)
+        return digest
+
+    def _enforce_limit(self):
+        # LRU: eng uzoq ishlatilmagan fayllarni limitgacha o'chiramiz
+        files = sorted(self.cache_dir.glob("*.jpg"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for path in files:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
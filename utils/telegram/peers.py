@@ -0,0 +1,96 @@
+import logging
+
+from telethon import utils
+from telethon.tl import types
+
+logger = logging.getLogger(__name__)
+
+
+def input_peer_row(input_peer):
+    """InputPeer -> (peer_id, peer_type, entity_id, access_hash) - ClientPeers qatori uchun"""
+    if isinstance(input_peer, types.InputPeerChannel):
+        return utils.get_peer_id(input_peer), "channel", input_peer.channel_id, input_peer.access_hash
+    if isinstance(input_peer, types.InputPeerChat):
+        return utils.get_peer_id(input_peer), "chat", input_peer.chat_id, None
+    if isinstance(input_peer, types.InputPeerUser):
+        return utils.get_peer_id(input_peer), "user", input_peer.user_id, input_peer.access_hash
+    return None
+
+
+def input_peer_from_row(row):
+    """ClientPeers qatoridan tarmoqqa murojaatsiz InputPeer yasash"""
+    if row["peer_type"] == "channel":
+        return types.InputPeerChannel(channel_id=row["entity_id"], access_hash=row["access_hash"])
+    if row["peer_type"] == "chat":
+        return types.InputPeerChat(chat_id=row["entity_id"])
+    return types.InputPeerUser(user_id=row["entity_id"], access_hash=row["access_hash"])
+
+
+def dialog_peers(dialogs) -> list:
+    """get_dialogs natijasidagi guruh va kanallarning ClientPeers qatorlari"""
+    rows = []
+    for dialog in dialogs:
+        if not (dialog.is_group or dialog.is_channel):
+            continue
+        row = input_peer_row(dialog.input_entity)
+        if row:
+            rows.append(row)
+    return rows
+
+
+class PeerCache:
+    """
+    Akkaunt bo'yicha guruhlarning InputPeer (id + access_hash) keshi.
+
+    StringSession entity keshini saqlamaydi, shuning uchun yangi ulangan klient
+    `get_input_entity(group_id)` da guruhni tarmoq orqali qidiradi. Bu kesh
+    ClientPeers jadvalidan bir so'rov bilan yuklanadi, get_dialogs va tarmoq
+    orqali topilgan peer'lar bilan to'ldiriladi.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._peers = {}  # (client_id, peer_id) -> InputPeer
+        self.resolves = 0
+
+    async def load(self, client_id: int, peer_ids: list):
+        """Xotirada yo'q peer'larni bazadan bitta so'rov bilan yuklash"""
+        missing = [peer_id for peer_id in peer_ids if (client_id, peer_id) not in self._peers]
+        if not missing:
+            return
+        for row in await self.db.get_client_peers(client_id, missing):
+            self._peers[(client_id, row["peer_id"])] = input_peer_from_row(row)
+
+    async def get_input_peer(self, client_id: int, client, peer_id: int):
+        key = (client_id, peer_id)
+        peer = self._peers.get(key)
+        if peer is not None:
+            return peer
+
+        real_id, peer_type = utils.resolve_id(peer_id)
+        if peer_type is types.PeerChat:
+            # Oddiy guruhlar uchun access_hash kerak emas
+            peer = types.InputPeerChat(chat_id=real_id)
+        else:
+            peer = await client.get_input_entity(peer_id)
+            self.resolves += 1
+            row = input_peer_row(peer)
+            if row:
+                await self.db.save_client_peers(client_id, [row])
+        self._peers[key] = peer
+        return peer
+
+    async def remember_dialogs(self, client_id: int, dialogs):
+        """get_dialogs natijasidagi peer'larni xotira va bazaga yozish"""
+        rows = dialog_peers(dialogs)
+        for peer_id, peer_type, entity_id, access_hash in rows:
+            self._peers[(client_id, peer_id)] = input_peer_from_row(
+                {"peer_type": peer_type, "entity_id": entity_id, "access_hash": access_hash}
+            )
+        if rows:
+            await self.db.save_client_peers(client_id, rows)
+
+    async def forget(self, client_id: int, peer_id: int):
+        """Eskirgan peer'ni (PeerIdInvalid/ChannelInvalid) keshdan o'chirish"""
+        if self._peers.pop((client_id, peer_id), None) is not None:
+            await self.db.delete_client_peer(client_id, peer_id)
@@ -0,0 +1,155 @@
+import asyncio
+
+from data.config import SEND_RATE_PER_SECOND, SEND_BURST, FLOOD_RATE_DECREASE, FLOOD_RATE_STEP, FLOOD_MIN_RATE
+from utils.scheduler.timers import SystemClock
+
+
+class TokenBucket:
+    """
+    Klassik token-bucket: `rate` - soniyasiga to'ladigan tokenlar (barqaror tezlik),
+    `burst` - bir vaqtda to'planishi mumkin bo'lgan maksimal tokenlar.
+
+    `pause()` bucket'ni vaqtincha to'xtatadi (FloodWait), bu vaqtda tokenlar to'planmaydi.
+    `rate` FloodWait'dan keyin `max_rate` dan past bo'lishi va asta-sekin tiklanishi mumkin.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=None):
+        self.clock = clock or SystemClock()
+        self.rate = rate
+        self.max_rate = rate
+        self.burst = burst
+        self.paused_until = 0.0
+        self._tokens = float(burst)
+        self._updated = self.clock.now()
+        self._lock = asyncio.Lock()
+
+    def configure(self, rate: float = None, burst: int = None):
+        self._refill()
+        if rate is not None:
+            # Tiklanayotgan bucket tezligini oshirib yubormaymiz
+            self.rate = rate if self.rate >= self.max_rate else min(self.rate, rate)
+            self.max_rate = rate
+        if burst is not None:
+            self.burst = burst
+            self._tokens = min(self._tokens, burst)
+
+    def pause(self, seconds: float):
+        """Bucket'ni `seconds` soniyaga to'xtatish va tokenlarni nolga tushirish"""
+        self._refill()
+        self.paused_until = max(self.paused_until, self.clock.now() + seconds)
+        self._tokens = 0.0
+
+    def _refill(self):
+        now = self.clock.now()
+        start = max(self._updated, self.paused_until)
+        if now > start:
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._updated = max(now, self._updated)
+
+    @property
+    def tokens(self) -> float:
+        """Hozirgi to'lish darajasi"""
+        self._refill()
+        return self._tokens
+
+    @property
+    def paused_seconds(self) -> float:
+        return max(self.paused_until - self.clock.now(), 0.0)
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """`tokens` ta token yig'ilishi uchun kerak bo'lgan vaqt (soniya)"""
+        self._refill()
+        paused = self.paused_seconds
+        need = tokens - self._tokens
+        if need <= 0:
+            return paused
+        if self.rate <= 0:
+            return float("inf")
+        return paused + need / self.rate
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """Token olish (kerak bo'lsa kutadi). Kutilgan vaqtni qaytaradi"""
+        waited = 0.0
+        # Lock kutayotganlarni navbat bo'yicha (FIFO) o'tkazadi
+        async with self._lock:
+            while True:
+                wait = self.wait_time(tokens)
+                if wait <= 0:
+                    self._tokens -= tokens
+                    return waited
+                await self.clock.sleep(wait)
+                waited += wait
+
+
+class AccountRateLimiter:
+    """
+    Har bir Telethon akkaunti (Clients.id) uchun alohida token-bucket.
+
+    FloodWait bo'lsa akkaunt butunlay to'xtatiladi va tezligi FLOOD_RATE_DECREASE
+    marta kamayadi, keyin har bir muvaffaqiyatli yuborishda FLOOD_RATE_STEP ga
+    oshib boradi (AIMD).
+    """
+
+    def __init__(self, rate: float = SEND_RATE_PER_SECOND, burst: int = SEND_BURST, clock=None):
+        self.clock = clock or SystemClock()
+        self.default_rate = rate
+        self.default_burst = burst
+        self._buckets = {}
+
+    def bucket(self, client_id: int) -> TokenBucket:
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.default_rate, self.default_burst, clock=self.clock)
+            self._buckets[client_id] = bucket
+        return bucket
+
+    def configure(self, client_id: int, rate: float = None, burst: int = None):
+        """Akkaunt uchun tezlikni sozlash (None - standart qiymat)"""
+        self.bucket(client_id).configure(
+            rate if rate is not None else self.default_rate,
+            burst if burst is not None else self.default_burst,
+        )
+
+    async def acquire(self, client_id: int, tokens: float = 1) -> float:
+        return await self.bucket(client_id).acquire(tokens)
+
+    def penalize(self, client_id: int, seconds: float):
+        """FloodWait: akkauntni to'xtatish va tezlikni kamaytirish (multiplicative decrease)"""
+        bucket = self.bucket(client_id)
+        already_paused = bucket.paused_seconds > 0
+        bucket.pause(seconds)
+        if not already_paused:
+            # Parallel yuborishlar bir vaqtda FloodWait olsa tezlik bir marta kamayadi
+            bucket.rate = max(bucket.rate * FLOOD_RATE_DECREASE, FLOOD_MIN_RATE)
+        return bucket.paused_until, bucket.rate
+
+    def record_success(self, client_id: int) -> bool:
+        """Muvaffaqiyatli yuborish: tezlikni oshirish (additive increase).
+        Tezlik to'liq tiklangan paytda True qaytaradi"""
+        bucket = self.bucket(client_id)
+        if bucket.rate >= bucket.max_rate:
+            return False
+        bucket.rate = min(bucket.max_rate, bucket.rate + FLOOD_RATE_STEP)
+        return bucket.rate >= bucket.max_rate
+
+    def restore(self, client_id: int, paused_until: float = None, rate: float = None):
+        """Qayta ishga tushganda bazadagi cooldown holatini tiklash"""
+        bucket = self.bucket(client_id)
+        if paused_until:
+            bucket.pause(paused_until - self.clock.now())
+        if rate is not None:
+            bucket.rate = min(rate, bucket.max_rate)
+
+    def stats(self) -> dict:
+        """Akkauntlar bo'yicha to'lish darajasi va keyingi token uchun kutish vaqti"""
+        return {
+            client_id: {
+                "rate": round(bucket.rate, 3),
+                "max_rate": bucket.max_rate,
+                "burst": bucket.burst,
+                "paused_seconds": round(bucket.paused_seconds, 1),
+                "tokens": round(bucket.tokens, 2),
+                "wait_seconds": round(bucket.wait_time(), 2),
+            }
+            for client_id, bucket in self._buckets.items()
+        }
@@ -0,0 +1,90 @@
+import hashlib
+
+from telethon import errors, utils
+from telethon.extensions import html
+from telethon.tl import types
+from telethon.tl.functions.messages import SendMessageRequest, SendMediaRequest
+
+
+# Akkaunt bu guruhga umuman yoza olmaydi (chiqqan, banlangan, yozish huquqi yo'q) -
+# qayta urinish foyda bermaydi
+PERMANENT_SEND_ERRORS = (
+    errors.ChatWriteForbiddenError,
+    errors.ChannelPrivateError,
+    errors.UserBannedInChannelError,
+    errors.ChatAdminRequiredError,
+    errors.ChatRestrictedError,
+    errors.ChannelInvalidError,
+    errors.PeerIdInvalidError,
+)
+
+
+# Akkaunt sessiyasi bekor qilingan - qayta login kerak (is_active = FALSE)
+DEAUTHORIZED_ERRORS = (
+    errors.AuthKeyUnregisteredError,
+    errors.AuthKeyDuplicatedError,
+    errors.SessionRevokedError,
+    errors.SessionExpiredError,
+)
+
+# Akkaunt Telegram tomonidan o'chirilgan yoki banlangan (is_banned = TRUE)
+BANNED_ERRORS = (
+    errors.UserDeactivatedError,
+    errors.UserDeactivatedBanError,
+    errors.PhoneNumberBannedError,
+)
+
+# Guruhga emas, butun akkauntga tegishli xatoliklar - boshqa guruhlarga ham urinib bo'lmaydi
+ACCOUNT_ERRORS = DEAUTHORIZED_ERRORS + BANNED_ERRORS + (errors.PeerFloodError,)
+
+
+def is_permanent_error(error: Exception) -> bool:
+    return isinstance(error, PERMANENT_SEND_ERRORS)
+
+
+def account_failure(error: Exception):
+    """Akkaunt holati xatoligi: 'deauthorized', 'banned', 'spam' (PeerFlood) yoki None"""
+    if isinstance(error, DEAUTHORIZED_ERRORS):
+        return "deauthorized"
+    if isinstance(error, BANNED_ERRORS):
+        return "banned"
+    if isinstance(error, errors.PeerFloodError):
+        return "spam"
+    return None
+
+
+def outbox_random_id(idempotency_key: str) -> int:
+    """
+    Outbox qatori uchun doimiy random_id.
+
+    Telegram bir xil random_id bilan kelgan xabarni ikkinchi marta qabul qilmaydi
+    (RandomIdDuplicateError), shuning uchun qayta urinish hech qachon takroriy
+    xabar bo'lib ketmaydi.
+    """
+    digest = hashlib.sha256(idempotency_key.encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def build_send_request(peer, text: str, photo=None, random_id: int = None):
+    """HTML matn (va rasm) uchun SendMessageRequest yoki SendMediaRequest tuzish"""
+    message, entities = html.parse(text)
+    if random_id is None:
+        random_id = utils.generate_random_long()
+    if photo is None:
+        return SendMessageRequest(peer=peer, message=message, random_id=random_id, entities=entities or None)
+    return SendMediaRequest(
+        peer=peer,
+        media=utils.get_input_media(photo, is_photo=True),
+        message=message,
+        random_id=random_id,
+        entities=entities or None,
+    )
+
+
+def sent_photo(result):
+    """Yuborish natijasidan (Updates) server tomonidagi Photo ni olish"""
+    for update in getattr(result, "updates", None) or []:
+        media = getattr(getattr(update, "message", None), "media", None)
+        if isinstance(media, types.MessageMediaPhoto):
+            return media.photo
+    return None